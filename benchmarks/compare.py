@@ -0,0 +1,62 @@
+"""
+Compares two benchmark result files from run.py by median time. Exits with a non-zero
+status if any timing in the new file is slower than the baseline by more than the
+threshold.
+
+    python benchmarks/compare.py base.json new.json --threshold 0.2
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+
+
+def timings(results: dict) -> dict:
+    """
+    Returns the median of every timed entry, keyed by case and entry name.
+    """
+    found = {}
+    for case, entries in results["cases"].items():
+        for entry, stats in entries.items():
+            if isinstance(stats, dict) and "median" in stats:
+                found[f"{case}.{entry}"] = stats["median"]
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed relative slowdown"
+    )
+    args = parser.parse_args()
+
+    with open(args.base, "r") as f:
+        base = json.load(f)
+    with open(args.new, "r") as f:
+        new = json.load(f)
+
+    print(f"base {base['meta']['commit'][:12]}, new {new['meta']['commit'][:12]}")
+    old_times, new_times = timings(base), timings(new)
+
+    failed = False
+    for name in sorted(set(old_times) | set(new_times)):
+        if name not in old_times or name not in new_times:
+            print(f"[NOTE] {name}: only in {'new' if name in new_times else 'base'}")
+            continue
+        ratio = new_times[name] / old_times[name] if old_times[name] > 0 else 1.0
+        slower = ratio - 1 > args.threshold
+        failed |= slower
+        print(
+            f"[{'FAIL' if slower else 'ok'}] {name}: "
+            f"{old_times[name] * 1000:.2f} ms -> {new_times[name] * 1000:.2f} ms "
+            f"({ratio:.2f}x)"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Checks that importing h2_gym stays fast and headless. Each module is imported in a
+fresh interpreter; the script exits with a non-zero status if any import exceeds its
+budget or pulls in one of the heavy optional dependencies.
+
+    python benchmarks/import_time.py --budget 0.5
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = [
+    "h2_gym",
+    "h2_gym.graph.spatial",
+    "h2_gym.graph.temporal",
+    "h2_gym.algs",
+    "h2_gym.envs",
+    "h2_gym.envs.supply",
+]
+HEAVY = ["matplotlib", "statsmodels", "pyomo", "h2_plan", "meteor_py"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    """
+    Returns the fastest import time of a module over repeat fresh interpreters, and
+    the heavy dependencies it imported.
+    """
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "module": module,
+        "seconds": min(run["seconds"] for run in runs),
+        "heavy": runs[0]["heavy"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=0.5, help="seconds per module")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        result = measure(module, args.repeat)
+        over = result["seconds"] > args.budget
+        failed |= over or bool(result["heavy"])
+        status = "FAIL" if over or result["heavy"] else "ok"
+        heavy = f" imports {', '.join(result['heavy'])}" if result["heavy"] else ""
+        print(f"[{status}] {module}: {result['seconds'] * 1000:.1f} ms{heavy}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Runs the hot-path benchmarks and writes the timings as JSON, with the commit and
+package versions they were measured on. Cases whose dependencies are missing are
+recorded as skipped. Compare two result files with compare.py.
+
+    python benchmarks/run.py --output results.json --solver mock
+"""
+
+from __future__ import annotations
+from importlib import metadata
+from pathlib import Path
+import argparse
+import platform
+import subprocess
+import inspect
+import json
+import sys
+import traceback
+from suite import CASES, SEED, Skip
+
+PACKAGES = ["numpy", "pandas", "pyomo", "statsmodels", "highspy", "gurobipy"]
+
+
+def commit() -> str:
+    """
+    Returns the current commit of the repository, marked dirty if it has changes.
+    """
+    root = Path(__file__).parent
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return "unknown"
+    return f"{head}-dirty" if dirty else head or "unknown"
+
+
+def versions() -> dict:
+    """
+    Returns the installed versions of the packages the timings depend on.
+    """
+    found = {}
+    for package in PACKAGES:
+        try:
+            found[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            found[package] = None
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default=None, help="JSON file, stdout if unset")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", default=list(CASES))
+    parser.add_argument(
+        "--solver",
+        choices=["mock", "highs", "gurobi"],
+        default="mock",
+        help="solver behind the controller benchmarks",
+    )
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "commit": commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "versions": versions(),
+            "seed": SEED,
+            "repeat": args.repeat,
+            "solver": args.solver,
+        },
+        "cases": {},
+    }
+
+    for name in args.cases:
+        func = CASES[name]
+        kwargs = {"repeat": args.repeat}
+        if "solver" in inspect.signature(func).parameters:
+            kwargs["solver"] = args.solver
+        try:
+            results["cases"][name] = func(**kwargs)
+            print(f"[INFO] {name}: done", file=sys.stderr)
+        except Skip as reason:
+            results["cases"][name] = {"skipped": str(reason)}
+            print(f"[NOTE] {name}: skipped, {reason}", file=sys.stderr)
+        except Exception:
+            results["cases"][name] = {"error": traceback.format_exc(limit=3)}
+            print(f"[NOTE] {name}: failed", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    return 1 if any("error" in case for case in results["cases"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""
+Benchmark cases for the hot paths of h2_gym. Every case seeds its random state and uses
+data bundled with the repository, so timings are comparable between commits. Cases
+whose dependencies are missing are reported as skipped.
+"""
+
+from __future__ import annotations
+from types import SimpleNamespace
+from pathlib import Path
+import importlib.util
+import tempfile
+import random
+import time
+import numpy as np
+import yaml
+
+DATA = Path(__file__).parent / "data"
+SEED = 1234
+
+CASES = {}
+
+
+class Skip(Exception):
+    """
+    Raised by a case whose dependencies are not available.
+    """
+
+
+def case(name: str):
+    """
+    Registers a benchmark case.
+    """
+
+    def register(func):
+        CASES[name] = func
+        return func
+
+    return register
+
+
+def seed() -> None:
+    """
+    Seeds every random number generator used by the package.
+    """
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+
+def require(*modules: str) -> None:
+    """
+    Skips the case if any of the modules cannot be imported.
+    """
+    missing = [m for m in modules if importlib.util.find_spec(m) is None]
+    if missing:
+        raise Skip(f"missing {', '.join(missing)}")
+
+
+def require_solver(name: str) -> None:
+    """
+    Skips the case if the pyomo solver is not installed or has no valid license.
+    """
+    require("pyomo")
+    from pyomo.environ import SolverFactory
+
+    solver = SolverFactory(name)
+    if not solver.available(exception_flag=False):
+        raise Skip(f"solver {name} not available")
+    if hasattr(solver, "license_is_valid") and not solver.license_is_valid():
+        raise Skip(f"solver {name} has no valid license")
+
+
+def timed(func, repeat: int, setup=None) -> dict:
+    """
+    Times func over repeat runs, calling setup before each run outside the timing. The
+    result of setup is passed to func.
+    """
+    times = []
+    for _ in range(repeat):
+        seed()
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg) if setup is not None else func()
+        times.append(time.perf_counter() - start)
+    times = np.array(times)
+    return {
+        "repeat": repeat,
+        "min": float(times.min()),
+        "median": float(np.median(times)),
+        "mean": float(times.mean()),
+        "max": float(times.max()),
+    }
+
+
+class MockSolver:
+    """
+    Stand-in for a MILP solver that sets every variable to its lower bound, or zero,
+    and reports an optimal solve. Times the model handling around the solver.
+    """
+
+    def __init__(self) -> None:
+        self.options = {}
+
+    def solve(self, instance, tee: bool = False):
+        from pyomo.environ import Var
+
+        for var in instance.component_data_objects(Var):
+            lb = var.lb
+            var.set_value(lb if lb is not None else 0, skip_validation=True)
+        return SimpleNamespace(solver=SimpleNamespace(termination_condition="optimal"))
+
+
+def fast_data() -> dict:
+    """
+    Builds the fast-loop data of shipping_v1 with the bundled parameters in place of
+    DefaultParams and a planning model.
+    """
+    from h2_gym.envs.shipping.shipping_v1.utils import (
+        load_yaml,
+        import_variables,
+        import_fast_functions,
+    )
+
+    folder = (
+        Path(importlib.util.find_spec("h2_gym").origin).parent
+        / "data/shipping/shipping_v1/fast_loop"
+    )
+    config = load_yaml(folder / "config.yml")
+    variables = load_yaml(folder / "variables.yml")
+    with open(DATA / "fast_params.yml", "r") as f:
+        bundled = yaml.safe_load(f)
+
+    sets = {
+        key: [val * item for val in range(config["Time"]["total_duration"] // item)]
+        for key, item in config["Time"].items()
+        if key != "total_duration"
+    }
+    params = {**bundled["default_data"], **bundled["planning_model"]}
+    params.update(variables["parameters"])
+
+    data = {
+        "sets": sets,
+        "params": params,
+        "vars": import_variables(variables, sets),
+        "forms": {key: list(val) for key, val in config["formulations"].items()},
+    }
+    data.update(import_fast_functions("shipping_v1", sets))
+    return data
+
+
+def fast_inputs(data: dict) -> dict:
+    """
+    Returns a fixed set of stochastic inputs for one fast-loop solve.
+    """
+    rng = np.random.default_rng(SEED)
+    grid0, grid1 = data["sets"]["grid0"], data["sets"]["grid1"]
+    return {
+        "ship_schedule": {
+            "name": "ship_schedule",
+            "loc": "exogenous",
+            "param": {"set": grid1, "initialize": {t: 1 for t in grid1}},
+        },
+        "energy_wind": {
+            "name": "energy_wind",
+            "loc": "exogenous",
+            "param": {"set": grid0, "initialize": list(rng.random(len(grid0)))},
+        },
+        "ship_arrived": {
+            "name": "ship_arrived",
+            "loc": "exogenous",
+            "param": {"set": None, "initialize": 0},
+        },
+        "expected_ships": {
+            "name": "expected_ships",
+            "loc": "exogenous",
+            "param": {"set": grid1, "initialize": {t: 0 for t in grid1}},
+        },
+    }
+
+
+@case("fast_controller")
+def fast_controller(repeat: int, solver: str = "mock") -> dict:
+    """
+    Times FastController build, solve and output on the shipping_v1 fast loop.
+    """
+    require("pyomo")
+    from h2_gym.algs.mpc import FastController, ShiftedPlan
+
+    if solver == "highs":
+        require("highspy")
+        solver = "appsi_highs"
+
+    data = fast_data()
+    inputs = fast_inputs(data)
+
+    def controller():
+        return FastController(solver=MockSolver() if solver == "mock" else solver)
+
+    def built():
+        fast = controller()
+        fast.build(data)
+        fast.update(inputs)
+        return fast
+
+    def solved():
+        fast = built()
+        fast.solve(True)
+        return fast
+
+    def heuristic_built():
+        fast = built()
+        fast.mode = "fix_and_relax"
+        return fast
+
+    def warm_built():
+        # Warm started from its own solution, which bounds the gain of any predictor
+        fast = solved()
+        fast.warm_start = ShiftedPlan(shift=0)
+        fast.build(data)
+        fast.update(inputs)
+        fast.solve(True)
+        fast.build(data)
+        fast.update(inputs)
+        return fast
+
+    return {
+        "solver": solver,
+        "build": timed(lambda fast: fast.build(data), repeat, controller),
+        "solve": timed(lambda fast: fast.solve(True), repeat, built),
+        "solve_warm": timed(lambda fast: fast.solve(True), repeat, warm_built),
+        "solve_fix_and_relax": timed(
+            lambda fast: fast.solve(True), repeat, heuristic_built
+        ),
+        "output": timed(lambda fast: fast.output(), repeat, solved),
+    }
+
+
+@case("kalman_filter")
+def kalman_filter(repeat: int) -> dict:
+    """
+    Times KalmanFilter update and synthetic scenario generation on bundled demand data.
+    """
+    require("statsmodels", "pandas")
+    from h2_gym.algs.filter import KalmanFilter
+
+    def fitted():
+        kf = KalmanFilter(
+            "EU",
+            "monthly",
+            "industry",
+            path=DATA / "demand.csv",
+            rng=np.random.default_rng(SEED),
+        )
+        kf.fit_train()
+        return kf
+
+    return {
+        "update": timed(lambda kf: kf.update(), repeat, fitted),
+        "gen_multi_synth": timed(lambda kf: kf.gen_multi_synth(16, 12), repeat, fitted),
+    }
+
+
+@case("space_graph")
+def space_graph(repeat: int) -> dict:
+    """
+    Times building, linearising and evaluating the supply_v1 space graph, with copied
+    and referenced pass-through values, and the compiled graph.
+    """
+    from h2_gym.envs.supply import HydrogenSupply
+
+    def fresh():
+        return HydrogenSupply("supply_v1")
+
+    def linearised(passthrough):
+        def setup():
+            supply = fresh()
+            supply.graph.linearise(passthrough=passthrough)
+            return supply
+
+        return setup
+
+    def compiled():
+        supply = linearised("reference")()
+        supply.graph.compile()
+        return supply
+
+    def evaluate(supply, n=100):
+        for _ in range(n):
+            supply.space_graph.evaluate()
+
+    return {
+        "build": timed(fresh, repeat),
+        "linearise_copy": timed(
+            lambda s: s.graph.linearise(passthrough="copy"), repeat, fresh
+        ),
+        "linearise_reference": timed(
+            lambda s: s.graph.linearise(passthrough="reference"), repeat, fresh
+        ),
+        "evaluate_x100_copy": timed(evaluate, repeat, linearised("copy")),
+        "evaluate_x100_reference": timed(evaluate, repeat, linearised("reference")),
+        "evaluate_x100_compiled": timed(evaluate, repeat, compiled),
+    }
+
+
+@case("stochastic_generator")
+def stochastic_generator(repeat: int) -> dict:
+    """
+    Times binding the supply_v1 wind datasets, parsing the text files and loading the
+    memory-mapped array cache.
+    """
+    from h2_gym.graph.temporal import StochasticGenerator
+    from h2_gym.graph.temporal.utils import match_files, load_series
+
+    path = Path(importlib.util.find_spec("h2_gym").origin).parent / "data/supply"
+    with open(path / "supply_v1" / "graph.yml", "r") as f:
+        spec = next(iter(yaml.safe_load(f)["uncertainties"].values()))
+
+    def bind():
+        StochasticGenerator().bind_dataset(
+            varname=spec["var_name"],
+            path=path,
+            filenames=spec["files"],
+            time_duration=spec["time_duration"],
+        )
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        files = match_files(path, spec["files"])
+        load_series(files, cache_dir)
+        cached = timed(lambda: load_series(files, cache_dir), repeat)
+
+    return {
+        "bind_dataset": timed(bind, repeat),
+        "load_series_cached": cached,
+    }
+
+
+@case("shipping_step")
+def shipping_step(repeat: int) -> dict:
+    """
+    Times a full ShippingEnvV1 step, every day of the month and the slow-loop plan,
+    which needs the planning model, weather data and gurobi for both control loops.
+    """
+    require("h2_plan", "meteor_py", "statsmodels")
+    require_solver("gurobi")
+    from h2_gym.envs import ShippingEnv
+
+    def ready():
+        env = ShippingEnv()
+        with env as args:
+            args["vector"] = "NH3"
+            args["fast"]["data_folder"] = "shipping_v1"
+            args["fast"]["planning_model"] = "NH3-Chile.yml"
+            args["weather_data"]["weather_file"] = "CoastalChile_15-20_Wind.csv"
+        return env
+
+    def full_step(env):
+        for _ in env.step({}):
+            pass
+
+    return {"step": timed(full_step, repeat, ready)}
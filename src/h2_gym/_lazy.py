@@ -0,0 +1,28 @@
+"""
+This module implements the lazy exports shared by the package __init__ files.
+"""
+
+from importlib import import_module
+import sys
+
+
+def attach(name: str, exports: dict) -> tuple:
+    """
+    Returns the __getattr__, __dir__ and __all__ of a package whose exports, a map from
+    the exported name to a (module, attribute) pair, are imported on first access so
+    the package can be imported cheaply.
+    """
+    names = list(exports)
+
+    def __getattr__(attr: str):
+        if attr not in exports:
+            raise AttributeError(f"module {name!r} has no attribute {attr!r}")
+        module, target = exports[attr]
+        value = getattr(import_module(module, name), target)
+        setattr(sys.modules[name], attr, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[name])) | set(names))
+
+    return __getattr__, __dir__, names
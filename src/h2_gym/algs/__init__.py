@@ -1,5 +1,14 @@
-from .filter import KalmanFilter
-from .mpc import FastController, SlowController
+from h2_gym._lazy import attach
 
-
-__all__ = ["KalmanFilter", "FastController", "SlowController"]
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "KalmanFilter": (".filter", "KalmanFilter"),
+        "FastController": (".mpc", "FastController"),
+        "SlowController": (".mpc", "SlowController"),
+        "nested_sampler": (".sampler", "nested_sampler"),
+        "SolutionStore": (".store", "SolutionStore"),
+        "LRUCache": (".store", "LRUCache"),
+        "TrajectoryRecorder": (".record", "TrajectoryRecorder"),
+    },
+)
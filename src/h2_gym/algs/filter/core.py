@@ -6,12 +6,8 @@ from __future__ import annotations
 from typing import Optional
 from pathlib import Path
 from pandas import read_csv, DataFrame, to_datetime, DateOffset, concat
-from statsmodels.tsa.statespace.structural import UnobservedComponents
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from matplotlib import pyplot as plt
 from numpy import random, empty, ndarray
-from .utils import muted_color, muted_palette
-from cycler import cycler
+from .utils import muted_color, muted_palette, simulate
 import warnings
 
 
@@ -26,10 +22,13 @@ class KalmanFilter:
         period: Optional[str],
         demand_type: Optional[str],
         path: Optional[str] = None,
+        rng: Optional[random.Generator] = None,
     ) -> None:
         """
-        Initializes the Kalman filter class.
+        Initializes the Kalman filter class. Synthetic data is drawn from rng, a fresh
+        unseeded stream by default.
         """
+        self.rng = random.default_rng() if rng is None else rng
         self._data = self.get_data(path, country, period, demand_type)
         self._inputs = None
         self._outputs = None
@@ -105,10 +104,13 @@ class KalmanFilter:
         self._test_data = self._test_data * scale_factor
         self._data = self._data * scale_factor
 
-    def fit_train(self) -> None:
+    def fit_train(self, params: Optional[ndarray] = None) -> None:
         """
-        Fits the Kalman filter to the training data.
+        Fits the Kalman filter to the training data. Given params, the model is only
+        smoothed with them rather than refitted.
         """
+        from statsmodels.tsa.statespace.structural import UnobservedComponents
+
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             # Fit the model
@@ -118,7 +120,10 @@ class KalmanFilter:
                 seasonal=12,
             )
 
-            self._results = self._model.fit(disp=False)
+            if params is None:
+                self._results = self._model.fit(disp=False)
+            else:
+                self._results = self._model.smooth(params)
 
             if not self._synth:
                 self._init_results = self._results
@@ -134,10 +139,17 @@ class KalmanFilter:
             # Access filter results if needed
             self._filter_results = self._results.filter_results
 
-    def gen_multi_synth(self, n_sim: int, dur: int) -> ndarray:
+    def gen_multi_synth(
+        self, n_sim: int, dur: int, rng: Optional[random.Generator] = None
+    ) -> ndarray:
         """
-        Generates multiple synthetic data points using the Kalman filter.
+        Generates multiple synthetic data points using the Kalman filter, drawing from
+        rng or the filter's own stream.
         """
+        if rng is None:
+            rng = self.rng
+
+        from statsmodels.tsa.statespace.structural import UnobservedComponents
 
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -152,11 +164,10 @@ class KalmanFilter:
             sims = empty(shape=(n_sim, dur))
 
             for i in range(n_sim):
-                sampled_state = random.multivariate_normal(
+                sampled_state = rng.multivariate_normal(
                     results.filtered_state[:, -1], results.filtered_state_cov[:, :, -1]
                 )
-                sim = results.simulate(nsimulations=dur, initial_state=sampled_state)
-                sims[i] = sim
+                sims[i] = simulate(results, dur, sampled_state, rng)
 
         return sims
 
@@ -164,6 +175,9 @@ class KalmanFilter:
         """
         Plots the synthetic data points generated by the Kalman filter.
         """
+        from matplotlib import pyplot as plt
+        from cycler import cycler
+
         plt.style.use("bmh")
         plt.rcParams["figure.dpi"] = 500
         plt.rcParams["font.family"] = "serif"
@@ -230,6 +244,37 @@ class KalmanFilter:
 
         return self._train_data.iloc[-1]
 
+    def snapshot(self) -> dict:
+        """
+        Returns the data seen by the filter and its fitted parameters, from which
+        restore rebuilds the filter without refitting.
+        """
+        return {
+            "train": self._train_data.copy(),
+            "test": self._test_data.copy(),
+            "seen": self._seen_data,
+            "synth": self._synth,
+            "params": self._results.params.copy(),
+            "init_params": self._init_results.params.copy(),
+            "n_init": self._init_results.nobs,
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        """
+        Restores the filter to a snapshot.
+        """
+        # The initial fit is rebuilt first, as the synthetic data is simulated from it
+        self._synth = False
+        self._train_data = snapshot["train"].iloc[: snapshot["n_init"]].copy()
+        self.fit_train(snapshot["init_params"])
+
+        self._synth = snapshot["synth"]
+        self._train_data = snapshot["train"].copy()
+        self._test_data = snapshot["test"].copy()
+        self._seen_data = snapshot["seen"]
+        self.fit_train(snapshot["params"])
+        return None
+
     def check_test(self) -> None:
         """
         Checks if the test data is less than 12 months.
@@ -241,13 +286,10 @@ class KalmanFilter:
             sims = empty(shape=(n_sim, 36))
 
             for i in range(n_sim):
-                sampled_state = random.multivariate_normal(
+                sampled_state = self.rng.multivariate_normal(
                     self.last_state_mean, 0.5 * self.last_state_cov
                 )
-                sim = self._init_results.simulate(
-                    nsimulations=36, initial_state=sampled_state
-                )
-                sims[i] = sim
+                sims[i] = simulate(self._init_results, 36, sampled_state, self.rng)
 
             # Take the mean of the simulations
             sim = sims.mean(axis=0)
@@ -262,6 +304,8 @@ class KalmanFilter:
         """
         Plots the projections from the Kalman filter for the next year
         """
+        from matplotlib import pyplot as plt
+
         forecast = self.predict(12)
         forecast_mean = forecast["predicted_mean"]
         forecast_ci = DataFrame(
@@ -329,6 +373,8 @@ class KalmanFilter:
 
     @staticmethod
     def seasonal_forecast(train, n_pred, season_length, alpha, beta, gamma):
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
         model = ExponentialSmoothing(
             train, trend="add", seasonal="add", seasonal_periods=season_length
         )
@@ -1,6 +1,22 @@
 """ """
 
 
+def simulate(results, nsimulations: int, initial_state, rng):
+    """
+    Simulates a fitted state space model forward from initial_state, drawing the
+    measurement and state shocks from rng rather than the global random state.
+    """
+    model = results.model
+    return results.simulate(
+        nsimulations=nsimulations,
+        initial_state=initial_state,
+        measurement_shocks=rng.standard_normal((nsimulations, model.ssm.k_endog)),
+        state_shocks=rng.standard_normal((nsimulations, model.ssm.k_posdef)),
+        pretransformed_measurement_shocks=False,
+        pretransformed_state_shocks=False,
+    )
+
+
 def muted_color(name):
     muted_colors = {
         "blue": "#1f3b70",
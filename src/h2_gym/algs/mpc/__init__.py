@@ -1,7 +1,11 @@
-from .fast import FastController
-from .slow import SlowController
+from h2_gym._lazy import attach
 
-__all__ = [
-    "FastController",
-    "SlowController",
-]
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "FastController": (".fast", "FastController"),
+        "SlowController": (".slow", "SlowController"),
+        "SurrogatePolicy": (".fast", "SurrogatePolicy"),
+        "ShiftedPlan": (".fast", "ShiftedPlan"),
+    },
+)
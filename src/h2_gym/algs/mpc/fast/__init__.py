@@ -1,5 +1,9 @@
 from .core import FastController
+from .surrogate import SurrogatePolicy
+from .warm_start import ShiftedPlan
 
 __all__ = [
     "FastController",
+    "SurrogatePolicy",
+    "ShiftedPlan",
 ]
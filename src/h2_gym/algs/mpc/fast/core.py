@@ -6,45 +6,219 @@ from __future__ import annotations
 from pyomo.environ import (
     AbstractModel,
     SolverFactory,
+    TransformationFactory,
     value,
     Set,
     Param,
     Var,
     Constraint,
     Objective,
+    maximize,
     Reals,
     Any,
 )
-from .utils import add_equations, suppress_output, ext_visualise_output
+from .utils import (
+    add_equations,
+    suppress_output,
+    ext_visualise_output,
+    accepts_warmstart,
+    install_start,
+    time_limit_kwargs,
+    has_incumbent,
+)
+from .warm_start import WARM_VARS, ShiftedPlan
+from .scenarios import (
+    RULES,
+    thaw,
+    with_param,
+    flat_decisions,
+    solve_task,
+    init_worker,
+    solve_worker,
+)
+from pyomo.common.errors import PyomoException
+from concurrent.futures import ProcessPoolExecutor
+from ...store.utils import stable_hash
 from typing import Optional
-from h2_plan.data import DefaultParams
-from h2_gym.envs import Planning
-import matplotlib
-import matplotlib.pyplot as plt
+import numpy as np
 import logging
+import time
 
 
-matplotlib.use("TkAgg")
+# Ways of solving the MPC problem
+MODES = ("exact", "fix_and_relax")
+# Solve paths whose plans are kept in the cache and store
+EXACT_PATHS = ("optimal", "lexicographic")
+# Paths whose plan is set without a solve, so it is not checked for feasibility
+UNCHECKED_PATHS = ("previous", "rounded")
+# Share of a time limit kept back for the fallbacks
+FALLBACK_SHARE = 0.25
 
 
 class FastController:
     """ """
 
-    def __init__(self):
+    def __init__(
+        self,
+        store=None,
+        solver="gurobi",
+        solver_options=None,
+        surrogate=None,
+        warm_start=None,
+        cache=None,
+        time_limit: Optional[float] = None,
+        fallbacks: tuple = ("relax", "shifted"),
+        mode: str = "exact",
+        check_every: int = 0,
+        n_workers: int = 1,
+    ):
+        """
+        Initializes the controller. The solver is a pyomo solver name or any object with
+        a solve method and an options dict. With a SolutionStore, solves are looked up
+        by the model data, the update inputs and the solver settings before solving;
+        only solves that ended on an optimal or lexicographic plan are stored.
+        With a trained SurrogatePolicy, solves are predicted by it instead, falling back
+        to the solver when the inputs are off-distribution or the prediction infeasible.
+        A warm-start predictor, such as ShiftedPlan, guesses the integer decisions before
+        each solve; the guess is installed as the initial solution and each solve is
+        logged in warm_start_log. An LRUCache is looked up before the store, which it
+        then keeps behind it, by quantised hashes of the start values and update inputs.
+        With a time_limit in seconds, a solve that runs out of time returns its best
+        incumbent, or without one tries the fallbacks in turn: "relax" rounds the LP
+        relaxation and "shifted" replays the previous plan, each fixing the integer
+        decisions and solving for the rest. The fallbacks share the time left, with a
+        quarter of the limit kept back for them, and if none finds a plan the previous
+        plan is replayed unsolved. The path taken is kept in path. In the
+        "fix_and_relax" mode the MILP is replaced by a sequence of LPs that fix the
+        daily decisions one day at a time; every check_every such solves the exact
+        MILP is solved too and the optimality gap logged in heuristic_log. Given wind
+        scenarios with set_scenarios, each scenario is solved separately, in n_workers
+        processes if more than one, and the plan of one scenario is picked to carry
+        out. The pick is a heuristic, not a stochastic programme: nothing makes the
+        first-day decisions agree across scenarios.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown solve mode {mode}")
         self.model1 = AbstractModel()
         self.model2 = AbstractModel()
+        self.store = store
+        self.cache = cache
+        if cache is not None and store is not None:
+            if cache.store is not None and cache.store is not store:
+                raise ValueError("The cache is already backed by another store")
+            cache.store = store
+        self._solver = solver
+        self.solver_name = solver if isinstance(solver, str) else type(solver).__name__
+        self.solver = SolverFactory(solver) if isinstance(solver, str) else solver
+        if solver_options is not None:
+            self.solver_options = solver_options
+        elif solver == "gurobi":
+            self.solver_options = {
+                "mipgap": 0.05,
+                "FeasibilityTol": 1e-6,
+                "OptimalityTol": 1e-8,
+            }
+        else:
+            self.solver_options = {}
+        self._build_key = None
+        self._inputs = None
+        self._stored = False
+        self._decisions = None
+        self.source = "solve"
+        self.surrogate = surrogate
+        self.surrogate_stats = {
+            "predicted": 0,
+            "no_start": 0,
+            "off_distribution": 0,
+            "infeasible": 0,
+        }
+        self._pending = None
+        self.warm_start = warm_start
+        self.warm_start_log = []
+        self.warm_started = 0
+        self._warmstart = accepts_warmstart(self.solver)
+        self._last_update = (None, None)
+        self.time_limit = time_limit
+        self.fallbacks = tuple(fallbacks)
+        self.path = "optimal"
+        self.mode = mode
+        self.check_every = check_every
+        self.heuristic_log = []
+        self._shifted = None
+        self._integers = ()
+        self._daily = ()
+        self._days = ()
+        self.n_workers = n_workers
+        self.scenario_results = None
+        self._scenarios = None
+        self._scenario_fast = None
+        self._pool = None
+        self._data = None
+        self._loader = None
+        self._params = None
+        self._domains = None
         self._update_keys = None
-        self._fig, self._axs = plt.subplots(2, 3, figsize=(18, 10), sharex=True)
+        self._fig, self._axs = None, None
         self._run_count = 0
         pass
 
     def render(self):
+        return self.figure()
+
+    def figure(self):
+        """
+        Returns the figure of the controller, creating it on first use so the
+        controller can be built without a display.
+        """
+        if self._fig is None:
+            import matplotlib.pyplot as plt
+
+            self._fig, self._axs = plt.subplots(2, 3, figsize=(18, 10), sharex=True)
         return self._fig
 
-    def build(self, data: dict):
+    def build(self, data: dict, loader: Optional[tuple] = None):
         """
-        This function builds the MPC problem
+        This function builds the MPC problem, replacing any built before. Worker
+        processes cannot receive the rules of the model, so with several workers loader
+        must be a picklable (function, args) pair returning the equations, constraints
+        and objectives.
         """
+        if self.n_workers > 1 and loader is None:
+            raise ValueError(
+                "A loader is needed to build the model in worker processes"
+            )
+        # Workers and the scenario controller hold the data of the last build
+        self.close()
+        self._data = data
+        self._loader = loader
+        self._scenario_fast = None
+        self._scenarios = None
+
+        self.model1 = AbstractModel()
+        self.model2 = AbstractModel()
+        self._update_keys = None
+        self._pending = None
+        self._params = data["params"]
+        self._domains = {
+            key: var["domain"].get_interval() for key, var in data["vars"].items()
+        }
+        self._integers = tuple(
+            key for key, (_, _, step) in self._domains.items() if step == 1
+        )
+        self._shifted = ShiftedPlan(variables=tuple(data["vars"]))
+        # Integer decisions taken once a day, indexed by the daily grid alone, which
+        # fix-and-relax fixes day by day
+        self._days = tuple(data["sets"]["grid1"])
+        self._daily = tuple(
+            key
+            for key in self._integers
+            if [tuple(index) for index in data["vars"][key]["time_duration"]]
+            == [self._days]
+        )
+
+        if self._lookup is not None:
+            self._build_key = stable_hash(data)
+
         for key, set_ in data["sets"].items():
             setattr(self.model1, key, Set(initialize=list(set_)))
             getattr(self.model1, key).construct()
@@ -118,50 +292,663 @@ class FastController:
 
         pass
 
+    @property
+    def _lookup(self):
+        """
+        Returns the cache, or without one the store, that solves are looked up in.
+        """
+        return self.cache if self.cache is not None else self.store
+
     def solve(self, supress):
         """
         This function solves the MPC problem
         """
+        key = None
+        self._stored = False
+        self.source = "solve"
+
+        self.scenario_results = None
+        if self._pending is not None:
+            predicted = self.surrogate_solve()
+            if predicted is not None:
+                return predicted
+            self._update(*self._pending)
+            self._pending = None
+
+        lookup = self._lookup
+        if lookup is not None:
+            key = lookup.key(
+                kind="fast_controller",
+                model=self._build_key,
+                fixed=bool(value(self.model1.fixed)),
+                inputs=self._inputs,
+                scenarios=self._scenarios,
+                solver={"name": self.solver_name, "options": self.solver_options},
+                time_limit=self.time_limit,
+                fallbacks=self.fallbacks,
+                mode=self.mode,
+            )
+            stored = lookup.get(key)
+            if stored is not None:
+                self._stored = True
+                self.source = "cache" if lookup is self.cache else "store"
+                return self.load_output(*stored)
+
+        if self._scenarios is not None:
+            end_states, stochastic_output = self.scenario_solve(supress)
+            if key is not None and self.path in EXACT_PATHS:
+                self._put(lookup, key, end_states, stochastic_output)
+            return end_states, stochastic_output
+
+        # The time limit covers building the instances as well as solving them
+        deadline = end = None
+        if self.time_limit is not None:
+            end = time.perf_counter() + self.time_limit
+            deadline = end - FALLBACK_SHARE * self.time_limit * bool(self.fallbacks)
+
         self.instance1 = self.model1.create_instance()
         self.instance2 = self.model2.create_instance()
 
-        self.solver = SolverFactory("gurobi")
-        self.solver.options["mipgap"] = 0.05
-        self.solver.options["FeasibilityTol"] = 1e-6
-        self.solver.options["OptimalityTol"] = 1e-8
-
-        with suppress_output(supress):
-            self.results = self.solver.solve(self.instance1, tee= supress)
+        for option, val in self.solver_options.items():
+            self.solver.options[option] = val
 
+        self.path = "optimal"
         self.lexicographic = 1
+        if self.mode == "fix_and_relax" and self._fix_and_relax(
+            self.instance1, supress, deadline
+        ):
+            self.path = "fix_and_relax"
+        else:
+            self.results = self._solve_instance(self.instance1, supress, 1, deadline)
+
+            if not self._timed_out(self.results) and (
+                self.results.solver.termination_condition != "optimal"
+            ):
+                print("[INFO] Infeasible problem, solving lexicographically")
+                self.results = self._solve_instance(
+                    self.instance2, supress, 2, deadline
+                )
+                self.lexicographic = 2
+                self.path = "lexicographic"
+
+            if self._timed_out(self.results):
+                solve = self.instance1 if self.lexicographic == 1 else self.instance2
+                if has_incumbent(self.results):
+                    self.path = "incumbent"
+                else:
+                    self.path = self._fallback(solve, supress, end)
+
+        solve = self.instance1 if self.lexicographic == 1 else self.instance2
+        self._observe(self._solution(solve, self._shifted.variables))
+
+        if key is None or self.path not in EXACT_PATHS:
+            return self.output()
+
+        end_states, stochastic_output = self.output()
+        self._put(lookup, key, end_states, stochastic_output)
+        return end_states, stochastic_output
+
+    def _observe(self, solution: dict) -> None:
+        """
+        Passes the solution of a solve to the warm-start predictor and the shifted plan.
+        """
+        if self.warm_start is not None and hasattr(self.warm_start, "observe"):
+            names = getattr(self.warm_start, "variables", WARM_VARS)
+            self.warm_start.observe(
+                {key: val for key, val in solution.items() if key[0] in names}
+            )
+        self._shifted.observe(solution)
+        return None
+
+    def _put(self, lookup, key: str, end_states: dict, stochastic_output: dict):
+        """
+        Stores the output of a solve under key.
+        """
+        values = [np.nan if val is None else val for val in end_states.values()]
+        lookup.put(
+            key,
+            {"values": np.array(values, dtype=float)},
+            {
+                "keys": [list(k) for k in end_states],
+                "stochastic_output": stochastic_output,
+                "lexicographic": self.lexicographic,
+                "decisions": self.decisions(),
+            },
+            kind="fast_controller",
+        )
+        return None
+
+    def set_scenarios(
+        self,
+        values: np.ndarray,
+        name: str = "energy_wind",
+        probabilities: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Sets scenarios of an exogenous parameter for the next solve, one row of values
+        over the horizon per scenario, equally likely unless probabilities are given.
+        None returns to a single deterministic solve.
+        """
+        if values is None:
+            self._scenarios = None
+            return None
+        values = np.asarray(values, dtype=float)
+        if probabilities is None:
+            probabilities = np.full(len(values), 1.0 / len(values))
+        self._scenarios = {
+            "name": name,
+            "values": values,
+            "probabilities": np.asarray(probabilities, dtype=float),
+        }
+        return None
+
+    def scenario_solve(self, supress) -> tuple:
+        """
+        Solves the last update once per scenario, each as if its wind were known, and
+        picks the scenario whose first-day decisions are closest to their expected
+        value. This is a heuristic pick, not a stochastic programme: the scenarios do
+        not share their first-day decisions, so the plan carried out is optimal only
+        for the scenario picked and is not checked against the others. Its solution is
+        observed as the plan of the solve, and every scenario starts its fallbacks from
+        the plan observed last. In scenario_results, agreement is the probability of
+        the scenarios whose first-day decisions match the pick, and
+        expected_objective the mean of the scenario optima, not the value of the pick.
+        """
+        stochastic_values, start_values = self._last_update
+        fixed = bool(value(self.model1.fixed))
+        name = self._scenarios["name"]
+        shifted = self._shifted.snapshot()
+        tasks = [
+            {
+                "scenario": k,
+                "stochastic": with_param(stochastic_values, name, row),
+                "start": start_values,
+                "fixed": fixed,
+                "shifted": shifted,
+            }
+            for k, row in enumerate(self._scenarios["values"])
+        ]
+        start = time.perf_counter()
+        results = self.solve_scenarios(tasks, supress)
+        seconds = time.perf_counter() - start
+
+        prob = self._scenarios["probabilities"]
+        decisions = np.array([flat_decisions(res["decisions"]) for res in results])
+        expected = prob @ decisions
+        chosen = int(np.argmin(np.abs(decisions - expected).sum(axis=1)))
+        result = results[chosen]
+
+        self.scenario_results = {
+            "chosen": chosen,
+            "expected_decisions": expected,
+            "agreement": float(prob @ np.all(decisions == decisions[chosen], axis=1)),
+            "expected_objective": float(prob @ [res["objective"] for res in results]),
+            "seconds": seconds,
+            "scenario_seconds": [res["seconds"] for res in results],
+        }
+        self.source = "scenarios"
+        self.path = result["path"]
+        self.lexicographic = result["lexicographic"]
+        self._decisions = result["decisions"]
+        self._observe(result["solution"])
+        getattr(self.model1, "fixed").set_value(True)
+        getattr(self.model2, "fixed").set_value(True)
+        return result["end_states"], result["stochastic_output"]
+
+    def solve_scenarios(self, tasks: list, supress: bool = True) -> list:
+        """
+        Solves the scenario tasks, in the worker pool if there is more than one worker.
+        """
+        settings = {
+            "solver": self._solver,
+            "solver_options": self.solver_options,
+            "time_limit": self.time_limit,
+            "fallbacks": self.fallbacks,
+            "mode": self.mode,
+        }
+        if self.n_workers > 1:
+            if self._pool is None:
+                data = {
+                    key: thaw(val) for key, val in self._data.items() if key not in RULES
+                }
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.n_workers,
+                    initializer=init_worker,
+                    initargs=(data, self._loader, settings),
+                )
+            chunks = [tasks[i :: self.n_workers] for i in range(self.n_workers)]
+            results = [
+                res
+                for chunk in self._pool.map(solve_worker, [c for c in chunks if c])
+                for res in chunk
+            ]
+            return sorted(results, key=lambda res: res["scenario"])
+
+        if self._scenario_fast is None:
+            self._scenario_fast = FastController(**settings)
+            self._scenario_fast.build(self._data)
+        return [
+            solve_task(self._scenario_fast, task, self._data, supress) for task in tasks
+        ]
+
+    def close(self) -> None:
+        """
+        Shuts down the scenario worker pool, if one was started.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return None
+
+    def _solve_instance(
+        self, instance, supress, stage, deadline: Optional[float] = None
+    ):
+        """
+        Solves an instance within the time left before the deadline, first installing
+        the guess of the warm-start predictor as its initial solution. Returns None if
+        the solver gave up without a solution when out of time, or if no time is left.
+        """
+        # Persistent solvers load the instance before their time limit starts counting
+        if deadline is not None and getattr(self.solver, "_model", instance) is not instance:
+            with suppress_output(supress):
+                self.solver.set_instance(instance)
+
+        # Without a deadline any limit left on the solver by an earlier solve is lifted
+        remaining = None
+        if self.time_limit is not None and deadline is not None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Some solvers read a limit of zero as no limit at all
+                return None
+
+        kwargs = {}
+        self.warm_started = 0
+        if self.warm_start is not None and stage in (1, 2):
+            guess = self.warm_start.predict(*self._last_update) or {}
+            self.warm_started = install_start(instance, guess)
+            if self.warm_started and self._warmstart:
+                kwargs["warmstart"] = True
+        kwargs.update(
+            time_limit_kwargs(self.solver, self.solver_name, remaining, instance)
+        )
+
+        start = time.perf_counter()
+        try:
+            with suppress_output(supress):
+                results = self.solver.solve(instance, tee=supress, **kwargs)
+        except (RuntimeError, PyomoException):
+            # Some solvers raise when stopped before finding a solution to load
+            if deadline is None:
+                raise
+            results = None
+        seconds = time.perf_counter() - start
+
+        if self.warm_start is not None:
+            self.warm_start_log.append(
+                {
+                    "stage": stage,
+                    "installed": self.warm_started,
+                    "seconds": seconds,
+                    "termination": (
+                        "none"
+                        if results is None
+                        else str(results.solver.termination_condition)
+                    ),
+                }
+            )
+        return results
+
+    def _timed_out(self, results) -> bool:
+        """
+        Returns whether a time-limited solve ran out of time.
+        """
+        if self.time_limit is None:
+            return False
+        return results is None or (
+            str(results.solver.termination_condition) == "maxTimeLimit"
+        )
+
+    def _solution(self, instance, names) -> dict:
+        """
+        Returns the values of the named variables of a solved instance.
+        """
+        return {
+            (name, index): value(var[index], exception=False)
+            for name in names
+            if hasattr(instance, name)
+            for var in [getattr(instance, name)]
+            for index in var
+        }
+
+    def _fallback(self, instance, supress, deadline: float) -> str:
+        """
+        Tries the fallbacks in turn within the time left before the deadline after a
+        solve ran out of time without a solution, returning the name of the first that
+        found a feasible plan, or of the last resort if none did.
+        """
+        for name in self.fallbacks:
+            if name == "relax":
+                found = self._relax_and_round(instance, supress, deadline)
+            elif name == "shifted":
+                guess = {
+                    key: val
+                    for key, val in self._shifted.predict(*self._last_update).items()
+                    if key[0] in self._integers
+                }
+                found = bool(guess) and self._fix_and_solve(
+                    instance, guess, supress, "shifted", deadline
+                )
+            else:
+                raise ValueError(f"Unknown fallback {name}")
+            if found:
+                print(f"[INFO] Out of time, using the {name} fallback")
+                return name
+        return self._last_resort(instance, supress, deadline)
 
-        if self.results.solver.termination_condition != "optimal":
-            print("[INFO] Infeasible problem, solving lexicographically")
-            self.results = self.solver.solve(self.instance2, tee= supress)
-            self.lexicographic = 2
+    def _last_resort(self, instance, supress, deadline: Optional[float]) -> str:
+        """
+        Sets a plan without solving the MILP once every fallback failed: the previous
+        plan moved forward a day, or on the first solve of an episode the LP relaxation,
+        solved within the time left, with its integer decisions rounded. Neither is
+        checked for feasibility, so no solver results are kept for them.
+        """
+        previous = self._shifted.predict(*self._last_update)
+        if previous:
+            install_start(instance, previous)
+            self.results = None
+            print("[NOTE] No fallback found a plan, replaying the previous plan")
+            return "previous"
+
+        print("[NOTE] No fallback found a plan, rounding the LP relaxation")
+        relax = TransformationFactory("core.relax_integer_vars")
+        reverse = relax.apply_to(instance)
+        try:
+            results = self._solve_instance(instance, supress, "rounded", deadline)
+        finally:
+            relax.apply_to(instance, reverse=reverse)
+        self.results = None
+        if results is None:
+            raise RuntimeError(
+                f"No plan for the MPC problem was found within {self.time_limit}s"
+            )
+        if not self._optimal(results):
+            raise RuntimeError("The LP relaxation of the MPC problem has no solution")
+        install_start(instance, self._solution(instance, self._integers))
+        return "rounded"
+
+    def _relax_and_round(self, instance, supress, deadline: float) -> bool:
+        """
+        Solves the LP relaxation of an instance, then fixes the integer decisions to
+        its rounded values and solves for the rest.
+        """
+        relax = TransformationFactory("core.relax_integer_vars")
+        reverse = relax.apply_to(instance)
+        try:
+            results = self._solve_instance(instance, supress, "relax", deadline)
+        finally:
+            relax.apply_to(instance, reverse=reverse)
+        if results is None or str(results.solver.termination_condition) != "optimal":
+            return False
+        guess = self._solution(instance, self._integers)
+        return self._fix_and_solve(instance, guess, supress, "relax", deadline)
+
+    def _fix_and_solve(
+        self, instance, guess: dict, supress, stage: str, deadline: float
+    ) -> bool:
+        """
+        Holds the free integer variables in the guess at it and solves for the others.
+        Returns whether the solve was optimal.
+        """
+        held = self._hold(instance, guess)
+        self.results = self._solve_instance(instance, supress, stage, deadline)
+        self._release(held)
+        return self._optimal(self.results)
+
+    def _hold(self, instance, guess: dict) -> list:
+        """
+        Holds the free variables in the guess at it, rounded and within their bounds,
+        returning their previous bounds. The variables are held by their bounds rather
+        than fixed, which persistent solvers update without rebuilding the constraints.
+        """
+        held = []
+        for (name, index), val in guess.items():
+            var = getattr(instance, name, None)
+            if val is None or var is None or index not in var or var[index].fixed:
+                continue
+            var = var[index]
+            val = round(val)
+            if var.lb is not None:
+                val = max(val, var.lb)
+            if var.ub is not None:
+                val = min(val, var.ub)
+            held.append((var, var.lower, var.upper))
+            var.setlb(val)
+            var.setub(val)
+        return held
+
+    @staticmethod
+    def _release(held: list) -> None:
+        """
+        Restores the bounds of held variables.
+        """
+        for var, lower, upper in held:
+            var.setlb(lower)
+            var.setub(upper)
+        return None
+
+    @staticmethod
+    def _optimal(results) -> bool:
+        return results is not None and (
+            str(results.solver.termination_condition) == "optimal"
+        )
+
+    def _fix_and_relax(self, instance, supress, deadline: Optional[float]) -> bool:
+        """
+        Solves the LP relaxation of an instance, then walks through the days of the
+        horizon, rounding and holding the daily decisions of each and solving the
+        relaxation again only when a later day is left fractional. The remaining
+        integer variables are then rounded and held, and a last LP solves for the
+        continuous flows. Returns whether a feasible plan was found.
+        """
+        start = time.perf_counter()
+        relax = TransformationFactory("core.relax_integer_vars")
+        reverse = relax.apply_to(instance)
+        held = []
+        try:
+            self.results = self._solve_instance(instance, supress, "relaxed", deadline)
+            for k, day in enumerate(self._days):
+                if not self._optimal(self.results):
+                    return False
+                held += self._hold(instance, self._solution_at(instance, day))
+                later = [
+                    var[t]
+                    for name in self._daily
+                    for var in [getattr(instance, name)]
+                    for t in self._days[k + 1 :]
+                    if t in var and not var[t].fixed
+                ]
+                if any(abs(v.value - round(v.value)) > 1e-6 for v in later):
+                    self.results = self._solve_instance(
+                        instance, supress, "relaxed", deadline
+                    )
 
-        return self.output()
+            if not self._optimal(self.results):
+                return False
+            held += self._hold(instance, self._solution(instance, self._integers))
+            self.results = self._solve_instance(instance, supress, "fixed", deadline)
+        finally:
+            relax.apply_to(instance, reverse=reverse)
+            self._release(held)
+
+        if not self._optimal(self.results):
+            return False
+        seconds = time.perf_counter() - start
+
+        entry = {"seconds": seconds, "objective": self._objective(instance)}
+        if self.check_every and len(self.heuristic_log) % self.check_every == 0:
+            entry.update(self._check_gap(instance, supress, entry["objective"]))
+        self.heuristic_log.append(entry)
+        return True
+
+    def _solution_at(self, instance, day: int) -> dict:
+        """
+        Returns the values of the daily decisions of one day.
+        """
+        return {
+            (name, day): value(getattr(instance, name)[day], exception=False)
+            for name in self._daily
+            if day in getattr(instance, name)
+        }
+
+    @staticmethod
+    def _objective(instance) -> float:
+        """
+        Returns the value of the active objective of a solved instance.
+        """
+        objective = next(instance.component_data_objects(Objective, active=True))
+        return value(objective)
+
+    def _check_gap(self, instance, supress, objective: float) -> dict:
+        """
+        Solves an instance holding a heuristic plan exactly and returns the relative
+        gap of the heuristic objective to the exact one. The heuristic plan is put back
+        afterwards, so the check does not change the output.
+        """
+        variables = list(instance.component_data_objects(Var))
+        plan = [var.value for var in variables]
+
+        start = time.perf_counter()
+        results = self._solve_instance(instance, supress, "exact")
+        seconds = time.perf_counter() - start
+        exact = self._objective(instance) if self._optimal(results) else None
+        for var, val in zip(variables, plan):
+            var.set_value(val, skip_validation=True)
+        if exact is None:
+            return {"exact_seconds": seconds, "exact_objective": None, "gap": None}
+
+        sense = next(instance.component_data_objects(Objective, active=True)).sense
+        loss = exact - objective if sense == maximize else objective - exact
+        gap = loss / max(abs(exact), 1e-9)
+        print(f"[INFO] Fix-and-relax gap to the exact solve: {100 * gap:.2f}%")
+        return {"exact_seconds": seconds, "exact_objective": exact, "gap": gap}
+
+    def warm_start_summary(self) -> dict:
+        """
+        Returns the number and mean time of the logged solves with and without an
+        installed warm start.
+        """
+        summary = {}
+        for label, warm in (("warm", True), ("cold", False)):
+            seconds = [
+                entry["seconds"]
+                for entry in self.warm_start_log
+                if bool(entry["installed"]) == warm
+            ]
+            summary[label] = {
+                "solves": len(seconds),
+                "mean_seconds": float(np.mean(seconds)) if seconds else None,
+            }
+        return summary
+
+    def load_output(self, arrays: dict, meta: dict):
+        """
+        Rebuilds the output of a stored solve.
+        """
+        end_states = {
+            (name, tuple(index) if isinstance(index, list) else index): (
+                None if np.isnan(val) else float(val)
+            )
+            for (name, index), val in zip(meta["keys"], arrays["values"])
+        }
+        self.lexicographic = meta["lexicographic"]
+        self._decisions = meta.get("decisions")
+
+        getattr(self.model1, "fixed").set_value(True)
+        getattr(self.model2, "fixed").set_value(True)
+
+        return end_states, meta["stochastic_output"]
+
+    def surrogate_solve(self) -> Optional[tuple]:
+        """
+        Predicts the solve for the pending update with the surrogate. Returns None,
+        counting the reason, when there are no start values, the inputs are
+        off-distribution or the prediction is infeasible.
+        """
+        stochastic_values, start_values = self._pending
+        if start_values is None:
+            self.surrogate_stats["no_start"] += 1
+            return None
+
+        features = self.surrogate.features(stochastic_values, start_values)
+        prediction = self.surrogate.predict(features)
+        if prediction is None:
+            self.surrogate_stats["off_distribution"] += 1
+            return None
+
+        decoded = self.surrogate.decode(prediction, self._params, self._domains)
+        if decoded is None:
+            self.surrogate_stats["infeasible"] += 1
+            return None
+
+        self._decisions, end_states = decoded
+        self.surrogate_stats["predicted"] += 1
+        self.source = "surrogate"
+        self.lexicographic = 0
+        getattr(self.model1, "fixed").set_value(True)
+        getattr(self.model2, "fixed").set_value(True)
+
+        # The prediction answers the pending update as a solve would
+        self._last_update = self._pending
+        self._pending = None
+        self._observe(self._surrogate_plan(self._decisions))
+
+        stochastic_output = {
+            "ordered_ship": self._decisions["n_ship_ordered"],
+            "sent_ship": self._decisions["n_ship_sent"],
+        }
+        return end_states, stochastic_output
+
+    def _surrogate_plan(self, decisions: dict) -> dict:
+        """
+        Returns the plan of a surrogate prediction: the plan observed last moved on by
+        one day, with the predicted first-day decisions in place of its own.
+        """
+        plan = dict(self._shifted.predict(*self._last_update))
+        for name in ["n_ship_ordered", "n_ship_sent"]:
+            plan[(name, 0)] = decisions[name]
+        for t, val in enumerate(decisions["n_active_trains_conversion"]):
+            plan[("n_active_trains_conversion", t)] = val
+        return plan
 
     def update(self, stochastic_values, start_values: Optional[dict] = None):
         """
-        This function updates the MPC problem
+        This function updates the MPC problem. With a surrogate the update is held
+        back and only applied to the models if the surrogate falls back to a solve.
         """
-        
+        if self._lookup is not None:
+            self._inputs = {"stochastic": stochastic_values, "start": start_values}
 
+        if self.surrogate is not None:
+            self._pending = (stochastic_values, start_values)
+            return None
+
+        return self._update(stochastic_values, start_values)
+
+    def _update(self, stochastic_values, start_values: Optional[dict] = None):
+        """
+        Applies an update to both models.
+        """
+        self._last_update = (stochastic_values, start_values)
         if start_values is None:
             self.stochastic_update(data=stochastic_values)
             return None
-        print(f"{start_values['n_ship_ordered',0] = }")
-        print(f"{start_values['n_ship_sent',0] = }")
-        print(f"{start_values['waiting_ships',0] = }")
-        print(f"{start_values['cumulative_charge',0] = }")
         for var in self.model1.component_objects(Var, active=True):
             for index in var:
                 key = (var.name, index)
                 if key in start_values:
                     var[index].fix(start_values[key])
 
-        for var in self.model1.component_objects(Var, active=True):
+        for var in self.model2.component_objects(Var, active=True):
             for index in var:
                 key = (var.name, index)
                 if key in start_values:
@@ -171,6 +958,75 @@ class FastController:
 
         return None
 
+    def decisions(self, time_step: int = 24) -> dict:
+        """
+        Returns the decisions of the last solve that are carried out before the next
+        one: the ships ordered and sent over the first day and the hourly number of
+        active conversion trains.
+        """
+        if self.source != "solve":
+            return self._decisions
+
+        solve = self.instance1 if self.lexicographic == 1 else self.instance2
+        return {
+            "n_ship_ordered": sum(
+                value(solve.n_ship_ordered[t]) for t in range(0, time_step, 24)
+            ),
+            "n_ship_sent": sum(
+                value(solve.n_ship_sent[t]) for t in range(0, time_step, 24)
+            ),
+            "n_active_trains_conversion": [
+                value(solve.n_active_trains_conversion[t]) for t in range(time_step)
+            ],
+        }
+
+    def snapshot(self) -> dict:
+        """
+        Returns the fixed start values and the fixed flag of both models, with the
+        plans kept by the shifted fallback and by a warm-start predictor that has a
+        snapshot method, as they change the next solve.
+        """
+        snapshot = {
+            name: {
+                "fixed": bool(value(model.fixed)),
+                "start": {
+                    (var.name, index): var[index].value
+                    for var in model.component_objects(Var)
+                    for index in var
+                    if var[index].fixed
+                },
+            }
+            for name, model in (("model1", self.model1), ("model2", self.model2))
+        }
+        snapshot["shifted"] = None
+        if self._shifted is not None:
+            snapshot["shifted"] = self._shifted.snapshot()
+        snapshot["warm_start"] = None
+        if hasattr(self.warm_start, "snapshot"):
+            snapshot["warm_start"] = self.warm_start.snapshot()
+        return snapshot
+
+    def restore(self, snapshot: dict) -> None:
+        """
+        Restores the fixed start values, fixed flags and predictor plans of a built
+        controller.
+        """
+        for name, model in (("model1", self.model1), ("model2", self.model2)):
+            start = snapshot[name]["start"]
+            for var in model.component_objects(Var):
+                for index in var:
+                    key = (var.name, index)
+                    if key in start:
+                        var[index].fix(start[key])
+                    elif var[index].fixed:
+                        var[index].unfix()
+            model.fixed.set_value(snapshot[name]["fixed"])
+        if self._shifted is not None:
+            self._shifted.restore(snapshot.get("shifted"))
+        if hasattr(self.warm_start, "restore"):
+            self.warm_start.restore(snapshot.get("warm_start"))
+        return None
+
     def output(self, time_step: int = 24):
         """
         This function outputs the MPC problem
@@ -268,9 +1124,13 @@ class FastController:
         """
         Extracts latent states and dynamically updates plots across runs.
         """
-    
+        if self.source != "solve":
+            # No instance was solved, so there is nothing new to plot
+            return None
+
         solve = self.instance1 if self.lexicographic == 1 else self.instance2
-        
+        self.figure()
+
         self._joined_data = ext_visualise_output(
             solve=solve,
             axs=self._axs,
@@ -0,0 +1,95 @@
+"""
+This defines the scenario solves of the stochastic fast loop, run in the controller's
+process or in worker processes.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from collections.abc import Mapping
+import numpy as np
+import time
+
+# Parts of the model data holding its rules, which cannot be sent to a worker
+RULES = ("equations", "constraints", "objectives")
+
+
+def thaw(data):
+    """
+    Returns a picklable copy of nested mappings and sequences, such as a read-only
+    spec, as dicts and lists.
+    """
+    if isinstance(data, Mapping):
+        return {key: thaw(val) for key, val in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [thaw(val) for val in data]
+    return data
+
+
+def with_param(stochastic_values: dict, name: str, values: np.ndarray) -> dict:
+    """
+    Returns a copy of the update inputs with the values of one parameter replaced.
+    """
+    entry = stochastic_values[name]
+    param = {**entry["param"], "initialize": [float(val) for val in values]}
+    return {**stochastic_values, name: {**entry, "param": param}}
+
+
+def flat_decisions(decisions: dict) -> np.ndarray:
+    """
+    Returns the first-day decisions of a solve as one vector.
+    """
+    return np.concatenate([np.atleast_1d(val) for val in decisions.values()]).astype(
+        float
+    )
+
+
+def solve_task(fast, task: dict, data: dict, supress: bool = True) -> dict:
+    """
+    Solves one scenario with a controller of its own, matching the fixed flag and the
+    shifted plan of the main controller. The models are rebuilt at the start of an
+    episode, when there are no start values yet.
+    """
+    if task["start"] is None:
+        fast.build(data)
+    fast.model1.fixed.set_value(task["fixed"])
+    fast.model2.fixed.set_value(task["fixed"])
+    fast._shifted.restore(task["shifted"])
+    fast.update(task["stochastic"], task["start"])
+
+    start = time.perf_counter()
+    end_states, stochastic_output = fast.solve(supress)
+    solve = fast.instance1 if fast.lexicographic == 1 else fast.instance2
+    return {
+        "scenario": task["scenario"],
+        "end_states": end_states,
+        "stochastic_output": stochastic_output,
+        "decisions": fast.decisions(),
+        "objective": fast._objective(solve),
+        "lexicographic": fast.lexicographic,
+        "path": fast.path,
+        "solution": fast._solution(solve, fast._shifted.variables),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def init_worker(data: dict, loader: Optional[tuple], settings: dict) -> None:
+    """
+    Initialises a worker process with a controller of its own. The rules of the model
+    cannot be sent to a worker, so the worker calls loader, a (function, args) pair,
+    to import them itself.
+    """
+    from .core import FastController
+
+    global _DATA, _FAST
+    _DATA = dict(data)
+    if loader is not None:
+        _DATA.update(loader[0](*loader[1]))
+    _FAST = FastController(**settings)
+    _FAST.build(_DATA)
+
+
+def solve_worker(tasks: list) -> list:
+    """
+    Solves a chunk of scenarios in a worker process.
+    """
+    return [solve_task(_FAST, task, _DATA) for task in tasks]
@@ -0,0 +1,286 @@
+"""
+This defines a learned surrogate of the inner loop that predicts the day-ahead
+decisions and end states of the fast-loop MILP from the inputs of the controller.
+"""
+
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+
+# Inputs of FastController.update and the dataset columns recording them
+INPUTS = {
+    "energy_wind": "forecast.wind",
+    "ship_schedule": "inputs.ship_schedule",
+    "expected_ships": "inputs.expected_ships",
+    "ship_arrived": "inputs.ship_arrived",
+}
+
+# Decisions of the day, with the number of values each takes
+DECISIONS = {"n_ship_ordered": 1, "n_ship_sent": 1, "n_active_trains_conversion": 24}
+
+# Upper limits of predicted values given by a parameter of the model
+LIMITS = {
+    "hydrogen_storage": "hydrogen_storage_capacity",
+    "vector_storage": "vector_storage_capacity",
+    "n_active_trains_conversion": "conversion_trains_number",
+}
+
+
+def as_vector(param: dict) -> np.ndarray:
+    """
+    Returns the values of an update input as a vector, in the order of its set.
+    """
+    init = param["initialize"]
+    if param["set"] is None:
+        return np.atleast_1d(np.asarray(init, dtype=float))
+    if isinstance(init, dict):
+        return np.array([init.get(t, 0) for t in param["set"]], dtype=float)
+    return np.asarray(init, dtype=float)
+
+
+class SurrogatePolicy:
+    """
+    Multilayer perceptron in NumPy mapping the controller inputs and start values to
+    the day's decisions and the end states. Inputs and outputs are standardised with
+    the statistics of the training data, which also set the region where predictions
+    are trusted: inputs more than z_max standard deviations out are off-distribution.
+    """
+
+    def __init__(
+        self,
+        states: list,
+        hidden: tuple = (128, 64),
+        z_max: float = 4.0,
+        tol: float = 0.25,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Initializes an untrained surrogate predicting the named end states. Predictions
+        more than tol outside a bound or away from an integer are infeasible.
+        """
+        self.states = list(states)
+        self.hidden = tuple(hidden)
+        self.z_max = z_max
+        self.tol = tol
+        self._rng = np.random.default_rng(seed)
+        self.weights = None
+        self.stats = None
+
+    @classmethod
+    def from_dataset(cls, data: dict, **kwargs) -> SurrogatePolicy:
+        """
+        Initializes a surrogate predicting every recorded end state of a dataset.
+        """
+        states = [name.split(".", 1)[1] for name in data if name.startswith("latent.")]
+        return cls(states, **kwargs)
+
+    @property
+    def outputs(self) -> list:
+        """
+        Returns the names of the predicted values, decisions first.
+        """
+        names = [f"decisions.{k}" for k in DECISIONS]
+        return names + [f"latent.{state}" for state in self.states]
+
+    def features(self, stochastic_values: dict, start_values: dict) -> np.ndarray:
+        """
+        Builds the input vector from the arguments of FastController.update.
+        """
+        parts = [as_vector(stochastic_values[name]["param"]) for name in INPUTS]
+        start = [start_values.get((state, 0)) for state in self.states]
+        parts.append(np.array([np.nan if v is None else v for v in start], dtype=float))
+        return np.concatenate(parts)
+
+    def dataset(self, data: dict) -> tuple:
+        """
+        Builds training pairs from recorded rows, such as those of a ShardedDataset.
+        The start values of a day are the end states of the previous day of the same
+        episode, so the first day of every episode is left out.
+        """
+        order = np.lexsort((data["hour"], data["episode"]))
+        data = {name: np.asarray(col)[order] for name, col in data.items()}
+        follows = (data["episode"][1:] == data["episode"][:-1]) & (
+            data["hour"][1:] == data["hour"][:-1] + 24
+        )
+
+        columns = [data[col].reshape(len(order), -1) for col in INPUTS.values()]
+        start = np.column_stack([data[f"latent.{state}"] for state in self.states])
+        x = np.hstack(columns)[1:][follows]
+        x = np.hstack([x, start[:-1][follows]])
+        y = np.hstack([data[name].reshape(len(order), -1) for name in self.outputs])
+        return x, y[1:][follows]
+
+    def fit(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        epochs: int = 200,
+        batch_size: int = 256,
+        lr: float = 1e-3,
+    ) -> list:
+        """
+        Trains the network by minibatch Adam on the mean squared error of the
+        standardised outputs. Returns the loss of each epoch.
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        keep = np.isfinite(x).all(axis=1) & np.isfinite(y).all(axis=1)
+        x, y = x[keep], y[keep]
+        self.stats = {
+            "x_mean": x.mean(axis=0),
+            "x_std": np.where(x.std(axis=0) > 0, x.std(axis=0), 1.0),
+            "y_mean": y.mean(axis=0),
+            "y_std": np.where(y.std(axis=0) > 0, y.std(axis=0), 1.0),
+        }
+        xs = (x - self.stats["x_mean"]) / self.stats["x_std"]
+        ys = (y - self.stats["y_mean"]) / self.stats["y_std"]
+
+        sizes = (x.shape[1],) + self.hidden + (y.shape[1],)
+        self.weights = [
+            (
+                self._rng.standard_normal((m, n)) * np.sqrt(2.0 / m),
+                np.zeros(n),
+            )
+            for m, n in zip(sizes[:-1], sizes[1:])
+        ]
+        moments = [
+            [np.zeros_like(p) for p in layer for _ in range(2)] for layer in self.weights
+        ]
+
+        losses, step = [], 0
+        for _ in range(epochs):
+            perm = self._rng.permutation(len(xs))
+            total = 0.0
+            for start in range(0, len(xs), batch_size):
+                idx = perm[start : start + batch_size]
+                grads, loss = self._backward(xs[idx], ys[idx])
+                total += loss * len(idx)
+                step += 1
+                for layer, grad, mom in zip(self.weights, grads, moments):
+                    for k, (param, g) in enumerate(zip(layer, grad)):
+                        m, v = mom[2 * k], mom[2 * k + 1]
+                        m *= 0.9
+                        m += 0.1 * g
+                        v *= 0.999
+                        v += 0.001 * g**2
+                        m_hat = m / (1 - 0.9**step)
+                        v_hat = v / (1 - 0.999**step)
+                        param -= lr * m_hat / (np.sqrt(v_hat) + 1e-8)
+            losses.append(total / len(xs))
+        return losses
+
+    def _forward(self, xs: np.ndarray) -> list:
+        """
+        Returns the activations of every layer.
+        """
+        acts = [xs]
+        for i, (w, b) in enumerate(self.weights):
+            z = acts[-1] @ w + b
+            acts.append(z if i == len(self.weights) - 1 else np.maximum(z, 0))
+        return acts
+
+    def _backward(self, xs: np.ndarray, ys: np.ndarray) -> tuple:
+        """
+        Returns the gradients of the mean squared error and the error itself.
+        """
+        acts = self._forward(xs)
+        delta = 2 * (acts[-1] - ys) / ys.size
+        loss = float(np.mean((acts[-1] - ys) ** 2))
+
+        grads = []
+        for i in range(len(self.weights) - 1, -1, -1):
+            w, _ = self.weights[i]
+            grads.append((acts[i].T @ delta, delta.sum(axis=0)))
+            if i:
+                delta = (delta @ w.T) * (acts[i] > 0)
+        return grads[::-1], loss
+
+    def predict(self, x: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Returns the prediction for an input vector, or None if the input lies outside
+        the training distribution.
+        """
+        if self.weights is None:
+            raise ValueError("The surrogate has not been trained")
+        z = (x - self.stats["x_mean"]) / self.stats["x_std"]
+        if not np.all(np.isfinite(z)) or np.max(np.abs(z)) > self.z_max:
+            return None
+        out = self._forward(z[None, :])[-1][0]
+        return out * self.stats["y_std"] + self.stats["y_mean"]
+
+    def decode(
+        self, y: np.ndarray, params: dict, domains: dict
+    ) -> Optional[tuple]:
+        """
+        Splits a prediction into the decisions and end states, rounding integer
+        variables and clipping values within tol of their bounds. Returns None if any
+        value is further than tol from its bounds or, for integers, from an integer.
+        """
+        values, k = {}, 0
+        for name in self.outputs:
+            var = name.split(".", 1)[1]
+            width = DECISIONS.get(var, 1) if name.startswith("decisions.") else 1
+            val = y[k : k + width]
+            k += width
+
+            lo, hi, step = domains.get(var, (None, None, 0))
+            if var in LIMITS and LIMITS[var] in params:
+                limit = float(params[LIMITS[var]])
+                hi = limit if hi is None else min(hi, limit)
+            if lo is not None and np.any(val < lo - self.tol):
+                return None
+            if hi is not None and np.any(val > hi + self.tol):
+                return None
+            if step == 1:
+                if np.any(np.abs(val - np.round(val)) > self.tol):
+                    return None
+                val = np.round(val)
+            if lo is not None or hi is not None:
+                val = np.clip(val, lo, hi)
+            values[name] = val
+
+        decisions = {
+            var: float(values[f"decisions.{var}"][0])
+            if width == 1
+            else values[f"decisions.{var}"].tolist()
+            for var, width in DECISIONS.items()
+        }
+        end_states = {
+            (state, 0): float(values[f"latent.{state}"][0]) for state in self.states
+        }
+        return decisions, end_states
+
+    def save(self, path: str) -> None:
+        """
+        Saves the trained surrogate to an .npz file.
+        """
+        arrays = {f"w{i}": w for i, (w, _) in enumerate(self.weights)}
+        arrays.update({f"b{i}": b for i, (_, b) in enumerate(self.weights)})
+        arrays.update(self.stats)
+        np.savez(
+            path,
+            states=np.array(self.states),
+            config=np.array([self.z_max, self.tol]),
+            **arrays,
+        )
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> SurrogatePolicy:
+        """
+        Loads a surrogate saved with save.
+        """
+        with np.load(path) as data:
+            n_layers = sum(1 for key in data.files if key.startswith("w"))
+            weights = [(data[f"w{i}"], data[f"b{i}"]) for i in range(n_layers)]
+            hidden = tuple(w.shape[1] for w, _ in weights[:-1])
+            surrogate = cls(
+                [str(s) for s in data["states"]],
+                hidden,
+                z_max=float(data["config"][0]),
+                tol=float(data["config"][1]),
+            )
+            surrogate.weights = weights
+            surrogate.stats = {
+                key: data[key] for key in ("x_mean", "x_std", "y_mean", "y_std")
+            }
+        return surrogate
@@ -3,10 +3,13 @@ Utils file for the inner loop of the model predictive control (MPC) algorithm.
 """
 
 import yaml
+from typing import Optional
 from pathlib import Path
 from pyomo.environ import value
 import sys, os
 import contextlib
+import inspect
+import math
 import numpy as np
 
 def add_equations(model, environment_name: str) -> None:
@@ -177,4 +180,99 @@ def ext_visualise_output(
             fig.tight_layout()
             fig.canvas.draw()  # Redraw canvas if needed
 
-        return joined_data
\ No newline at end of file
+        return joined_data
+
+def accepts_warmstart(solver) -> bool:
+    """
+    Returns whether a solver takes a warmstart argument to solve.
+    """
+    capable = getattr(solver, "warm_start_capable", None)
+    if capable is not None:
+        return bool(capable())
+    try:
+        return "warmstart" in inspect.signature(solver.solve).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def install_start(instance, guess: dict) -> int:
+    """
+    Sets the free variables of an instance to a guess keyed by (name, index), rounded
+    for integer variables and clipped to their bounds. Returns the number of values set.
+    """
+    installed = 0
+    for (name, index), val in guess.items():
+        var = getattr(instance, name, None)
+        if var is None or index not in var or var[index].fixed:
+            continue
+        var = var[index]
+        if var.is_integer():
+            val = round(val)
+        if var.lb is not None:
+            val = max(val, var.lb)
+        if var.ub is not None:
+            val = min(val, var.ub)
+        var.set_value(val, skip_validation=True)
+        installed += 1
+    return installed
+
+
+# Solver options that limit the solve time in seconds, for solvers without a timelimit
+# argument to solve
+TIME_LIMIT_OPTIONS = {
+    "gurobi": "TimeLimit",
+    "gurobi_direct": "TimeLimit",
+    "gurobi_persistent": "TimeLimit",
+    "cplex": "timelimit",
+    "cbc": "sec",
+    "glpk": "tmlim",
+}
+
+
+def time_limit_kwargs(
+    solver, solver_name: str, seconds: Optional[float], instance=None
+) -> dict:
+    """
+    Limits the time of the next solve of instance to seconds, or lifts the limit if
+    None, either by a solver option or by the returned keyword arguments to solve.
+    Solvers that support neither are not limited.
+    """
+    if solver_name in TIME_LIMIT_OPTIONS:
+        option = TIME_LIMIT_OPTIONS[solver_name]
+        if seconds is None:
+            solver.options.pop(option, None)
+        else:
+            solver.options[option] = seconds
+        return {}
+    try:
+        if "timelimit" in inspect.signature(solver.solve).parameters:
+            if seconds is None:
+                # Persistent solvers keep the last limit unless it is replaced
+                return {"timelimit": math.inf}
+            # HiGHS counts the limit from its first run on the model it holds
+            held = getattr(solver, "_solver_model", None)
+            if held is not None and getattr(solver, "_model", None) is instance:
+                seconds += getattr(held, "getRunTime", lambda: 0.0)()
+            return {"timelimit": seconds}
+    except (TypeError, ValueError):
+        pass
+    return {}
+
+
+def has_incumbent(results) -> bool:
+    """
+    Returns whether a solve ended with a feasible solution, optimal or not.
+    """
+    if results is None:
+        return False
+    if str(results.solver.termination_condition) == "optimal":
+        return True
+    problem = getattr(results, "problem", None)
+    if problem is None:
+        return False
+    sense = str(getattr(problem, "sense", "minimize"))
+    bound = problem.lower_bound if "max" in sense else problem.upper_bound
+    try:
+        return bound is not None and math.isfinite(float(bound))
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,68 @@
+"""
+This defines predictors of the integer decisions of the fast-loop MILP, used to warm
+start its solve.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from copy import deepcopy
+
+# Integer decisions over the horizon that a warm start guesses
+WARM_VARS = (
+    "n_ship_ordered",
+    "n_ship_sent",
+    "waiting_ships",
+    "n_active_trains_conversion",
+)
+
+
+class ShiftedPlan:
+    """
+    Predicts that the plan of the last solve still holds, moved forward by shift hours
+    as the horizon recedes. Any object with the same predict method can be given to
+    FastController as a warm-start predictor; observe is optional and is passed the
+    values of the predictor's variables after each solve, and snapshot and restore
+    are optional and capture whatever state observe keeps.
+    """
+
+    def __init__(self, shift: int = 24, variables: tuple = WARM_VARS) -> None:
+        """
+        Initializes the predictor with no plan.
+        """
+        self.shift = shift
+        self.variables = tuple(variables)
+        self._plan = None
+        return None
+
+    def observe(self, solution: dict) -> None:
+        """
+        Keeps the solution of a solve, keyed by (name, index).
+        """
+        self._plan = solution
+        return None
+
+    def predict(self, stochastic_values: dict, start_values: Optional[dict]) -> dict:
+        """
+        Returns the last plan at index t - shift for every index t past the shift, or
+        nothing before the first solve.
+        """
+        if self._plan is None:
+            return {}
+        return {
+            (name, index - self.shift): val
+            for (name, index), val in self._plan.items()
+            if isinstance(index, int) and index >= self.shift and val is not None
+        }
+
+    def snapshot(self) -> Optional[dict]:
+        """
+        Returns a copy of the plan kept from the last solve.
+        """
+        return deepcopy(self._plan)
+
+    def restore(self, snapshot: Optional[dict]) -> None:
+        """
+        Restores a plan returned by snapshot.
+        """
+        self._plan = deepcopy(snapshot)
+        return None
@@ -1,36 +1,269 @@
 """
-This defines the inner loop of the model predictive control (MPC) algorithm.
+This defines the outer loop of the model predictive control (MPC) algorithm.
 """
 
 from __future__ import annotations
-from pyomo.environ import ConcreteModel, Var, Constraint
-from h2_plan.data import DefaultParams
-from h2_gym.envs import Planning
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from .utils import (
+    build_model,
+    solve_scenario,
+    make_solver,
+    check_solver,
+    init_worker,
+    solve_worker,
+    spread_monthly,
+)
+import numpy as np
 
 
 class SlowController:
-    """ """
+    """
+    Monthly shipping planner over a set of demand scenarios. Each scenario is a
+    subproblem of the slow-loop model, and the first-stage shipping decisions are made
+    to agree across scenarios with progressive hedging. Subproblems are solved in
+    n_workers processes, so an iteration costs roughly the scenarios per worker. The
+    pool lives until close is called, or the controller is used as a context manager.
+    """
 
-    def __init__(self, model):
+    def __init__(
+        self,
+        n_workers: int = 1,
+        solver: str = "gurobi",
+        solver_options: Optional[dict] = None,
+        time_limit: Optional[float] = 30.0,
+        **hedging,
+    ):
+        """
+        Initializes the controller. Each subproblem solve is limited to time_limit
+        seconds, after which its incumbent is used. Keyword arguments override the
+        hedging settings of the slow-loop config (rho, max_iter, tol and first_stage).
+        """
+        self.n_workers = n_workers
+        self.solver = solver
+        self.solver_options = (
+            solver_options if solver_options is not None else {"mipgap": 0.01}
+        )
+        self.time_limit = time_limit
+        self._hedging = hedging
+        self._data = None
+        self._loader = None
+        self._pool = None
+        self._models = {}
+        self._solver_instance = None
+        self._inputs = None
+        self._results = None
+
+    def __enter__(self) -> SlowController:
+        """
+        Starts the worker pool.
+        """
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Shuts down the worker pool.
+        """
+        self.close()
+        return None
+
+    def start(self) -> None:
+        """
+        Starts the worker pool if there are several workers and it is not running.
+        Workers keep their subproblem models between solves.
+        """
+        if self.n_workers > 1 and self._pool is None:
+            data = {
+                key: val
+                for key, val in self._data.items()
+                if key not in ["equations", "constraints", "objectives"]
+            }
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=init_worker,
+                initargs=(
+                    data,
+                    self._loader,
+                    self.solver,
+                    self.solver_options,
+                    self.time_limit,
+                ),
+            )
+        return None
+
+    def close(self) -> None:
+        """
+        Shuts down the worker pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return None
+
+    def build(self, data: dict, loader: Optional[tuple] = None):
+        """
+        This function builds the MPC problem. Worker processes cannot receive the
+        rules of the model, so with several workers loader must be a picklable
+        (function, args) pair returning the equations, constraints and objectives.
+        """
+        if self.n_workers > 1 and loader is None:
+            raise ValueError(
+                "A loader is needed to build the model in worker processes"
+            )
 
-        pass
+        check_solver(data, self.solver)
 
-    def build(self):
+        # Workers built from earlier data would solve the wrong model
+        self.close()
+        self._data = dict(data)
+        self._data["hedging"] = {**data["hedging"], **self._hedging}
+        self._loader = loader
+        self._models = {}
+        return None
+
+    def input(
+        self,
+        scenarios: np.ndarray,
+        destination_storage: float,
+        ship_destination: Optional[list] = None,
+    ):
         """
-        This function builds the MPC problem
+        Sets the demand scenarios, one row of monthly demand per scenario, and the
+        state at the destination: the stored product and the days until each ship in
+        transit arrives.
         """
-        pass
+        grid = self._data["sets"]["grid0"]
+        days = self._data["params"]["days_per_month"]
+
+        in_transit = np.zeros(len(grid))
+        for remaining in ship_destination or []:
+            month = max(int(remaining), 0) // days
+            if month < len(grid):
+                in_transit[month] += 1
+
+        scenarios = np.clip(np.asarray(scenarios, dtype=float), 0, None)
+        if scenarios.shape[1] < len(grid):
+            raise ValueError(f"Scenarios must cover {len(grid)} months")
 
-    def solve(self):
+        self._inputs = {
+            "hydrogen_demand": scenarios[:, : len(grid)],
+            "in_transit": list(in_transit),
+            "initial_storage": float(destination_storage),
+        }
+        return None
+
+    def solve(self, supress: bool = True):
         """
-        This function solves the MPC problem
+        This function solves the MPC problem with progressive hedging, returning the
+        consensus number of ships sent in each month. The worker pool is started on
+        the first solve and kept until close is called.
         """
-        pass
+        self.start()
+
+        hedging = self._data["hedging"]
+        demand = self._inputs["hydrogen_demand"]
+        n_scen, n_months = demand.shape
+        first = min(hedging["first_stage"], n_months)
+        prob = np.full(n_scen, 1.0 / n_scen)
 
-    def input(self):
-        """ """
-        pass
+        w = np.zeros((n_scen, n_months))
+        xbar = np.zeros(n_months)
+        history = []
+        incumbents = 0
 
-    def output(self):
-        """ """
-        pass
+        for iteration in range(hedging["max_iter"] + 1):
+            results = self.solve_scenarios(
+                [
+                    {
+                        "scenario": s,
+                        "hydrogen_demand": list(demand[s]),
+                        "in_transit": self._inputs["in_transit"],
+                        "initial_storage": self._inputs["initial_storage"],
+                        "w": list(w[s]),
+                        "xbar": list(xbar),
+                        "hedge": iteration > 0,
+                    }
+                    for s in range(n_scen)
+                ],
+                supress,
+            )
+            x = np.array([res["x"] for res in results])
+            rho = np.array([res["rho"] for res in results])
+            objective = np.array([res["objective"] for res in results])
+            incumbents += sum(not res["optimal"] for res in results)
+
+            # Only the first-stage months have to agree across scenarios
+            xbar = np.zeros(n_months)
+            xbar[:first] = prob @ x[:, :first]
+            gap = float(prob @ np.abs(x[:, :first] - xbar[:first]).sum(axis=1))
+            history.append({"iteration": iteration, "gap": gap})
+            if gap <= hedging["tol"] * max(first, 1):
+                break
+            w[:, :first] += rho[:, :first] * (x[:, :first] - xbar[:first])
+
+        plan = prob @ x
+        plan[:first] = xbar[:first]
+        self._results = {
+            "plan": np.round(plan).astype(int),
+            "scenarios": x,
+            "expected_cost": float(prob @ objective),
+            "iterations": iteration,
+            "converged": gap <= hedging["tol"] * max(first, 1),
+            "incumbents": incumbents,
+            "history": history,
+        }
+        print(
+            f"[INFO] Slow loop: {iteration} hedging iterations over {n_scen} scenarios,"
+            f" gap {gap:.3g}"
+        )
+        return self._results["plan"]
+
+    def solve_scenarios(self, tasks: list, supress: bool = True) -> list:
+        """
+        Solves the scenario subproblems, in the worker pool if there is one.
+        """
+        if self._pool is not None:
+            chunks = [tasks[i :: self.n_workers] for i in range(self.n_workers)]
+            results = [
+                res
+                for chunk in self._pool.map(solve_worker, [c for c in chunks if c])
+                for res in chunk
+            ]
+            return sorted(results, key=lambda res: res["scenario"])
+
+        if self._solver_instance is None:
+            self._solver_instance = make_solver(self.solver, self.solver_options)
+        results = []
+        for task in tasks:
+            if task["scenario"] not in self._models:
+                self._models[task["scenario"]] = build_model(self._data)
+            results.append(
+                solve_scenario(
+                    self._models[task["scenario"]],
+                    task,
+                    self._data,
+                    self._solver_instance,
+                    supress,
+                    self.solver,
+                    self.time_limit,
+                )
+            )
+        return results
+
+    def output(self, start: int = 0) -> dict:
+        """
+        Returns the shipping schedule of the last solve as the hourly-indexed action
+        taken by the shipping environment, starting at hour start.
+        """
+        if self._results is None:
+            raise ValueError("The slow loop has not been solved")
+        return spread_monthly(
+            self._results["plan"], self._data["params"]["days_per_month"], start
+        )
+
+    def results(self) -> Optional[dict]:
+        """
+        Returns the results of the last solve.
+        """
+        return self._results
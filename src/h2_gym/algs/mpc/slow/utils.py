@@ -0,0 +1,225 @@
+"""
+Utils file for the outer loop of the model predictive control (MPC) algorithm.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from pyomo.environ import (
+    ConcreteModel,
+    SolverFactory,
+    value,
+    Set,
+    Param,
+    Var,
+    Constraint,
+    Objective,
+    Expression,
+    Any,
+    Reals,
+    minimize,
+)
+from pyomo.repn import generate_standard_repn
+from pyomo.common.errors import PyomoException
+from ..fast.utils import suppress_output, time_limit_kwargs, has_incumbent
+import numpy as np
+
+# Solver families that accept a quadratic objective over integer variables
+MIQP_SOLVERS = ("gurobi", "cplex", "xpress", "scip")
+
+_DATA = None
+_SOLVER = None
+_SETTINGS = {}
+_MODELS = {}
+
+
+def build_model(data: dict) -> ConcreteModel:
+    """
+    Builds the scenario subproblem of the slow loop. The scenario demand, initial
+    conditions and progressive hedging terms are mutable parameters so the model is
+    built once and re-solved.
+    """
+    model = ConcreteModel()
+    grid = data["sets"]["grid0"]
+    hedged = data["hedging"]["variable"]
+
+    for key, set_ in data["sets"].items():
+        setattr(model, key, Set(initialize=list(set_)))
+
+    for key, param in data["params"].items():
+        setattr(model, key, Param(initialize=param, within=Any))
+
+    for key in ["hydrogen_demand", "in_transit"]:
+        setattr(model, key, Param(grid, initialize=0, within=Reals, mutable=True))
+    model.initial_storage = Param(initialize=0, within=Reals, mutable=True)
+
+    for key, var in data["vars"].items():
+        setattr(model, key, Var(*var["time_duration"], within=var["domain"]))
+
+    for group in ["equations", "constraints"]:
+        for key, equation in data[group].items():
+            if key in data["forms"]["primary"]:
+                setattr(
+                    model,
+                    key,
+                    Constraint(*equation["time_duration"], rule=equation["rule"]),
+                )
+
+    # The progressive hedging terms are inactive until the first weights are set
+    model.ph_w = Param(grid, initialize=0, within=Reals, mutable=True)
+    model.ph_xbar = Param(grid, initialize=0, within=Reals, mutable=True)
+    model.ph_rho = Param(grid, initialize=0, within=Reals, mutable=True)
+    model.ph_on = Param(initialize=0, within=Reals, mutable=True)
+
+    for key, objective in data["objectives"].items():
+        if key in data["forms"]["primary"]:
+            sign = 1 if objective["sense"] == minimize else -1
+            model.base_objective = Expression(expr=sign * objective["rule"](model))
+
+    x = getattr(model, hedged)
+    model.objective = Objective(
+        expr=model.base_objective
+        + model.ph_on
+        * sum(
+            model.ph_w[t] * x[t] + 0.5 * model.ph_rho[t] * (x[t] - model.ph_xbar[t]) ** 2
+            for t in grid
+        ),
+        sense=minimize,
+    )
+
+    # Cost-proportional penalty: each hedged variable is weighted by its unit cost
+    repn = generate_standard_repn(model.base_objective.expr, quadratic=False)
+    costs = {id(v): abs(c) for v, c in zip(repn.linear_vars, repn.linear_coefs)}
+    for t in grid:
+        model.ph_rho[t] = data["hedging"]["rho"] * max(costs.get(id(x[t]), 0.0), 1.0)
+
+    return model
+
+
+def solve_scenario(
+    model: ConcreteModel,
+    task: dict,
+    data: dict,
+    solver,
+    supress: bool = True,
+    solver_name: str = "",
+    time_limit: Optional[float] = None,
+) -> dict:
+    """
+    Sets the scenario data and hedging terms of a subproblem and solves it within
+    time_limit seconds. A subproblem that runs out of time returns its incumbent.
+    """
+    grid = data["sets"]["grid0"]
+    for key in ["hydrogen_demand", "in_transit"]:
+        getattr(model, key).store_values(dict(zip(grid, task[key])))
+    model.initial_storage.set_value(task["initial_storage"])
+    model.ph_w.store_values(dict(zip(grid, task["w"])))
+    model.ph_xbar.store_values(dict(zip(grid, task["xbar"])))
+    model.ph_on.set_value(1 if task["hedge"] else 0)
+
+    kwargs = time_limit_kwargs(solver, solver_name, time_limit, model)
+    try:
+        with suppress_output(supress):
+            results = solver.solve(model, **kwargs)
+    except (RuntimeError, PyomoException):
+        # Some solvers raise when stopped before finding a solution to load
+        if time_limit is None:
+            raise
+        results = None
+
+    termination = (
+        "none" if results is None else str(results.solver.termination_condition)
+    )
+    if termination != "optimal":
+        if not has_incumbent(results):
+            raise RuntimeError(
+                f"Scenario {task['scenario']} ended with {termination} and no solution"
+            )
+        print(
+            f"[NOTE] Scenario {task['scenario']} ended with {termination},"
+            " using its incumbent"
+        )
+
+    x = getattr(model, data["hedging"]["variable"])
+    return {
+        "scenario": task["scenario"],
+        "x": [value(x[t]) for t in grid],
+        "rho": [value(model.ph_rho[t]) for t in grid],
+        "objective": value(model.base_objective),
+        "optimal": termination == "optimal",
+    }
+
+
+def check_solver(data: dict, solver: str) -> None:
+    """
+    Raises if the solver cannot handle the subproblems. The progressive hedging
+    penalty is quadratic, so a model with integer variables needs an MIQP solver.
+    """
+    discrete = [key for key, var in data["vars"].items() if var["domain"].isdiscrete()]
+    family = solver.split("_")[0]
+    if discrete and family not in MIQP_SOLVERS:
+        raise ValueError(
+            f"Solver {solver} cannot solve the slow loop: the hedging penalty is"
+            f" quadratic and {discrete} are integer, so an MIQP solver such as"
+            f" {', '.join(MIQP_SOLVERS)} is needed"
+        )
+    return None
+
+
+def make_solver(name: str, options: dict):
+    """
+    Creates a solver with the given options.
+    """
+    solver = SolverFactory(name)
+    for option, val in options.items():
+        solver.options[option] = val
+    return solver
+
+
+def init_worker(
+    data: dict,
+    loader: Optional[tuple],
+    solver: str,
+    options: dict,
+    time_limit: Optional[float] = None,
+):
+    """
+    Initialises a worker process. The rules of the model cannot be sent to a worker, so
+    the worker calls loader, a (function, args) pair, to import them itself.
+    """
+    global _DATA, _SOLVER, _SETTINGS, _MODELS
+    _DATA = dict(data)
+    if loader is not None:
+        _DATA.update(loader[0](*loader[1]))
+    _SOLVER = make_solver(solver, options)
+    _SETTINGS = {"solver_name": solver, "time_limit": time_limit}
+    _MODELS = {}
+
+
+def solve_worker(tasks: list) -> list:
+    """
+    Solves a chunk of scenario subproblems, building each model the first time the
+    worker sees its scenario.
+    """
+    results = []
+    for task in tasks:
+        if task["scenario"] not in _MODELS:
+            _MODELS[task["scenario"]] = build_model(_DATA)
+        results.append(
+            solve_scenario(
+                _MODELS[task["scenario"]], task, _DATA, _SOLVER, **_SETTINGS
+            )
+        )
+    return results
+
+
+def spread_monthly(ships: np.ndarray, days_per_month: int, start: int = 0) -> dict:
+    """
+    Spreads monthly ship counts evenly over the days of each month, returning a
+    schedule keyed by the hour of each day.
+    """
+    schedule = {}
+    for month, count in enumerate(ships):
+        cumulative = np.floor(np.linspace(0, count, days_per_month + 1))
+        for day, n in enumerate(np.diff(cumulative)):
+            schedule[start + (month * days_per_month + day) * 24] = int(n)
+    return schedule
@@ -0,0 +1,10 @@
+from .core import TrajectoryRecorder, read_trajectory
+from .shards import ShardWriter, ShardedDataset, write_index
+
+__all__ = [
+    "TrajectoryRecorder",
+    "read_trajectory",
+    "ShardWriter",
+    "ShardedDataset",
+    "write_index",
+]
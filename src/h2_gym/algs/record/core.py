@@ -0,0 +1,160 @@
+"""
+This module streams trajectories to chunked columnar files for offline analysis and
+learning.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from collections.abc import Mapping
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from .utils import flatten_row, missing, write_npz, write_parquet, read_chunk
+import numpy as np
+
+WRITERS = {"npz": write_npz, "parquet": write_parquet}
+
+
+class TrajectoryRecorder:
+    """
+    Records rows of nested dicts as columns, buffering chunk_rows rows in memory before
+    handing them to a background writer thread. At most max_pending chunks wait to be
+    written, after which append blocks, so memory stays bounded however long the run.
+    The columns are fixed by the first row; later rows may leave some out.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_rows: int = 1024,
+        max_pending: int = 2,
+        format: str = "npz",
+        compress: bool = False,
+    ) -> None:
+        """
+        Initializes the recorder and starts its writer. Chunks are numbered after any
+        already in path, so a resumed run adds to the same trajectory.
+        """
+        if format not in WRITERS:
+            raise ValueError(f"Unknown trajectory format {format}")
+
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self.format = format
+        self.compress = compress
+        self.rows = 0
+
+        self._chunk = len(list(self._path.glob(f"chunk-*.{format}")))
+        self._schema = None
+        self._buffer = None
+        self._error = None
+        self._closed = False
+
+        self._queue = Queue(maxsize=max_pending)
+        self._thread = Thread(target=self._write, daemon=True)
+        self._thread.start()
+        return None
+
+    def __enter__(self) -> TrajectoryRecorder:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        return None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, row: Mapping) -> None:
+        """
+        Adds a row to the trajectory.
+        """
+        self._check()
+        flat = flatten_row(row)
+
+        if self._schema is None:
+            self._schema = {name: missing(val) for name, val in flat.items()}
+        unknown = set(flat) - set(self._schema)
+        if unknown:
+            raise ValueError(f"Columns {sorted(unknown)} are not in the trajectory")
+
+        if self._buffer is None:
+            self._buffer = {name: [] for name in self._schema}
+        for name, fill in self._schema.items():
+            self._buffer[name].append(flat.get(name, fill))
+
+        self.rows += 1
+        if len(self._buffer[next(iter(self._buffer))]) >= self.chunk_rows:
+            self.flush()
+        return None
+
+    def flush(self) -> None:
+        """
+        Hands the buffered rows to the writer as a chunk.
+        """
+        self._check()
+        if not self._buffer:
+            return None
+
+        columns = {name: np.stack(vals) for name, vals in self._buffer.items()}
+        target = self._path / f"chunk-{self._chunk:06d}.{self.format}"
+        self._queue.put((target, columns))
+        self._chunk += 1
+        self._buffer = None
+        return None
+
+    def close(self) -> None:
+        """
+        Writes the remaining rows and waits for the writer to finish.
+        """
+        if self._closed:
+            return None
+        if self._error is None:
+            self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._closed = True
+        if self._error is not None:
+            raise RuntimeError("Writing the trajectory failed") from self._error
+        return None
+
+    def _check(self) -> None:
+        """
+        Raises the error of a failed write in the calling thread.
+        """
+        if self._error is not None:
+            raise RuntimeError("Writing the trajectory failed") from self._error
+        if self._closed:
+            raise ValueError("The recorder is closed")
+        return None
+
+    def _write(self) -> None:
+        """
+        Writes queued chunks until the recorder is closed.
+        """
+        writer = WRITERS[self.format]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return None
+            if self._error is not None:
+                continue
+            try:
+                writer(*item, compress=self.compress)
+            except Exception as err:
+                self._error = err
+
+
+def read_trajectory(path: str, columns: Optional[list] = None) -> dict:
+    """
+    Reads the chunks of a recorded trajectory into one array per column, optionally
+    only the columns given.
+    """
+    files = sorted(Path(path).glob("chunk-*.npz")) + sorted(
+        Path(path).glob("chunk-*.parquet")
+    )
+    chunks = [read_chunk(file, columns) for file in files]
+    if not chunks:
+        return {}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
@@ -0,0 +1,248 @@
+"""
+This module writes datasets as memory-mapped shards, one per writer process, and
+reads them back for random-access sampling.
+"""
+
+from __future__ import annotations
+from typing import Optional, Union
+from collections.abc import Mapping
+from pathlib import Path
+from .utils import flatten_row
+import numpy as np
+import tempfile
+import json
+import os
+
+
+def write_json(path: Path, data: dict) -> None:
+    """
+    Writes a JSON file under a temporary name and moves it into place.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return None
+
+
+class ShardWriter:
+    """
+    Appends rows of numbers and fixed-size arrays to one .npy memory map per column.
+    Rows only count once their episode is committed, so a shard reopened after a crash
+    carries on from its last committed episode and overwrites anything after it.
+    """
+
+    def __init__(self, path: str, capacity: int = 4096) -> None:
+        """
+        Opens the shard at path, resuming it if it was written before.
+        """
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._meta_file = self._path / "meta.json"
+        self._maps = {}
+
+        if self._meta_file.exists():
+            with open(self._meta_file, "r") as f:
+                self.meta = json.load(f)
+            for name in self.meta["columns"]:
+                self._maps[name] = np.load(self._file(name), mmap_mode="r+")
+            # The files may have grown after the last commit
+            self.capacity = max(
+                [len(mmap) for mmap in self._maps.values()] + [self.meta["capacity"]]
+            )
+        else:
+            self.meta = {"rows": 0, "capacity": capacity, "columns": {}, "episodes": []}
+            self.capacity = capacity
+
+        self.rows = self.meta["rows"]
+        return None
+
+    def __enter__(self) -> ShardWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        return None
+
+    @property
+    def episodes(self) -> set:
+        """
+        Returns the committed episodes.
+        """
+        return set(self.meta["episodes"])
+
+    def _file(self, name: str) -> Path:
+        return self._path / f"{name}.npy"
+
+    def _create(self, flat: dict) -> None:
+        """
+        Creates the column files from the first row.
+        """
+        for name, val in flat.items():
+            self.meta["columns"][name] = {"dtype": val.dtype.str, "shape": val.shape}
+            self._maps[name] = np.lib.format.open_memmap(
+                self._file(name),
+                mode="w+",
+                dtype=val.dtype,
+                shape=(self.capacity,) + val.shape,
+            )
+        return None
+
+    def _grow(self) -> None:
+        """
+        Doubles the capacity of every column.
+        """
+        capacity = 2 * self.capacity
+        for name, old in self._maps.items():
+            fd, tmp = tempfile.mkstemp(dir=self._path, suffix=".npy")
+            os.close(fd)
+            new = np.lib.format.open_memmap(
+                tmp, mode="w+", dtype=old.dtype, shape=(capacity,) + old.shape[1:]
+            )
+            new[: len(old)] = old
+            new.flush()
+            del new, old
+            os.replace(tmp, self._file(name))
+            self._maps[name] = np.load(self._file(name), mmap_mode="r+")
+        self.capacity = self.meta["capacity"] = capacity
+        return None
+
+    def append(self, row: Mapping) -> None:
+        """
+        Adds a row. String entries are left out; the remaining columns are fixed by the
+        first row of the shard.
+        """
+        flat = {
+            name: val
+            for name, val in flatten_row(row).items()
+            if not isinstance(val, str)
+        }
+        if not self.meta["columns"]:
+            self._create(flat)
+        if set(flat) != set(self.meta["columns"]):
+            raise ValueError(f"Row columns do not match the shard at {self._path}")
+
+        if self.rows >= self.capacity:
+            self._grow()
+        for name, val in flat.items():
+            self._maps[name][self.rows] = val
+        self.rows += 1
+        return None
+
+    def commit(self, episode) -> None:
+        """
+        Flushes the rows appended since the last commit and marks the episode done.
+        """
+        for mmap in self._maps.values():
+            mmap.flush()
+        self.meta["rows"] = self.rows
+        self.meta["episodes"].append(episode)
+        write_json(self._meta_file, self.meta)
+        return None
+
+    def rollback(self) -> None:
+        """
+        Drops the rows appended since the last commit.
+        """
+        self.rows = self.meta["rows"]
+        return None
+
+    def close(self) -> None:
+        """
+        Releases the memory maps, dropping uncommitted rows.
+        """
+        self.rollback()
+        self._maps = {}
+        return None
+
+
+def write_index(path: str) -> dict:
+    """
+    Writes index.json listing the committed rows of every shard under path.
+    """
+    path = Path(path)
+    shards, columns = [], None
+    for meta_file in sorted(path.glob("*/meta.json")):
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
+        if not meta["rows"]:
+            continue
+        if columns is None:
+            columns = meta["columns"]
+        elif meta["columns"] != columns:
+            raise ValueError(f"Shard {meta_file.parent.name} has different columns")
+        shards.append({"path": meta_file.parent.name, "rows": meta["rows"]})
+
+    index = {
+        "rows": sum(shard["rows"] for shard in shards),
+        "columns": columns or {},
+        "shards": shards,
+    }
+    write_json(path / "index.json", index)
+    return index
+
+
+class ShardedDataset:
+    """
+    Read-only view of the shards listed in index.json, addressed by a global row
+    number. Columns are memory-mapped, so only the rows read are loaded.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens the dataset at path.
+        """
+        self._path = Path(path)
+        with open(self._path / "index.json", "r") as f:
+            self.index = json.load(f)
+
+        self.columns = list(self.index["columns"])
+        self._maps = [
+            {
+                name: np.load(self._path / shard["path"] / f"{name}.npy", mmap_mode="r")
+                for name in self.columns
+            }
+            for shard in self.index["shards"]
+        ]
+        self._offsets = np.cumsum([0] + [s["rows"] for s in self.index["shards"]])
+        return None
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def __getitem__(self, rows: Union[int, np.ndarray]) -> dict:
+        """
+        Returns the columns of one row, or of an array of rows.
+        """
+        rows = np.asarray(rows)
+        if np.any((rows < 0) | (rows >= len(self))):
+            raise IndexError("Row out of range")
+
+        flat = np.atleast_1d(rows)
+        shard = np.searchsorted(self._offsets, flat, side="right") - 1
+        local = flat - self._offsets[shard]
+
+        data = {}
+        for name in self.columns:
+            first = self._maps[0][name]
+            out = np.empty((len(flat),) + first.shape[1:], dtype=first.dtype)
+            for k in np.unique(shard):
+                mask = shard == k
+                out[mask] = self._maps[k][name][local[mask]]
+            data[name] = out[0] if rows.ndim == 0 else out
+        return data
+
+    def sample(
+        self, batch_size: int, rng: Optional[np.random.Generator] = None
+    ) -> dict:
+        """
+        Returns a batch of rows drawn uniformly with replacement.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        return self[rng.integers(0, len(self), size=batch_size)]
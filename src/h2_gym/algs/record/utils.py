@@ -0,0 +1,112 @@
+"""
+Utility functions for writing and reading trajectory chunks.
+"""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from pathlib import Path
+import numpy as np
+import tempfile
+import os
+
+
+def flatten_row(row: Mapping, prefix: str = "") -> dict:
+    """
+    Flattens nested dicts into dotted column names. Leaves are scalars, strings or
+    sequences of numbers, which become fixed-width array columns.
+    """
+    flat = {}
+    for key, val in row.items():
+        name = f"{prefix}{key}"
+        if isinstance(val, Mapping):
+            flat.update(flatten_row(val, f"{name}."))
+        elif isinstance(val, str):
+            flat[name] = val
+        elif val is None:
+            flat[name] = np.nan
+        else:
+            flat[name] = np.asarray(val)
+    return flat
+
+
+def missing(sample) -> object:
+    """
+    Returns the fill value for a row that lacks a column shaped like sample.
+    """
+    if isinstance(sample, str):
+        return ""
+    if sample.ndim == 0:
+        return np.nan
+    return np.full(sample.shape, np.nan)
+
+
+def write_npz(path: Path, columns: dict, compress: bool = False) -> None:
+    """
+    Writes the columns of a chunk to an .npz file under a temporary name and moves it
+    into place, so readers never see a partial chunk.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            (np.savez_compressed if compress else np.savez)(f, **columns)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return None
+
+
+def write_parquet(path: Path, columns: dict, compress: bool = False) -> None:
+    """
+    Writes the columns of a chunk to a Parquet file, with array columns stored as
+    fixed-size lists. Needs pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as err:
+        raise ImportError("Parquet trajectories need pyarrow installed") from err
+
+    arrays = {}
+    for name, col in columns.items():
+        if col.ndim == 1:
+            arrays[name] = pa.array(col)
+        else:
+            width = int(np.prod(col.shape[1:]))
+            arrays[name] = pa.FixedSizeListArray.from_arrays(
+                pa.array(col.reshape(-1)), width
+            )
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(
+            pa.table(arrays), tmp, compression="zstd" if compress else "none"
+        )
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return None
+
+
+def read_chunk(path: Path, columns=None) -> dict:
+    """
+    Reads the columns of a chunk written by write_npz or write_parquet.
+    """
+    if path.suffix == ".npz":
+        with np.load(path) as data:
+            names = data.files if columns is None else columns
+            return {name: data[name] for name in names if name in data.files}
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns)
+    data = {}
+    for name in table.column_names:
+        col = table.column(name).combine_chunks()
+        if hasattr(col, "flatten") and hasattr(col.type, "list_size"):
+            data[name] = col.flatten().to_numpy().reshape(len(col), col.type.list_size)
+        else:
+            data[name] = col.to_numpy(zero_copy_only=False)
+    return data
@@ -0,0 +1,3 @@
+from .main import nested_sampler
+
+__all__ = ["nested_sampler"]
@@ -4,24 +4,325 @@ Helper to interact with the sampler
 
 from __future__ import annotations
 from abc import ABC
-from typing import Any, Dict, List, Optional, Tuple
-
-import sys
-import os
-
-sys.path.append(os.path.abspath("./mu_F/src"))
-
-# Now import from src
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .utils import (
+    search_space,
+    constraint_names,
+    evaluate_batch,
+    save_state,
+    load_state,
+    init_worker,
+    evaluate_worker,
+)
 
 
 class nested_sampler(ABC):
     """
-    This interacts with mu-F to build and solve the nested sampling problem.
-    This will also pull pre-solved solutions form the module if they exist.
+    Nested sampling over the inlets and controls of a linearised space graph, with the
+    constraints collection as the feasibility likelihood. The log-likelihood of a point
+    is minus the sum of its scaled constraint violations, so it is zero exactly on the
+    feasible region. Sampling stops once every live point is feasible, at which point
+    the remaining prior mass estimates the feasible fraction of the search space.
     """
 
-    def __init__(self, graph):
+    def __init__(
+        self,
+        graph,
+        n_live: int = 200,
+        max_evals: int = 100_000,
+        batch: Optional[int] = None,
+        n_workers: int = 1,
+        factory: Optional[Callable] = None,
+        enlarge: float = 1.25,
+        proposal: str = "walk",
+        walks: int = 20,
+        seed: Optional[int] = None,
+        store=None,
+        data: Optional[str] = None,
+    ):
         """
-        Initialize the nested sampler with a graph.
+        Initialize the nested sampler with a graph. Up to batch live points are
+        replaced per iteration, by default a twentieth of them, with their candidates evaluated across n_workers
+        processes. Workers receive a copy of the graph, or build their own with factory
+        when the graph cannot be sent to them. Candidates are drawn either by a random
+        walk of the given number of steps from the surviving live points, or uniformly
+        from the enlarged bounding box of the live points. With a SolutionStore the
+        results are keyed by the graph signature, the sampler settings and data, an
+        identifier for anything the graph depends on that its signature cannot see,
+        such as the hash of its dataset folder.
         """
+        if proposal not in ("walk", "box"):
+            raise ValueError(f"Unknown proposal {proposal}")
+
         self.graph = graph
+        self.n_live = n_live
+        self.max_evals = max_evals
+        self.batch = batch if batch is not None else max(n_workers, n_live // 20, 1)
+        self.n_workers = n_workers
+        self.factory = factory
+        self.enlarge = enlarge
+        self.proposal = proposal
+        self.walks = walks
+        self.seed = seed
+        self.store = store
+        self.data = data
+        self._step = 0.1
+        self._acceptance = 1.0
+        self._live_logl = None
+
+        self._space = search_space(graph)
+        self._names = [(node_id, name) for node_id, name, _, _ in self._space]
+        self._lo = np.array([dim[2] for dim in self._space])
+        self._hi = np.array([dim[3] for dim in self._space])
+        self._scale = None
+        self._pool = None
+        self._evals = 0
+        self._results = None
+
+        if not self._space:
+            raise ValueError("Graph has no inlets or controls with a range to sample")
+        if not constraint_names(graph):
+            raise ValueError("Graph has no constraints to define the feasible region")
+
+    def __enter__(self) -> nested_sampler:
+        """
+        Starts the worker pool.
+        """
+        if self.n_workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=init_worker,
+                initargs=(
+                    self.factory if self.factory is not None else self.graph,
+                    self._space,
+                ),
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Shuts down the worker pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return None
+
+    def evaluate(self, points: np.ndarray) -> np.ndarray:
+        """
+        Returns the log-likelihood of a batch of points.
+        """
+        if self._pool is not None:
+            chunks = np.array_split(points, self.n_workers)
+            values = np.vstack(
+                list(self._pool.map(evaluate_worker, [c for c in chunks if len(c)]))
+            )
+        else:
+            state = save_state(self.graph)
+            try:
+                values = evaluate_batch(self.graph, self._space, points)
+            finally:
+                load_state(self.graph, state)
+
+        self._evals += len(points)
+
+        if self._scale is None:
+            self._scale = np.nanstd(values, axis=0)
+            self._scale[~(self._scale > 0)] = 1.0
+
+        logl = -(np.maximum(values, 0) / self._scale).sum(axis=1)
+        return np.where(np.isnan(logl), -np.inf, logl)
+
+    def propose(self, live: np.ndarray, threshold: float, n: int, rng) -> tuple:
+        """
+        Draws n new points with a log-likelihood above threshold from the live points.
+        """
+        if self.proposal == "walk":
+            return self.walk(live, threshold, n, rng)
+
+        # Uniform draws from the enlarged bounding box of the live points, rejected
+        # until enough fall above the threshold
+        centre = 0.5 * (live.min(axis=0) + live.max(axis=0))
+        half = 0.5 * self.enlarge * (live.max(axis=0) - live.min(axis=0))
+        lo = np.maximum(centre - half, self._lo)
+        hi = np.minimum(centre + half, self._hi)
+
+        found, found_logl = [], []
+        while len(found) < n and self._evals < self.max_evals:
+            n_prop = int(np.ceil((n - len(found)) / self._acceptance))
+            n_prop = max(min(n_prop, self.max_evals - self._evals), 1)
+            cand = lo + (hi - lo) * rng.random((n_prop, len(self._space)))
+            cand_logl = self.evaluate(cand)
+            ok = cand_logl > threshold
+            self._acceptance = max(0.5 * self._acceptance + 0.5 * ok.mean(), 1e-3)
+            found.extend(cand[ok])
+            found_logl.extend(cand_logl[ok])
+
+        found = np.array(found[:n]).reshape(-1, len(self._space))
+        return found, np.array(found_logl[:n])
+
+    def walk(self, live: np.ndarray, threshold: float, n: int, rng) -> tuple:
+        """
+        Evolves n copies of randomly chosen live points by a random walk constrained
+        to the region above threshold. Every chain is stepped at once, so each step is
+        a single batched evaluation. The step size adapts towards half acceptance.
+        """
+        idx = rng.integers(0, len(live), n)
+        points = live[idx].copy()
+        logl = np.full(n, np.inf)
+        width = live.std(axis=0) + 1e-12 * (self._hi - self._lo)
+
+        for _ in range(self.walks):
+            if self._evals >= self.max_evals:
+                break
+            cand = points + self._step * width * rng.standard_normal(points.shape)
+            cand = np.clip(cand, self._lo, self._hi)
+            cand_logl = self.evaluate(cand)
+            ok = cand_logl > threshold
+            points[ok] = cand[ok]
+            logl[ok] = cand_logl[ok]
+            self._step *= np.exp(ok.mean() - 0.5)
+
+        # Chains that never moved keep the likelihood of their starting point
+        stuck = np.isinf(logl)
+        if stuck.any():
+            logl[stuck] = self._live_logl[idx[stuck]]
+        return points, logl
+
+    def run(self) -> dict:
+        """
+        Runs the sampler until every live point is feasible or the evaluation budget
+        is spent, and returns the results. Results found in the store are returned
+        without sampling.
+        """
+        key = None
+        if self.store is not None:
+            key = self.key()
+            stored = self.store.get(key)
+            if stored is not None:
+                arrays, meta = stored
+                print(f"[INFO] Loaded sampler results {key[:12]} from the store")
+                self._results = {
+                    **meta,
+                    "names": [tuple(name) for name in meta["names"]],
+                    "samples": arrays["samples"],
+                }
+                return self._results
+
+        if self.n_workers > 1 and self._pool is None:
+            with self:
+                return self._run(key)
+        return self._run(key)
+
+    def key(self) -> str:
+        """
+        Returns the store key for the current graph and sampler settings.
+        """
+        return self.store.key(
+            kind="nested_sampler",
+            graph=self.graph.signature(),
+            data=self.data,
+            settings={
+                "n_live": self.n_live,
+                "max_evals": self.max_evals,
+                "batch": self.batch,
+                "enlarge": self.enlarge,
+                "proposal": self.proposal,
+                "walks": self.walks,
+                "seed": self.seed,
+            },
+        )
+
+    def _run(self, key: Optional[str] = None) -> dict:
+        """
+        Runs the sampler and saves the results to the store under key if given.
+        """
+
+        rng = np.random.default_rng(self.seed)
+        self._evals = 0
+        self._scale = None
+        self._step = 0.1
+        self._acceptance = 1.0
+
+        live = self._lo + (self._hi - self._lo) * rng.random(
+            (self.n_live, len(self._space))
+        )
+        live_logl = self.evaluate(live)
+
+        dead, dead_logl, dead_logw = [], [], []
+        log_x = 0.0
+
+        while self._evals < self.max_evals:
+            n_infeasible = int(np.sum(live_logl < 0))
+            if n_infeasible == 0:
+                break
+
+            order = np.argsort(live_logl)[: min(self.batch, n_infeasible)]
+            threshold = live_logl[order[-1]]
+
+            # Each removal shrinks the prior mass by the expected factor for the
+            # number of live points remaining at that removal
+            for j, idx in enumerate(order):
+                n = self.n_live - j
+                dead.append(live[idx].copy())
+                dead_logl.append(live_logl[idx])
+                dead_logw.append(log_x + np.log1p(-np.exp(-1.0 / n)))
+                log_x -= 1.0 / n
+
+            keep = np.setdiff1d(np.arange(self.n_live), order)
+            self._live_logl = live_logl[keep]
+            found, found_logl = self.propose(live[keep], threshold, len(order), rng)
+
+            n_new = len(found)
+            live[order[:n_new]] = found
+            live_logl[order[:n_new]] = found_logl
+            if n_new < len(order):
+                live = np.delete(live, order[n_new:], axis=0)
+                live_logl = np.delete(live_logl, order[n_new:])
+                break
+
+        self._results = self.summarise(
+            np.array(dead).reshape(-1, len(self._space)),
+            np.array(dead_logl),
+            np.array(dead_logw),
+            live,
+            live_logl,
+            log_x,
+        )
+        if key is not None:
+            meta = {k: v for k, v in self._results.items() if k != "samples"}
+            self.store.put(
+                key, {"samples": self._results["samples"]}, meta, kind="nested_sampler"
+            )
+        return self._results
+
+    def summarise(self, dead, dead_logl, dead_logw, live, live_logl, log_x) -> dict:
+        """
+        Combines the dead and live points into the evidence, the feasible fraction of
+        the prior and the feasible samples.
+        """
+        live_logw = np.full(len(live), log_x - np.log(len(live)))
+        logl = np.concatenate([dead_logl, live_logl])
+        logw = np.concatenate([dead_logw, live_logw])
+        points = np.vstack([dead, live])
+
+        log_evidence = np.logaddexp.reduce(logw + logl)
+        feasible = logl >= 0
+
+        return {
+            "names": list(self._names),
+            "log_evidence": float(log_evidence),
+            "feasible_fraction": float(np.exp(logw[feasible]).sum()),
+            "samples": points[feasible],
+            "n_evals": self._evals,
+            "n_iter": len(dead_logl),
+            "converged": bool(np.all(live_logl >= 0)),
+        }
+
+    def results(self) -> Optional[dict]:
+        """
+        Returns the results of the last run.
+        """
+        return self._results
@@ -0,0 +1,109 @@
+"""
+Utility functions for evaluating a space graph over batches of sampled points.
+"""
+
+from __future__ import annotations
+import numpy as np
+
+_GRAPH = None
+_SPACE = None
+
+
+def search_space(graph) -> list:
+    """
+    Returns the (node, variable, lower, upper) dimensions explored by the sampler: the
+    inlets and controls of every node that have a range and are not set by an upstream
+    node within the same time step.
+    """
+    driven = set()
+    for node in graph:
+        if node._funcs is None:
+            continue
+        for key, targ in node._funcs._targs.items():
+            if targ[-1] != "+" and targ != node.get_id():
+                driven.add((targ, node._funcs._varname[key]))
+
+    space = []
+    for node in graph:
+        if node._vars is None:
+            continue
+        for collection in ("inlets", "controls"):
+            for name in node._vars._collection.get(collection, []):
+                rng = node._vars.get_rng(name)
+                if rng is None or (node.get_id(), name) in driven:
+                    continue
+                space.append((node.get_id(), name, float(rng[0]), float(rng[1])))
+    return space
+
+
+def constraint_names(graph) -> list:
+    """
+    Returns the (node, variable) pairs of the constraints collection of every node.
+    """
+    names = []
+    for node in graph:
+        if node._vars is not None and "constraints" in node._vars._collection:
+            for name in dict.fromkeys(node._vars._collection["constraints"]):
+                names.append((node.get_id(), name))
+    return names
+
+
+def evaluate_batch(graph, space: list, points: np.ndarray) -> np.ndarray:
+    """
+    Evaluates the graph once with every dimension set to a column of points and
+    returns the [n_points, n_constraints] matrix of constraint values. Node functions
+    are elementwise, so the whole batch is evaluated in a single pass.
+    """
+    for j, (node_id, name, _, _) in enumerate(space):
+        graph[node_id].set_var({name: points[:, j]})
+
+    graph.evaluate()
+
+    values = [
+        np.broadcast_to(graph[node_id]["variables"][name], len(points))
+        for node_id, name in constraint_names(graph)
+    ]
+    return np.column_stack(values).astype(np.float64)
+
+
+def save_state(graph) -> tuple:
+    """
+    Copies the variable values of every node and of the pass-through store.
+    """
+    for node in graph:
+        if node._vars is not None and node._vars._views is not None:
+            raise ValueError("The sampler requires a graph that is not compiled")
+    store = graph.get_passthrough()
+    return (
+        {node.get_id(): dict(node._vars._vars) for node in graph if node._vars},
+        list(store._values) if store is not None else None,
+    )
+
+
+def load_state(graph, state: tuple) -> None:
+    """
+    Restores the values copied by save_state.
+    """
+    values, slots = state
+    for node_id, vars in values.items():
+        graph[node_id]._vars._vars.update(vars)
+    if slots is not None:
+        graph.get_passthrough()._values[:] = slots
+    return None
+
+
+def init_worker(graph, space: list) -> None:
+    """
+    Initialises a worker process with its own copy of the graph. The graph may be given
+    directly, or as a callable building it for platforms that spawn workers.
+    """
+    global _GRAPH, _SPACE
+    _GRAPH = graph() if callable(graph) else graph
+    _SPACE = space
+
+
+def evaluate_worker(points: np.ndarray) -> np.ndarray:
+    """
+    Evaluates a batch of points on the worker's graph.
+    """
+    return evaluate_batch(_GRAPH, _SPACE, points)
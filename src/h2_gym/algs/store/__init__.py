@@ -0,0 +1,3 @@
+from .core import SolutionStore, LRUCache
+
+__all__ = ["SolutionStore", "LRUCache"]
@@ -0,0 +1,287 @@
+"""
+This module implements a content-addressed store for pre-solved sampler and
+controller results.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import closing
+from .utils import stable_hash
+import numpy as np
+import sqlite3
+import tempfile
+import json
+import time
+import os
+
+
+class SolutionStore:
+    """
+    Stores solutions as .npz payloads indexed by a SQLite database. Keys are hashes of
+    everything that determines a solution, so a finished run is found with a single
+    indexed lookup. Payloads are written under a temporary name and moved into place,
+    and the index is updated in immediate transactions, so several processes can write
+    to the same store. If max_bytes is set the least recently used payloads are evicted
+    once the store grows past it.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initializes the store, creating the directory and index if needed.
+        """
+        if path is None:
+            path = Path(__file__).parent.parent.parent / "tmp/solutions"
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._db = self._path / "index.sqlite"
+        self.max_bytes = max_bytes
+
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS solutions (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT,
+                    file TEXT,
+                    meta TEXT,
+                    size INTEGER,
+                    created REAL,
+                    accessed REAL
+                )
+                """
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS accessed_idx ON solutions (accessed)"
+            )
+
+        return None
+
+    def _connect(self) -> closing:
+        """
+        Opens a connection to the index that is closed when the with block exits.
+        """
+        return closing(sqlite3.connect(self._db, timeout=60, isolation_level=None))
+
+    @staticmethod
+    def key(**parts) -> str:
+        """
+        Returns the key for a solution determined by the given parts.
+        """
+        return stable_hash(parts)
+
+    def __contains__(self, key: str) -> bool:
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT 1 FROM solutions WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[tuple[dict, dict]]:
+        """
+        Returns the arrays and metadata stored under key, or None if there are none.
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT file, meta FROM solutions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            try:
+                with np.load(self._path / row[0], allow_pickle=False) as payload:
+                    arrays = {name: payload[name] for name in payload.files}
+            except (OSError, ValueError):
+                # The payload was evicted or never completed
+                con.execute("DELETE FROM solutions WHERE key = ?", (key,))
+                return None
+
+            con.execute(
+                "UPDATE solutions SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+
+        return arrays, json.loads(row[1])
+
+    def put(
+        self, key: str, arrays: dict, meta: Optional[dict] = None, kind: str = ""
+    ) -> None:
+        """
+        Stores arrays and JSON-serialisable metadata under key.
+        """
+        file = f"{key}.npz"
+        fd, tmp = tempfile.mkstemp(dir=self._path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._path / file)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        now = time.time()
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    kind,
+                    file,
+                    json.dumps(meta or {}),
+                    os.path.getsize(self._path / file),
+                    now,
+                    now,
+                ),
+            )
+            con.execute("COMMIT")
+
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+        return None
+
+    def size(self) -> int:
+        """
+        Returns the total size of the stored payloads in bytes.
+        """
+        with self._connect() as con:
+            return con.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+
+    def evict(self, max_bytes: int) -> list:
+        """
+        Removes the least recently used solutions until the store fits in max_bytes,
+        returning the evicted keys.
+        """
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            total = con.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM solutions"
+            ).fetchone()[0]
+            evicted = []
+            for key, file, size in con.execute(
+                "SELECT key, file, size FROM solutions ORDER BY accessed"
+            ).fetchall():
+                if total <= max_bytes:
+                    break
+                con.execute("DELETE FROM solutions WHERE key = ?", (key,))
+                evicted.append(file)
+                total -= size
+            con.execute("COMMIT")
+
+        for file in evicted:
+            try:
+                os.remove(self._path / file)
+            except FileNotFoundError:
+                pass
+        return [file[:-4] for file in evicted]
+
+    def clear(self) -> None:
+        """
+        Removes every stored solution.
+        """
+        self.evict(0)
+        return None
+
+
+class LRUCache:
+    """
+    Keeps the most recently used solutions in memory, in front of an optional
+    SolutionStore that persists them for other processes. Keys hash their parts with
+    floats rounded to decimals places, so inputs that differ only by noise share an
+    entry. It has the get and put methods of SolutionStore and counts its hits.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        decimals: Optional[int] = 6,
+        store: Optional[SolutionStore] = None,
+    ) -> None:
+        """
+        Initializes an empty cache holding at most maxsize solutions in memory.
+        """
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.store = store
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        return None
+
+    def key(self, **parts) -> str:
+        """
+        Returns the key for a solution determined by the given parts.
+        """
+        return stable_hash(parts, self.decimals)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or (self.store is not None and key in self.store)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[tuple[dict, dict]]:
+        """
+        Returns the arrays and metadata cached under key, looking in the store on a
+        miss in memory, or None if neither has them.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        stored = None if self.store is None else self.store.get(key)
+        if stored is None:
+            self.misses += 1
+            return None
+        self.store_hits += 1
+        self._remember(key, stored)
+        return stored
+
+    def put(
+        self, key: str, arrays: dict, meta: Optional[dict] = None, kind: str = ""
+    ) -> None:
+        """
+        Caches arrays and JSON-serialisable metadata under key, also writing them to
+        the store if there is one.
+        """
+        self._remember(key, (arrays, meta or {}))
+        if self.store is not None:
+            self.store.put(key, arrays, meta, kind)
+        return None
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        """
+        Adds an entry in memory, dropping the least recently used beyond maxsize.
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return None
+
+    def stats(self) -> dict:
+        """
+        Returns the hit counts and the fraction of lookups that were hits.
+        """
+        lookups = self.hits + self.store_hits + self.misses
+        return {
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """
+        Empties the memory, leaving the store as it is.
+        """
+        self._entries.clear()
+        return None
@@ -0,0 +1,58 @@
+"""
+Utility functions for building stable keys for stored solutions.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from collections.abc import Mapping
+from hashlib import sha256
+import json
+import numpy as np
+
+
+def canonical(obj, decimals: Optional[int] = None):
+    """
+    Converts an object into a JSON-serialisable form that does not depend on dict
+    ordering or object identity. Floats are rounded to decimals places if given.
+    """
+    if isinstance(obj, Mapping):
+        items = [(repr(k) if not isinstance(k, str) else k, v) for k, v in obj.items()]
+        return {k: canonical(v, decimals) for k, v in sorted(items)}
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = [canonical(v, decimals) for v in obj]
+        if isinstance(obj, (set, frozenset)):
+            items = sorted(items, key=lambda v: json.dumps(v, sort_keys=True))
+        return items
+    if isinstance(obj, np.ndarray):
+        if decimals is not None and obj.dtype.kind == "f":
+            # Adding zero turns -0.0 into 0.0, as for scalars
+            obj = np.round(obj, decimals) + 0.0
+        data = np.ascontiguousarray(obj)
+        return {
+            "dtype": str(data.dtype),
+            "shape": list(data.shape),
+            "sha256": sha256(data.tobytes()).hexdigest(),
+        }
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, bool) or obj is None or isinstance(obj, (int, str)):
+        return obj
+    if isinstance(obj, float):
+        if decimals is not None:
+            return repr(round(obj, decimals) + 0.0)
+        return repr(obj)
+    if callable(obj) and hasattr(obj, "__code__"):
+        code = obj.__code__
+        return {
+            "function": f"{obj.__module__}.{obj.__qualname__}",
+            "code": sha256(code.co_code + repr(code.co_consts).encode()).hexdigest(),
+        }
+    return str(obj)
+
+
+def stable_hash(obj, decimals: Optional[int] = None) -> str:
+    """
+    Returns a hex digest of the canonical form of an object.
+    """
+    text = json.dumps(canonical(obj, decimals), sort_keys=True, separators=(",", ":"))
+    return sha256(text.encode()).hexdigest()
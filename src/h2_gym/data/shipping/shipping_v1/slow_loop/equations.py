@@ -0,0 +1,71 @@
+"""
+Equations for the monthly shipping problem of the slow loop. These are implemented in a
+format which can be solved by pyomo. The demand, initial storage and ships already in
+transit are set per scenario by the slow controller.
+"""
+
+from pyomo.environ import value
+
+
+def destination_storage_balance(m, t):
+    """
+    Destination storage balance over each month of the slow loop.
+    """
+    eqn = 0
+
+    eqn += m.destination_storage[t]
+    if t == 0:
+        eqn -= m.initial_storage
+    else:
+        eqn -= m.destination_storage[t - 1]
+
+    # Ships arrive a whole number of months after being sent
+    transit = round(value(m.mean_ship_transit_time) / value(m.days_per_month))
+    if t - transit >= 0:
+        eqn -= m.n_ship_sent[t - transit] * m.ship_capacity
+    eqn -= m.in_transit[t] * m.ship_capacity
+
+    eqn += m.hydrogen_demand[t]
+    eqn -= m.unmet_demand[t]
+    eqn += m.storage_spill[t]
+
+    return eqn == 0
+
+
+def upper_destination_storage_limit(m, t):
+    """
+    Upper destination storage limit for the slow loop.
+    """
+    cons = 0
+
+    cons += m.destination_storage[t]
+    cons -= m.storage_capacity
+
+    return cons <= 0
+
+
+def monthly_shipping_limit(m, t):
+    """
+    Limit on the number of ships that can be loaded and sent in a month.
+    """
+    cons = 0
+
+    cons += m.n_ship_sent[t]
+    cons -= m.max_ships_per_month
+
+    return cons <= 0
+
+
+def shipping_cost(m):
+    """
+    Cost of chartering ships for the round trip, plus penalties on unmet demand and on
+    cargo that cannot be stored at the destination.
+    """
+    obj = 0
+    obj += sum(
+        m.n_ship_sent[t] * m.ship_charter_rate * 24 * 2 * m.mean_ship_transit_time
+        for t in m.grid0
+    )
+    obj += sum(m.unmet_demand[t] * m.unmet_demand_penalty for t in m.grid0)
+    obj += sum(m.storage_spill[t] * m.storage_spill_penalty for t in m.grid0)
+    return obj
@@ -1,6 +1,10 @@
-from .supply import HydrogenSupply
-from .planning import Planning
-from .shipping import ShippingEnvV1 as ShippingEnv
+from h2_gym._lazy import attach
 
-
-__all__ = ["HydrogenSupply", "Planning", "ShippingEnv"]
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "HydrogenSupply": (".supply", "HydrogenSupply"),
+        "Planning": (".planning", "Planning"),
+        "ShippingEnv": (".shipping", "ShippingEnvV1"),
+    },
+)
@@ -1,5 +1,9 @@
-from .core import Planning
+from h2_gym._lazy import attach
 
-__all__ = [
-    "Planning",
-]
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "Planning": (".core", "Planning"),
+        "sweep": (".sweep", "sweep"),
+    },
+)
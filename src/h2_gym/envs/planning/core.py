@@ -5,19 +5,34 @@ and solve the model to perform the planning operationsß for the hydrogen produc
 
 from __future__ import annotations
 from typing import Optional
-from h2_plan.opt import H2Planning
-from h2_plan.data import DefaultParams, PlanningResults
+from importlib.metadata import version, PackageNotFoundError
+from .utils import weather_path, file_hash, publish
 from pathlib import Path
+import tempfile
+import shutil
+import pickle
+import json
+import os
 
 
 class Planning:
     def __init__(
-        self, uniqe_idx: str, weather_file: str, parameters: Optional[str] = None
+        self,
+        uniqe_idx: str,
+        weather_file: str,
+        parameters: Optional[str] = None,
+        cache: bool = True,
     ):
         """
-        Initializes the planning model.
+        Initializes the planning model. With cache, solves are stored under a hash of
+        the parameters and weather data, and identical runs are served from disk.
         """
+        from h2_plan.data import DefaultParams
+
         self._weather_file = weather_file
+        self._cache = cache
+        self._key = None
+        self._cached = False
         self._model = None
         self._inputs = None
         self._outputs = None
@@ -74,17 +89,59 @@ class Planning:
         """
         Exits the planning model context.
         """
+        from h2_plan.opt import H2Planning
 
         filepath = Path(__file__).parent.parent.parent / "tmp/planning"
 
         if not filepath.exists():
             filepath.mkdir(parents=True, exist_ok=True)
 
+        if self._cache:
+            self._key = self.cache_key()
+            self._cached = (self.cache_dir() / "results.pkl").exists()
+            if self._cached:
+                print(f"[INFO] Planning results {self._key[:12]} found in the cache")
+                return None
+
         self._model = H2Planning(
             self._parameters, key=self._idx, filename=self._weather_file, filepath=None
         )
         return None
 
+    def cache_key(self) -> str:
+        """
+        Returns the hash identifying a solve: the parameters, including the boolean
+        choices, the contents of the weather file and the planning package version.
+        """
+        from h2_gym.algs.store.utils import stable_hash
+
+        path = weather_path(self._weather_file)
+        if path is None:
+            # Keying by name would serve stale results once the file is changed
+            raise FileNotFoundError(
+                f"Weather file {self._weather_file} not found, cannot key the cache"
+            )
+        weather = file_hash(path)
+
+        try:
+            plan_version = version("h2_plan")
+        except PackageNotFoundError:
+            plan_version = None
+
+        return stable_hash(
+            {
+                "parameters": self._parameters,
+                "weather": weather,
+                "version": plan_version,
+            }
+        )
+
+    def cache_dir(self) -> Path:
+        """
+        Returns the directory holding the cached results of this solve.
+        """
+        return Path(__file__).parent.parent.parent / "tmp/planning/cache" / self._key
+
     def save_parameters(self, filename: str, file_path: Optional[str]) -> None:
         """
         Saves the loaded datafile for the planning model
@@ -102,6 +159,8 @@ class Planning:
         """
         Loads the data for the planning model.
         """
+        from h2_plan.data import DefaultParams
+
         if file_path is None:
             file_path = self._parameters.path.parent / filename
         else:
@@ -115,6 +174,10 @@ class Planning:
         """
         Solves the planning model.
         """
+        from h2_plan.opt import H2Planning
+
+        if self._cached:
+            return None
         self._model = H2Planning.class_solve(
             key=self._idx, solver="gurobi", verbose=False
         )
@@ -124,13 +187,63 @@ class Planning:
         """
         Returns the results of the planning model.
         """
+        from h2_plan.data import PlanningResults
+
         if target is None:
             target = Path(__file__).parent.parent.parent / "tmp/planning"
-        print(target)
-        self._res = PlanningResults(self._model).extract_results(target)
 
+        if not self._cache:
+            self._res = PlanningResults(self._model).extract_results(target)
+            return self._res
+
+        cache_dir = self.cache_dir()
+        if self._cached:
+            with open(cache_dir / "results.pkl", "rb") as f:
+                self._res = pickle.load(f)
+        else:
+            self._res = self.save_results(cache_dir)
+
+        with open(cache_dir / "meta.json", "r") as f:
+            meta = json.load(f)
+
+        publish(cache_dir, Path(target), meta["idx"], self._idx)
         return self._res
 
+    def save_results(self, cache_dir: Path):
+        """
+        Extracts the results into a private staging directory and moves it into the
+        cache in one step, so concurrent runs never see or overwrite partial results.
+        """
+        from h2_plan.data import PlanningResults
+
+        cache_dir.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=cache_dir.parent, prefix=".staging-"))
+        try:
+            res = PlanningResults(self._model).extract_results(staging)
+            try:
+                payload = pickle.dumps(res)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                print("[NOTE] Planning results cannot be pickled, caching files only.")
+                payload = pickle.dumps(None)
+
+            with open(staging / "results.pkl", "wb") as f:
+                f.write(payload)
+            with open(staging / "meta.json", "w") as f:
+                json.dump({"idx": self._idx, "key": self._key}, f)
+
+            try:
+                os.rename(staging, cache_dir)
+            except OSError:
+                # Another run cached the same solve first
+                if not (cache_dir / "results.pkl").exists():
+                    raise
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging)
+        return res
+
     def visualise(self):
+        if self._cached:
+            raise ValueError("Results were loaded from the cache, no model to plot")
         self._model.generate_plots(self._model)
         return None
@@ -0,0 +1,146 @@
+"""
+Runs grids of planning configurations in parallel worker processes.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Mapping
+from itertools import product
+from pathlib import Path
+from pandas import DataFrame
+from .core import Planning
+import tempfile
+import time
+import yaml
+import os
+
+
+def expand_grid(grid: dict) -> list:
+    """
+    Expands a parameter grid into a list of configurations. Each key is a dotted path
+    into the planning parameters with the values to try, or a label whose values are
+    dicts of path updates applied together, such as the boolean vector choice.
+    """
+    labels = list(grid)
+    configs = []
+    for combo in product(*(grid[label] for label in labels)):
+        updates, columns = {}, {}
+        for label, val in zip(labels, combo):
+            if isinstance(val, Mapping):
+                updates.update(val)
+                columns[label] = ",".join(f"{k}={v}" for k, v in val.items())
+            else:
+                updates[label] = val
+                columns[label] = val
+        configs.append({"updates": updates, "columns": columns})
+    return configs
+
+
+def set_path(params: dict, path: str, val) -> None:
+    """
+    Sets a nested parameter given by a dotted path.
+    """
+    keys = path.split(".")
+    for key in keys[:-1]:
+        params = params[key]
+    if keys[-1] not in params:
+        raise KeyError(f"Parameter {path} not found in the planning parameters")
+    params[keys[-1]] = val
+    return None
+
+
+def flatten(data, prefix: str = "") -> dict:
+    """
+    Flattens the scalar entries of nested results into dotted columns.
+    """
+    if not isinstance(data, Mapping):
+        return {prefix: data} if isinstance(data, (int, float, str, bool)) else {}
+    flat = {}
+    for key, val in data.items():
+        flat.update(flatten(val, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def run_job(job: dict) -> dict:
+    """
+    Runs a single planning solve in its own temporary directory. A gurobi.env file in
+    that directory caps the solver threads of the job.
+    """
+    row = dict(job["columns"])
+    row["job"] = job["idx"]
+    start = time.perf_counter()
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix=f"{job['idx']}-") as workdir:
+        with open(Path(workdir) / "gurobi.env", "w") as f:
+            f.write(f"Threads {job['threads']}\n")
+        (Path(workdir) / "results").mkdir()
+        os.chdir(workdir)
+        try:
+            planning = Planning(
+                job["idx"], job["weather_file"], job["parameters"], cache=job["cache"]
+            )
+            with planning as params:
+                for path, val in job["updates"].items():
+                    set_path(params, path, val)
+            planning.solve()
+            results = planning.get_results(Path(workdir) / "results")
+
+            row.update(flatten(results))
+            published = Path(workdir) / "results" / f"{job['idx']}.yml"
+            if published.exists():
+                with open(published, "r") as f:
+                    row.update(flatten(yaml.safe_load(f)))
+            row["status"] = "ok"
+        except Exception as err:
+            row["status"] = f"error: {err!r}"
+        finally:
+            os.chdir(cwd)
+
+    row["seconds"] = time.perf_counter() - start
+    return row
+
+
+def sweep(
+    grid: dict,
+    weather_file: str,
+    parameters: Optional[str] = None,
+    n_workers: Optional[int] = None,
+    threads: int = 1,
+    cache: bool = True,
+    prefix: str = "sweep",
+) -> DataFrame:
+    """
+    Solves the planning model for every configuration in grid across a pool of
+    n_workers processes, each solve limited to the given solver threads. By default
+    the pool fills the machine. Returns one row per configuration with its grid
+    values, scalar results, status and run time.
+    """
+    if n_workers is None:
+        n_workers = max((os.cpu_count() or 1) // threads, 1)
+
+    # Jobs run in their own directories, so relative paths must be resolved first
+    if Path(weather_file).exists():
+        weather_file = str(Path(weather_file).resolve())
+
+    jobs = [
+        {
+            **config,
+            "idx": f"{prefix}-{i}",
+            "weather_file": weather_file,
+            "parameters": parameters,
+            "threads": threads,
+            "cache": cache,
+        }
+        for i, config in enumerate(expand_grid(grid))
+    ]
+    print(f"[INFO] Running {len(jobs)} planning solves on {n_workers} workers")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        rows = list(pool.map(run_job, jobs))
+
+    failed = sum(row["status"] != "ok" for row in rows)
+    if failed:
+        print(f"[NOTE] {failed} of {len(rows)} planning solves failed")
+    return DataFrame(rows).set_index("job")
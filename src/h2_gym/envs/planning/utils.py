@@ -0,0 +1,68 @@
+"""
+Utility functions for caching the results of the planning model.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from pathlib import Path
+from hashlib import sha256
+import importlib.util
+import tempfile
+import shutil
+import os
+
+
+def weather_path(weather_file: str) -> Optional[Path]:
+    """
+    Locates a weather file given either as a path or by name, looking in the supply
+    datasets and then in the data of the planning package.
+    """
+    path = Path(weather_file)
+    if path.is_file():
+        return path
+
+    local = Path(__file__).parent.parent.parent / "data/supply/csv" / path.name
+    if local.is_file():
+        return local
+
+    spec = importlib.util.find_spec("h2_plan")
+    if spec is not None and spec.origin is not None:
+        for candidate in Path(spec.origin).parent.rglob(path.name):
+            return candidate
+    return None
+
+
+def file_hash(path: Path) -> str:
+    """
+    Returns the sha256 digest of the contents of a file.
+    """
+    digest = sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def publish(source: Path, target: Path, old_idx: str, new_idx: str) -> None:
+    """
+    Copies cached result files into target, renaming files named after the key of the
+    run that produced them. Each file is written under a temporary name and moved into
+    place so readers never see a partial file.
+    """
+    target.mkdir(parents=True, exist_ok=True)
+    for file in source.iterdir():
+        if file.name in ("results.pkl", "meta.json") or not file.is_file():
+            continue
+        name = file.name
+        if file.stem == old_idx:
+            name = new_idx + file.suffix
+
+        fd, tmp = tempfile.mkstemp(dir=target, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(file, tmp)
+            os.replace(tmp, target / name)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return None
@@ -4,24 +4,41 @@ control optimisation for the shipping problem.
 """
 
 from __future__ import annotations
-from h2_gym.data.shipping.ngdemand import NGDemand
 from h2_gym.algs import KalmanFilter
-from h2_gym.algs.mpc import FastController
+from h2_gym.algs.mpc import FastController, SlowController
+from h2_gym.algs.mpc.fast.core import UNCHECKED_PATHS
+from h2_gym.algs.mpc.fast.surrogate import as_vector
+from h2_gym.algs.store import LRUCache, SolutionStore
+from h2_gym.algs.store.utils import stable_hash
+from h2_gym.algs.record import TrajectoryRecorder
+from h2_gym.graph.temporal import ScenarioGenerator
 from pyomo.environ import Param, value
-from meteor_py import GetData
-from random import randint
+from typing import Optional, Union
 from pathlib import Path
-from numpy.random import normal
-from numpy import mean
+from numpy.random import SeedSequence, default_rng
+from numpy import mean, asarray, hstack, tile, ndarray
+from copy import deepcopy
+import time
 import yaml
 from .utils import (
     import_fast_data,
     import_fast_functions,
+    import_slow_data,
+    import_slow_functions,
+    load_fast_spec,
     args_dict,
     temporal_align,
+    save_checkpoint,
+    load_checkpoint,
+    EnvSnapshot,
 )
 
 
+# Each stochastic source draws from its own stream, so changing how often one source
+# is sampled does not shift the draws of the others
+STREAMS = ("start", "params", "demand", "weather", "arrivals", "transits", "slow")
+
+
 class ShippingEnvV1:
 
     def __init__(self) -> None:
@@ -33,13 +50,17 @@ class ShippingEnvV1:
         self.idx = 0
         self._args = args_dict()
         self._fast = FastController()
-        self._slow_data = {
-            "params": {
-                "storage_capacity": 10,
-                "mean_ship_transit_time": 35,
-                "std_ship_transit_time": 2,
-            }
-        }
+        self._slow = None
+        self._slow_data = None
+        self._seed = None
+        self._seeds = None
+        self._rng = None
+        self._episode_rng = None
+        self._fingerprint = None
+        self._start_values = None
+        self._progress = None
+        self._recorder = None
+        self._last_record = None
         pass
 
     def __enter__(self) -> None:
@@ -53,16 +74,45 @@ class ShippingEnvV1:
         This function is used to exit the environment.
 
         """
-        self._fast_data = import_fast_data(
-            self._args["fast"]["data_folder"],
-            self._args["fast"]["planning_model"],
-            self._args["vector"],
-            self._args["fast"]["random_param"],
-        )
+        from meteor_py import GetData
 
-        self._fast_data.update(
-            import_fast_functions(
-                self._args["fast"]["data_folder"], self._fast_data["sets"]
+        if self._rng is None:
+            self.seed()
+        self.idx = 0
+
+        # The streams as the episode starts, so a checkpoint can rebuild this episode
+        self._episode_rng = {
+            key: rng.bit_generator.state for key, rng in self._rng.items()
+        }
+
+        if self._args["fast"]["random_param"]:
+            self._fast_data = import_fast_data(
+                self._args["fast"]["data_folder"],
+                self._args["fast"]["planning_model"],
+                self._args["vector"],
+                self._args["fast"]["random_param"],
+                rng=self._rng["params"],
+            )
+
+            self._fast_data.update(
+                import_fast_functions(
+                    self._args["fast"]["data_folder"], self._fast_data["sets"]
+                )
+            )
+        else:
+            # Fixed parameters give the same spec every reset, so it is shared
+            self._fast_data = load_fast_spec(
+                self._args["fast"]["data_folder"],
+                self._args["fast"]["planning_model"],
+                self._args["vector"],
+            )
+
+        self._slow_data = import_slow_data(
+            self._args["fast"]["data_folder"], self._fast_data["params"]
+        )
+        self._slow_data.update(
+            import_slow_functions(
+                self._args["fast"]["data_folder"], self._slow_data["sets"]
             )
         )
 
@@ -70,6 +120,7 @@ class ShippingEnvV1:
             self._args["demand_prediction"]["country"],
             self._args["demand_prediction"]["frequency"],
             self._args["demand_prediction"]["sector"],
+            rng=self._rng["demand"],
         )
 
         self._filter.scale_dataset(self._args["demand_prediction"]["scale"])
@@ -81,10 +132,52 @@ class ShippingEnvV1:
         ).data()
 
         self._filter, self._weather_data = temporal_align(
-            self._weather_data, self._filter, randomise=True
+            self._weather_data, self._filter, randomise=True, rng=self._rng["start"]
         )
 
-        self._fast.build(self._fast_data)
+        if (
+            self._args["weather_data"]["forecast"] != "persistence"
+            or self._args["fast"]["n_scenarios"]
+        ):
+            weather_seed = self._args["weather_data"]["seed"]
+            self._scenarios = ScenarioGenerator(
+                self._weather_data,
+                seed=self._seeds["weather"] if weather_seed is None else weather_seed,
+            )
+
+        self._fast.time_limit = self._args["fast"]["time_limit"]
+        self._fast.mode = self._args["fast"]["mode"]
+        self._fast.check_every = self._args["fast"]["check_every"]
+        self._fast.n_workers = self._args["fast"]["n_workers"]
+        cache = self._args["cache"]
+        if cache["size"] and self._fast.cache is None:
+            # Kept across resets, so later episodes reuse the solves of earlier ones
+            store = None if cache["path"] is None else SolutionStore(cache["path"])
+            self._fast.cache = LRUCache(cache["size"], cache["decimals"], store=store)
+
+        self._fast.build(
+            self._fast_data,
+            loader=(
+                import_fast_functions,
+                (self._args["fast"]["data_folder"], dict(self._fast_data["sets"])),
+            ),
+        )
+        self._start_values = None
+        self._progress = None
+
+        if self._slow is not None:
+            self._slow.close()
+        self._slow = SlowController(
+            n_workers=self._args["slow"]["n_workers"],
+            time_limit=self._args["slow"]["time_limit"],
+        )
+        self._slow.build(
+            self._slow_data,
+            loader=(
+                import_slow_functions,
+                (self._args["fast"]["data_folder"], self._slow_data["sets"]),
+            ),
+        )
 
         latent_states = {
             "current_ships": 1,
@@ -115,57 +208,265 @@ class ShippingEnvV1:
             ship_destination,
             ship_origin,
             expected_arrivals,
-            expected_destinations
+            expected_destinations,
+        )
+
+        # Identifies the episode data a snapshot can be restored into
+        self._fingerprint = stable_hash(
+            {
+                "weather": asarray(self._weather_data, dtype=float),
+                "fast": self._fast_data["params"],
+                "slow": self._slow_data["params"],
+            }
         )
 
+        record = self._args["record"]
+        if record["path"] is not None and self._recorder is None:
+            self._recorder = TrajectoryRecorder(
+                record["path"], chunk_rows=record["chunk_rows"], format=record["format"]
+            )
+
         pass
 
     def render(self, mode="human"):
         return self._fast.render()
 
-    def reset(self) -> None:
+    def close(self) -> None:
+        """
+        Writes out any recorded trajectory still held in memory and stops the
+        workers of the fast and slow loops.
+        """
+        self._fast.close()
+        if self._slow is not None:
+            self._slow.close()
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+        return None
+
+    def seed(self, seed: Optional[Union[int, SeedSequence]] = None) -> SeedSequence:
+        """
+        Creates an independent random stream for each stochastic source of the
+        environment, spawned from seed. Environments given the same seed draw the same
+        starting point, parameters, demand, weather scenarios and ship travel times,
+        which makes rollouts reproducible and allows common random number comparisons.
+        Rollouts in separate processes should be given children of one SeedSequence.
+        """
+        if isinstance(seed, SeedSequence):
+            # A fresh copy, so a reused SeedSequence spawns the same streams again
+            seed = SeedSequence(
+                seed.entropy, spawn_key=seed.spawn_key, pool_size=seed.pool_size
+            )
+        self._seed = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        self._seeds = dict(zip(STREAMS, self._seed.spawn(len(STREAMS))))
+        self._rng = {key: default_rng(val) for key, val in self._seeds.items()}
+        return self._seed
+
+    def reset(self, seed: Optional[Union[int, SeedSequence]] = None) -> None:
         """
-        This function is used to reset the environment.
+        This function is used to reset the environment. With a seed, the random
+        streams are recreated from it; otherwise the current streams carry on.
         """
+        if seed is not None:
+            self.seed(seed)
         with self as slf:
             pass
         pass
 
-    def step(self, action, plot = False):
+    def snapshot(self) -> EnvSnapshot:
         """
-        Extracts data from the model, solves the inner loop and hands over the results to the outer loop
+        Returns the state of the episode: the time index, ship queues and storage, the
+        Kalman filter, the random streams and the start values and warm-start plans of
+        the fast controller. Taken between inner-loop days, the snapshot can be restored
+        here or in another process to branch rollouts without replaying the episode.
         """
+        return EnvSnapshot(
+            fingerprint=self._fingerprint,
+            idx=self.idx,
+            state=deepcopy(self._state),
+            start_values=deepcopy(self._start_values),
+            filter=self._filter.snapshot(),
+            rng={key: rng.bit_generator.state for key, rng in self._rng.items()},
+            scenario_seed=(
+                deepcopy(self._scenarios._seed) if hasattr(self, "_scenarios") else None
+            ),
+            fast=self._fast.snapshot(),
+            progress=deepcopy(self._progress),
+        )
 
-        observation = {}
+    def restore(self, snapshot: EnvSnapshot) -> None:
+        """
+        Restores a snapshot into an environment entered with the same arguments and
+        seed as the one it was taken from.
+        """
+        if snapshot.fingerprint != self._fingerprint:
+            raise ValueError(
+                "Snapshot was taken from an environment with different data or seed"
+            )
+
+        self.idx = snapshot.idx
+        self._state = deepcopy(snapshot.state)
+        self._start_values = deepcopy(snapshot.start_values)
+        self._filter.restore(snapshot.filter)
+
+        # States are set in place, as the Kalman filter shares the demand stream
+        for key, state in snapshot.rng.items():
+            self._rng[key].bit_generator.state = state
+        if snapshot.scenario_seed is not None:
+            self._scenarios._seed = deepcopy(snapshot.scenario_seed)
+            if self._args["weather_data"]["seed"] is None:
+                # Later episodes carry on spawning from the same weather sequence
+                self._seeds["weather"] = self._scenarios._seed
+
+        self._fast.restore(snapshot.fast)
+        self._progress = deepcopy(snapshot.progress)
+        return None
+
+    def checkpoint(self, path: Optional[str] = None) -> Path:
+        """
+        Writes the arguments, seed, the random streams at the start of the episode and
+        a snapshot of the environment to path, or the configured checkpoint path. The file is replaced atomically, so a crash while
+        writing leaves the previous checkpoint intact.
+        """
+        path = Path(path or self._args["checkpoint"]["path"])
+        save_checkpoint(
+            path,
+            {
+                "args": deepcopy(self._args),
+                "seed": self._seed,
+                "episode_rng": self._episode_rng,
+                "snapshot": self.snapshot(),
+            },
+        )
+        return path
+
+    @classmethod
+    def resume(cls, path: str) -> ShippingEnvV1:
+        """
+        Rebuilds an environment from a checkpoint. A step interrupted by the crash
+        carries on from the last checkpointed day when step is called again, with the
+        action it was given if none is passed. The streams are rewound to the start of
+        the checkpointed episode, not of the first, so the episode is rebuilt with the
+        same parameters, demand and starting point before the snapshot is restored.
+        """
+        payload = load_checkpoint(path)
+        env = cls()
+        env._args = payload["args"]
+        env.seed(payload["seed"])
+        for key, state in payload["episode_rng"].items():
+            env._rng[key].bit_generator.state = state
+        with env as args:
+            pass
+        env.restore(payload["snapshot"])
+
+        day = "" if env._progress is None else f", day {env._progress['day']} of a step"
+        print(f"[INFO] Resumed from {path} at hour {env.idx}{day}")
+        return env
+
+    def weather_forecast(self) -> list:
+        """
+        Returns the weather forecast over the fast-loop horizon. The first week is a
+        persistence forecast; the remainder is the long-run mean, or the mean of the
+        sampled wind scenarios when a scenario forecast is configured.
+        """
+        horizon = len(self._fast_data["sets"]["grid0"])
+        known = self._weather_data[self.idx : self.idx + 168]
+
+        if self._args["weather_data"]["forecast"] == "persistence":
+            return known + (horizon - 168) * [mean(self._weather_data)]
+
+        sims = self._scenarios.sample(
+            self._args["weather_data"]["n_scenarios"],
+            horizon - len(known),
+            start=self.idx + len(known),
+            method=self._args["weather_data"]["forecast"],
+        )
+        return known + list(sims.mean(axis=0))
+
+    def wind_scenarios(self) -> ndarray:
+        """
+        Returns n_scenarios wind trajectories over the fast-loop horizon for the
+        stochastic fast loop. All share the persistence forecast of the first week and
+        are sampled by the scenario generator after it, with the scenario_method of the
+        fast-loop arguments.
+        """
+        n_scenarios = self._args["fast"]["n_scenarios"]
+        horizon = len(self._fast_data["sets"]["grid0"])
+        known = asarray(self._weather_data[self.idx : self.idx + 168], dtype=float)
+
+        sims = self._scenarios.sample(
+            n_scenarios,
+            horizon - len(known),
+            start=self.idx + len(known),
+            method=self._args["fast"]["scenario_method"],
+        )
+        return hstack([tile(known, (n_scenarios, 1)), sims])
+
+    def plan(self) -> dict:
+        """
+        Builds the outer-loop shipping schedule with the slow controller, hedged over
+        demand scenarios drawn from the Kalman filter. The result can be passed as the
+        action of step.
+        """
+        horizon = len(self._slow_data["sets"]["grid0"])
+        scenarios = self._filter.gen_multi_synth(
+            self._args["slow"]["n_scenarios"], horizon, rng=self._rng["slow"]
+        )
+
+        destination_storage, ship_destination = self._state[1], self._state[2]
+        self._slow.input(scenarios, destination_storage, ship_destination)
+        self._slow.solve()
+
+        return self._slow.output(self.idx)
+
+    def step(self, action=None, plot = False):
+        """
+        Extracts data from the model, solves the inner loop and hands over the results to the outer loop.
+        A step interrupted after a checkpoint or snapshot carries on from its last completed day.
+        """
+        if self._progress is None:
+            if action is None:
+                raise ValueError("An action is needed to start a step")
+
+            # Updating the Kalman filter
+            new_demand = self._filter.update()
+            demand_forecast = self._filter.predict(12)
+
+            # Updating the demand forecast
+            n_steps = demand_forecast.index[0].days_in_month
+            projection = demand_forecast["predicted_mean"].values
+
+            self._progress = {
+                "day": 0,
+                "n_days": n_steps + 61,
+                "new_demand": float(new_demand),
+                "total_sent": 0,
+                "observation": {"demand_forecast": projection},
+                "action": action,
+            }
+        elif action is not None:
+            self._progress["action"] = action
+
+        progress = self._progress
+        action = progress["action"]
+        new_demand = progress["new_demand"]
+        observation = progress["observation"]
+        total_sent = progress["total_sent"]
 
         (latent_states, destination_storage, ship_destination, ship_origin, 
         expected_arrivals, expected_destinations) = (
             self._state
         )
 
-        # Updating the Kalman filter
-        new_demand = self._filter.update()
-        demand_forecast = self._filter.predict(12)
-
-        # Updating the demand forecast
-        n_steps = demand_forecast.index[0].days_in_month
-        projection = demand_forecast["predicted_mean"].values
-        observation["demand_forecast"] = projection
-        
-        total_sent = 0
-
-        #
-        results = None
+        # End states of the last solve, fixed as the start of the next
+        results = self._start_values
+        every = self._args["checkpoint"]["every"]
 
         # Iteratively solving the inner loop problem
-        for i in range(n_steps +61):
+        for i in range(progress["day"], progress["n_days"]):
 
-            # Using a 1-week persistance forecast
-            weather_forecast = (
-                self._weather_data[self.idx : self.idx + 168]
-                + (len(self._fast_data["sets"]["grid0"]) - 168)
-                * [mean(self._weather_data)]
-            )
+            weather_forecast = self.weather_forecast()
+            hour = self.idx
 
             # Grabbing the relevant portion from the shipping schedule
             shipping_schedule = {
@@ -223,8 +524,14 @@ class ShippingEnvV1:
                 },
             }
             # Updating the fast model with the new parameters and solving it
+            if self._args["fast"]["n_scenarios"]:
+                self._fast.set_scenarios(self.wind_scenarios())
+
+            start = time.perf_counter()
             self._fast.update(fast_args, results)
             results, latent_states = self._fast.solve(not plot)
+            seconds = time.perf_counter() - start
+            self._start_values = results
             self._fast.visualise_output(24)
             total_sent += latent_states["sent_ship"]
             print(
@@ -237,7 +544,7 @@ class ShippingEnvV1:
                 ship_origin.extend(
                     [
                         int(
-                            normal(
+                            self._rng["arrivals"].normal(
                                 value(
                                     self._fast_data["params"]["mean_ship_arrival_time"]
                                 ),
@@ -255,7 +562,7 @@ class ShippingEnvV1:
                 ship_destination.extend(
                     [
                         int(
-                            normal(
+                            self._rng["transits"].normal(
                                 value(
                                     self._slow_data["params"]["mean_ship_transit_time"]
                                 ),
@@ -291,13 +598,67 @@ class ShippingEnvV1:
                 destination_storage,
                 ship_destination,
                 ship_origin,
+                expected_arrivals,
+                expected_destinations,
             )
             observation["destination_storage"] = destination_storage
             observation["ship_destination"] = ship_destination
+            progress["day"] = i + 1
+            progress["total_sent"] = total_sent
+
+            # The decisions of the day with what they were based on and led to
+            self._last_record = {
+                "hour": hour,
+                "day": i,
+                "decisions": self._fast.decisions(),
+                "latent": {
+                    name: val for (name, index), val in results.items() if index == 0
+                },
+                "destination": {
+                    "storage": destination_storage,
+                    "in_transit": len(ship_destination),
+                    "ordered": len(ship_origin),
+                },
+                "forecast": {
+                    "wind": asarray(weather_forecast, dtype="float32"),
+                    "demand": asarray(observation["demand_forecast"], dtype="float32"),
+                },
+                "inputs": {
+                    name: as_vector(fast_args[name]["param"])
+                    for name in ("ship_schedule", "expected_ships", "ship_arrived")
+                },
+                "solver": {
+                    "seconds": seconds,
+                    "lexicographic": self._fast.lexicographic,
+                    "stored": self._fast._stored,
+                    "warm_start": self._fast.warm_started,
+                    "path": (
+                        self._fast.path
+                        if self._fast.source == "solve"
+                        else self._fast.source
+                    ),
+                    "termination": (
+                        self._fast.source
+                        if self._fast.source != "solve"
+                        else "unchecked"
+                        if self._fast.path in UNCHECKED_PATHS
+                        else str(self._fast.results.solver.termination_condition)
+                    ),
+                },
+            }
+            if self._recorder is not None:
+                self._recorder.append(self._last_record)
+
+            if self._args["checkpoint"]["path"] is not None:
+                if i + 1 == progress["n_days"]:
+                    self._progress = None
+                if self._progress is None or (every and (i + 1) % every == 0):
+                    self.checkpoint()
 
             if plot:
                 yield self._fast.render()
             else:
                 yield None
 
+        self._progress = None
         return observation, 0, False, {}
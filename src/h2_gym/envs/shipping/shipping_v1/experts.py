@@ -0,0 +1,151 @@
+"""
+Generates datasets of expert MPC decisions by running seeded episodes of the shipping
+environment in parallel worker processes.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Mapping
+from pathlib import Path
+from numpy.random import SeedSequence
+from h2_gym.algs.record import ShardWriter, write_index
+from .core import ShippingEnvV1
+import json
+import time
+import os
+
+
+def update_args(args: dict, updates: Mapping) -> None:
+    """
+    Updates nested environment arguments in place.
+    """
+    for key, val in updates.items():
+        if isinstance(val, Mapping) and isinstance(args.get(key), dict):
+            update_args(args[key], val)
+        else:
+            args[key] = val
+    return None
+
+
+def committed(path: Path) -> set:
+    """
+    Returns the episodes committed to any shard under path.
+    """
+    done = set()
+    for meta_file in path.glob("shard-*/meta.json"):
+        with open(meta_file, "r") as f:
+            done.update(json.load(f)["episodes"])
+    return done
+
+
+def run_shard(job: dict) -> dict:
+    """
+    Runs the episodes of one worker, writing a row per inner-loop solve to its shard.
+    Each episode is committed once all of its steps are done, so an interrupted
+    episode is run again in full on resume.
+    """
+    env = ShippingEnvV1()
+    update_args(env._args, job["args"])
+    if env._fast.solver_name == "gurobi":
+        env._fast.solver_options["Threads"] = job["threads"]
+
+    solves, errors = 0, []
+    start = time.perf_counter()
+    with ShardWriter(job["path"], capacity=job["capacity"]) as writer:
+        for episode, seed in job["episodes"]:
+            try:
+                env.reset(seed=seed)
+                for _ in range(job["n_steps"]):
+                    action = env.plan() if job["action"] is None else job["action"]
+                    for _ in env.step(action):
+                        writer.append({"episode": episode, **env._last_record})
+                        solves += 1
+                writer.commit(episode)
+            except Exception as err:
+                writer.rollback()
+                errors.append(f"episode {episode}: {err!r}")
+    env.close()
+
+    return {
+        "shard": Path(job["path"]).name,
+        "solves": solves,
+        "seconds": time.perf_counter() - start,
+        "errors": errors,
+    }
+
+
+def generate(
+    path: str,
+    n_episodes: int,
+    args: Optional[dict] = None,
+    n_steps: int = 1,
+    action: Optional[dict] = None,
+    seed: int = 0,
+    n_workers: Optional[int] = None,
+    threads: int = 1,
+    capacity: int = 4096,
+) -> dict:
+    """
+    Runs n_episodes episodes of n_steps environment steps across n_workers processes
+    and records every inner-loop solve as a (state, forecast, decision) row. Episode
+    seeds are spawned from seed, so the dataset is reproducible. The actions come from
+    the slow-loop plan unless a fixed action is given. Each worker writes a
+    memory-mapped shard under path, and index.json lists them for ShardedDataset.
+    Episodes already committed under path are skipped, so an interrupted run is
+    resumed by calling generate again with the same arguments.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    if n_workers is None:
+        n_workers = max((os.cpu_count() or 1) // threads, 1)
+
+    seeds = SeedSequence(seed).spawn(n_episodes)
+    done = committed(path)
+    todo = [(e, seeds[e]) for e in range(n_episodes) if e not in done]
+    if done:
+        print(f"[INFO] Resuming: {n_episodes - len(todo)} episodes already recorded")
+
+    # A resumed worker carries on after the last committed episode of its shard
+    jobs = [
+        {
+            "path": str(path / f"shard-{k:04d}"),
+            "episodes": todo[k::n_workers],
+            "args": args or {},
+            "n_steps": n_steps,
+            "action": action,
+            "threads": threads,
+            "capacity": capacity,
+        }
+        for k in range(n_workers)
+        if todo[k::n_workers]
+    ]
+    print(f"[INFO] Generating {len(todo)} episodes on {len(jobs)} workers")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(len(jobs), 1)) as pool:
+        results = list(pool.map(run_shard, jobs))
+    seconds = time.perf_counter() - start
+
+    index = write_index(path)
+    solves = sum(res["solves"] for res in results)
+    errors = [err for res in results for err in res["errors"]]
+
+    print(
+        f"[INFO] {solves} solves in {seconds:.1f} s, {solves / max(seconds, 1e-9):.2f}"
+        f" solves/s; {index['rows']} rows in the dataset"
+    )
+    for res in results:
+        rate = res["solves"] / max(res["seconds"], 1e-9)
+        print(f"[INFO] {res['shard']}: {res['solves']} solves, {rate:.2f} solves/s")
+    if errors:
+        print(f"[NOTE] {len(errors)} episodes failed and will be rerun on resume")
+
+    return {
+        "rows": index["rows"],
+        "solves": solves,
+        "seconds": seconds,
+        "solves_per_second": solves / max(seconds, 1e-9),
+        "workers": results,
+        "errors": errors,
+    }
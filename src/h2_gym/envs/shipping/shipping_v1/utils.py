@@ -4,8 +4,9 @@ Utility functions for the shipping environment.
 
 from typing import Optional
 from pathlib import Path
+from types import MappingProxyType
+from functools import lru_cache
 import importlib.util
-from h2_plan.data import DefaultParams
 from pyomo.environ import (
     maximize,
     minimize,
@@ -13,24 +14,206 @@ from pyomo.environ import (
     NonNegativeReals,
     Reals,
 )
-from numpy.random import rand
-from random import randint
+from numpy.random import default_rng, Generator
 from glob import glob
+import tempfile
+import copy
+import pickle
 import yaml
+import os
 
+_YAML = {}
+_MODULES = {}
+_SPECS = {}
+CHECKPOINT_VERSION = 2
 
-def import_slow_data():
+
+def file_key(path: Path) -> tuple:
+    """
+    Returns a key identifying the current contents of a file by its path, modification
+    time and size.
+    """
+    stat = Path(path).stat()
+    return (str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def evict(cache: dict, path: str) -> None:
+    """
+    Drops the entries of a cache keyed by file_key for earlier versions of a file.
+    """
+    for key in [key for key in cache if key[0] == path]:
+        del cache[key]
+    return None
+
+
+def load_yaml(path: Path):
+    """
+    Parses a YAML file, reusing the result until the file changes. The returned data is
+    shared between callers and must not be modified.
+    """
+    key = file_key(path)
+    if key not in _YAML:
+        evict(_YAML, key[0])
+        with open(path, "r") as f:
+            _YAML[key] = yaml.safe_load(f)
+    return _YAML[key]
+
+
+def load_module(path: Path):
+    """
+    Imports a python file as a module, reusing the module until the file changes.
+    """
+    key = file_key(path)
+    if key not in _MODULES:
+        evict(_MODULES, key[0])
+        spec = importlib.util.spec_from_file_location(Path(path).stem, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _MODULES[key] = module
+    return _MODULES[key]
+
+
+@lru_cache(maxsize=None)
+def load_default_parameters(vector: Optional[str]) -> dict:
+    """
+    Returns the default formulation parameters filtered for a vector. These are built
+    once per vector and must not be modified.
     """
-    This function imports the data for th slow model
+    from h2_plan.data import DefaultParams
+
+    default_parameters = DefaultParams("default")
+    default_parameters.filter_params(vector)
+    return default_parameters.formulation_parameters
+
+
+def freeze(data):
+    """
+    Returns a read-only copy of nested dicts and lists.
+    """
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(val) for key, val in data.items()})
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(val) for val in data)
+    return data
+
+
+def load_fast_spec(data_folder: str, planning_model: str, vector: str):
+    """
+    Returns the data and functions of the fast loop as a read-only spec that can be
+    shared between environments. The spec is rebuilt only when one of its files
+    changes. Randomised parameters need import_fast_data instead.
+    """
+    root = Path(__file__).parent.parent.parent.parent
+    folder = root / "data/shipping" / data_folder / "fast_loop"
+    files = [
+        folder / "config.yml",
+        folder / "variables.yml",
+        folder / "functions.yml",
+        folder / "equations.py",
+        root / "tmp/planning" / planning_model,
+    ]
+    source = (data_folder, planning_model, vector)
+    key = tuple(file_key(f) if f.exists() else str(f) for f in files)
+
+    # One spec is kept per source, so a spec for older files is replaced
+    if source not in _SPECS or _SPECS[source][0] != key:
+        data = import_fast_data(data_folder, planning_model, vector)
+        data.update(import_fast_functions(data_folder, data["sets"]))
+        _SPECS[source] = (key, freeze(data))
+    return _SPECS[source][1]
+
+
+def import_slow_data(data_folder: str, fast_params: dict) -> dict:
+    """
+    This function imports the data for the slow model. Parameters shared with the fast
+    loop are taken from its data so both loops see the same facility.
     """
 
+    sets = {}
+    params = {}
+    forms = {}
+
+    config_file = (
+        Path(__file__).parent.parent.parent.parent
+        / "data/shipping"
+        / data_folder
+        / "slow_loop"
+        / "config.yml"
+    )
+    variable_file = (
+        Path(__file__).parent.parent.parent.parent
+        / "data/shipping"
+        / data_folder
+        / "slow_loop"
+        / "variables.yml"
+    )
+
+    if not config_file.exists():
+        raise FileNotFoundError(f"Config file {config_file} does not exist.")
+
+    config = load_yaml(config_file)
+    variables = load_yaml(variable_file)
+
+    for key, item in config["Time"].items():
+        if key != "total_duration":
+            sets[key] = [
+                val * item for val in range(config["Time"]["total_duration"] // item)
+            ]
+
+    for item in config["param_source"]["fast_loop"]:
+        if item not in fast_params:
+            raise KeyError(f"Parameter {item} not found in the fast loop data.")
+        params[item] = copy.deepcopy(fast_params[item])
+
+    for key, param in variables["parameters"].items():
+        params[key] = copy.deepcopy(param)
+
+    for key, value in config["formulations"].items():
+        forms[key] = list(value)
+
+    return {
+        "sets": sets,
+        "params": params,
+        "vars": import_variables(variables, sets),
+        "forms": forms,
+        "hedging": copy.deepcopy(config["hedging"]),
+    }
+
+
+def import_variables(variables: dict, sets: dict) -> dict:
+    """
+    Converts the variables of a loop's variables file into pyomo domains and index sets.
+    """
+    vars = {}
+    for _, value in variables["variables"].items():
+        vars[value["name"]] = {
+            "time_duration": [sets[_key] for _key in value["time_duration"]],
+            "domain": (
+                NonNegativeReals
+                if value["domain"] == "positive_real"
+                else (
+                    NonNegativeIntegers
+                    if value["domain"] == "positive_integer"
+                    else Reals
+                )
+            ),
+        }
+    return vars
+
 
 def import_fast_data(
-    data_folder: str, planning_model: str, vector: str, random_param: bool = False
+    data_folder: str,
+    planning_model: str,
+    vector: str,
+    random_param: bool = False,
+    rng: Optional[Generator] = None,
 ) -> dict:
     """
-    This function is used to import the data from the config file.
+    This function is used to import the data from the config file. Randomised
+    parameters are drawn from rng, a fresh unseeded stream by default.
     """
+    if rng is None:
+        rng = default_rng()
 
     sets = {}
     params = {}
@@ -55,11 +238,7 @@ def import_fast_data(
         / "variables.yml"
     )
 
-    default_parameters = DefaultParams("default")
-
-    default_parameters.filter_params(vector)
-
-    default_parameters = default_parameters.formulation_parameters
+    default_parameters = load_default_parameters(vector)
 
     if not config_file.exists():
         raise FileNotFoundError(f"Config file {config_file} does not exist.")
@@ -67,11 +246,8 @@ def import_fast_data(
     if not planning_model.exists():
         raise FileNotFoundError(f"Planning model {planning_model} does not exist.")
 
-    with open(config_file, "r") as f:
-        config = yaml.safe_load(f)
-
-    with open(variable_file, "r") as f:
-        variables = yaml.safe_load(f)
+    config = load_yaml(config_file)
+    variables = load_yaml(variable_file)
 
     for key, item in config["Time"].items():
         if key != "total_duration":
@@ -80,45 +256,32 @@ def import_fast_data(
             ]
 
     for key, value in config["param_source"]["default_data"].items():
-        param = default_parameters.copy()
+        param = default_parameters
         for _key in value:
             param = param[_key]
 
         if isinstance(param, (list, tuple)):
             if random_param is True:
-                param = (param[2] - param[0]) * rand() + param[0]
+                param = (param[2] - param[0]) * rng.random() + param[0]
                 params[key] = param
             else:
                 params[key] = param[1]
         else:
-            params[key] = param
+            # The defaults and YAML files are shared, so params get copies of them
+            params[key] = copy.deepcopy(param)
 
+    data = load_yaml(planning_model)
     for item in config["param_source"]["planning_model"]:
-        with open(planning_model, "r") as f:
-            data = yaml.safe_load(f)
-
         if item in data:
-            params[item] = data[item]
+            params[item] = copy.deepcopy(data[item])
 
-    for _, value in variables["variables"].items():
-        vars[value["name"]] = {
-            "time_duration": [sets[_key] for _key in value["time_duration"]],
-            "domain": (
-                NonNegativeReals
-                if value["domain"] == "positive_real"
-                else (
-                    NonNegativeIntegers
-                    if value["domain"] == "positive_integer"
-                    else Reals
-                )
-            ),
-        }
+    vars.update(import_variables(variables, sets))
 
     for key, param in variables["parameters"].items():
-        params[key] = param
+        params[key] = copy.deepcopy(param)
 
     for key, value in config["formulations"].items():
-        forms[key] = value
+        forms[key] = list(value)
     return {"sets": sets, "params": params, "vars": vars, "forms": forms}
 
 
@@ -126,6 +289,20 @@ def import_fast_functions(data_folder: str, sets: dict) -> dict:
     """
     This function is used to import data from the functions file
     """
+    return import_functions(data_folder, "fast_loop", sets)
+
+
+def import_slow_functions(data_folder: str, sets: dict) -> dict:
+    """
+    This function is used to import data from the slow loop functions file
+    """
+    return import_functions(data_folder, "slow_loop", sets)
+
+
+def import_functions(data_folder: str, loop: str, sets: dict) -> dict:
+    """
+    Imports the equations, constraints and objectives of one of the control loops.
+    """
     funcs = {
         "equations": {},
         "constraints": {},
@@ -136,7 +313,7 @@ def import_fast_functions(data_folder: str, sets: dict) -> dict:
         Path(__file__).parent.parent.parent.parent
         / "data/shipping"
         / data_folder
-        / "fast_loop"
+        / loop
         / "equations.py"
     )
 
@@ -144,7 +321,7 @@ def import_fast_functions(data_folder: str, sets: dict) -> dict:
         Path(__file__).parent.parent.parent.parent
         / "data/shipping"
         / data_folder
-        / "fast_loop"
+        / loop
         / "functions.yml"
     )
 
@@ -154,13 +331,8 @@ def import_fast_functions(data_folder: str, sets: dict) -> dict:
     if not functions_path.exists():
         raise FileNotFoundError(f"Functions file {functions_path} does not exist.")
 
-    with open(functions_path, "r") as f:
-        functions = yaml.safe_load(f)
-
-    mod_name = equations_path.stem
-    spec = importlib.util.spec_from_file_location(mod_name, equations_path)
-    _funcs = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(_funcs)
+    functions = load_yaml(functions_path)
+    _funcs = load_module(equations_path)
 
     for key, value in functions["equations"].items():
         if value["name"] in dir(_funcs):
@@ -202,15 +374,44 @@ def args_dict():
             "planning_model": None,
             "random_param": False,
             "horizon": 28,
+            "time_limit": None,
+            "mode": "exact",
+            "check_every": 0,
+            "n_scenarios": 0,
+            "scenario_method": "bootstrap",
+            "n_workers": 1,
+        },
+        "slow": {
+            "n_scenarios": 8,
+            "n_workers": 1,
+            "time_limit": 30.0,
         },
-        "slow": {},
         "demand_prediction": {
             "country": "EU",
             "frequency": "monthly",
             "sector": "industry",
             "scale": 24.3,
         },
-        "weather_data": {"weather_file": None},
+        "weather_data": {
+            "weather_file": None,
+            "forecast": "persistence",
+            "n_scenarios": 16,
+            "seed": None,
+        },
+        "checkpoint": {
+            "path": None,
+            "every": 7,
+        },
+        "record": {
+            "path": None,
+            "chunk_rows": 1024,
+            "format": "npz",
+        },
+        "cache": {
+            "size": 0,
+            "decimals": 6,
+            "path": None,
+        },
         "shipping": {
             "mean_transit_time": 840,
             "std_transit_time": 48,
@@ -221,13 +422,20 @@ def args_dict():
     return args
 
 
-def temporal_align(weather, kalman_filter, randomise: Optional[bool] = False):
+def temporal_align(
+    weather,
+    kalman_filter,
+    randomise: Optional[bool] = False,
+    rng: Optional[Generator] = None,
+):
     """
     This function temporally aligns the weather data with the demand data.
-    and optionaly starts at a random opint in the dataseries.
+    and optionaly starts at a random opint in the dataseries, drawn from rng.
     """
     if randomise:
-        random_start = randint(0, len(weather) - 1)
+        if rng is None:
+            rng = default_rng()
+        random_start = int(rng.integers(0, len(weather)))
     else:
         random_start = 0
 
@@ -241,3 +449,70 @@ def temporal_align(weather, kalman_filter, randomise: Optional[bool] = False):
         kalman_filter.update()
 
     return kalman_filter, weather_data
+
+
+def save_checkpoint(path, payload: dict) -> None:
+    """
+    Pickles a checkpoint to a temporary file beside path, flushes it to disk and moves
+    it into place, so the file at path is always a complete checkpoint.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"version": CHECKPOINT_VERSION, **payload}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return None
+
+
+def load_checkpoint(path) -> dict:
+    """
+    Loads a checkpoint written by save_checkpoint.
+    """
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+    if payload.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}")
+    return payload
+
+
+class EnvSnapshot:
+    """
+    Picklable state of a ShippingEnvV1 between inner-loop days. The snapshot holds only
+    what changes during an episode, so it can be restored into any environment built
+    with the same arguments and seed.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        idx: int,
+        state: tuple,
+        start_values: Optional[dict],
+        filter: dict,
+        rng: dict,
+        scenario_seed,
+        fast: dict,
+        progress: Optional[dict] = None,
+    ) -> None:
+        """
+        Initializes the snapshot from the parts of the environment state.
+        """
+        self.fingerprint = fingerprint
+        self.idx = idx
+        self.state = state
+        self.start_values = start_values
+        self.filter = filter
+        self.rng = rng
+        self.scenario_seed = scenario_seed
+        self.fast = fast
+        self.progress = progress
+
+    def __repr__(self) -> str:
+        return f"EnvSnapshot(idx={self.idx}, fingerprint={self.fingerprint[:12]})"
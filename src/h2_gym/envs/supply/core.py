@@ -5,6 +5,8 @@ from h2_gym.graph.spatial import SpaceGraph
 from h2_gym.graph.temporal import StochasticGenerator
 from h2_gym.graph.temporal import Isochronous
 from pathlib import Path
+from typing import Optional
+import numpy as np
 from .utils import (
     add_constants,
     add_equations,
@@ -12,6 +14,10 @@ from .utils import (
     add_inlets,
     add_controls,
     module_loader,
+    function_loader,
+    folder_hash,
+    load_cache,
+    save_cache,
 )
 
 
@@ -20,11 +26,14 @@ class HydrogenSupply:
     Hydrogen export class
     """
 
-    def __init__(self, file: str) -> None:
+    def __init__(self, file: str, cache: bool = False) -> None:
         """
-        Initializes the hydrogen export class
+        Initializes the hydrogen export class. With cache set, the graph is linearised
+        on construction, and the parsed data and linearisation are stored in tmp/supply
+        keyed by a content hash of the data folder.
         """
         self.file = file
+        self.cache = cache
         self.space_graph = SpaceGraph()
         self.generator = StochasticGenerator()
         self.graph = Isochronous(self.space_graph, self.generator)
@@ -38,8 +47,18 @@ class HydrogenSupply:
         Gets the data from the json file
         """
         current_path = Path(__file__).parent.parent.parent / "data/supply"
+        cache_dir = Path(__file__).parent.parent.parent / "tmp/supply"
 
-        data, module = module_loader(current_path, self.file)
+        cached = None
+        if self.cache:
+            key = folder_hash(current_path / self.file)
+            cached = load_cache(cache_dir, key)
+
+        if cached is not None:
+            data = cached["data"]
+            module = function_loader(current_path, self.file, data)
+        else:
+            data, module = module_loader(current_path, self.file)
 
         # The constraints map to themselves
         self_edges = list(zip(data["partial_order"], data["partial_order"]))
@@ -62,6 +81,7 @@ class HydrogenSupply:
                 path=current_path,
                 filenames=value["files"],
                 time_duration=value["time_duration"],
+                cache=self.cache,
             )
             self.generator.bind_variable(
                 self.space_graph[value["target_node"]],
@@ -69,4 +89,38 @@ class HydrogenSupply:
                 time_duration=value["time_duration"],
             )
 
+        if not self.cache:
+            return None
+
+        if cached is not None:
+            self.space_graph.load_linearisation(cached["linearisation"])
+        else:
+            self.graph.linearise()
+            save_cache(
+                cache_dir,
+                key,
+                {
+                    "data": data,
+                    "linearisation": self.space_graph.linearisation(),
+                },
+            )
+
         return None
+
+    def scenarios(
+        self,
+        n_scenarios: int,
+        horizon: int,
+        method: str = "bootstrap",
+        seed: Optional[int] = None,
+    ) -> dict:
+        """
+        Samples trajectories of every uncertain input from the current time step.
+        """
+        rng = np.random.default_rng(seed)
+        return {
+            varname: self.generator.scenarios(
+                varname, n_scenarios, horizon, method=method, rng=rng
+            )
+            for varname in self.generator._varnames
+        }
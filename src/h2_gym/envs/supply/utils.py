@@ -5,6 +5,12 @@ This module contains utility functions for the Hydrogen Supply Chain Environment
 from yaml import safe_load
 from importlib import util
 from pathlib import Path
+from hashlib import sha256
+import os
+import pickle
+import tempfile
+
+CACHE_VERSION = 2
 
 
 def add_constants(node, data):
@@ -88,8 +94,15 @@ def module_loader(current_path, folder_name) -> None:
         with open(file, "r") as f:
             data.update(safe_load(f))
 
-    # Load the module from file
+    module = function_loader(current_path, folder_name, data)
+
+    return data, module
 
+
+def function_loader(current_path, folder_name, data):
+    """
+    Loads the node functions module named in the data.
+    """
     functions = data["function_file"]
     spec = util.spec_from_file_location(
         "node_functions", current_path / folder_name / functions
@@ -97,4 +110,54 @@ def module_loader(current_path, folder_name) -> None:
     module = util.module_from_spec(spec)
     spec.loader.exec_module(module)
 
-    return data, module
+    return module
+
+
+def folder_hash(folder) -> str:
+    """
+    Returns a content hash of every file in the data folder.
+    """
+    digest = sha256(str(CACHE_VERSION).encode())
+    for file in sorted(Path(folder).rglob("*")):
+        if not file.is_file() or "__pycache__" in file.parts:
+            continue
+        digest.update(file.relative_to(folder).as_posix().encode())
+        digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def load_cache(cache_dir, key: str):
+    """
+    Loads a cached linearisation, returning None if there is none for the key.
+    """
+    file = Path(cache_dir) / f"{key}.pkl"
+    if not file.exists():
+        return None
+    try:
+        with open(file, "rb") as f:
+            payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if payload.get("version") != CACHE_VERSION:
+        return None
+    return payload
+
+
+def save_cache(cache_dir, key: str, payload: dict) -> None:
+    """
+    Writes a linearisation to the cache. The file is written under a temporary name
+    and moved into place so concurrent workers never see a partial file.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    payload = dict(payload, version=CACHE_VERSION)
+
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_dir / f"{key}.pkl")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return None
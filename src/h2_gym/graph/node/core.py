@@ -22,6 +22,7 @@ class Node:
         self._funcs = None
         self._vars = None
         self._name = None
+        self._bypass = None
 
     def __enter__(self) -> Node:
         """
@@ -162,6 +163,34 @@ class Node:
                 self._vars[key] = value
         return None
 
+    def link_passthrough(self, store) -> None:
+        """
+        Links the node to the pass-through store of a graph linearised by reference
+        """
+        self._bypass = store
+        return None
+
+    def get_passthrough(self) -> dict:
+        """
+        Returns the values bypassing the node
+        """
+        if self._bypass is not None:
+            return self._bypass.carried(self._id)
+        if self._vars is None or "pt" not in self._vars._collection:
+            return {}
+        return self._vars.get_collection("pt")
+
+    def linearise_outputs(self, targ) -> dict:
+        """
+        Linearises the outputs of the node alone, leaving any bypassing variables to a
+        pass-through store. Returns the values the node no longer sends directly,
+        keyed by their original target.
+        """
+        self._outputs = {targ}
+        if self._funcs is None:
+            return {}
+        return self._funcs.linearise(targ)
+
     def linearise(self, targ, new_fns, new_rngs) -> None:
         """
         Linearizes the node
@@ -5,6 +5,7 @@ This module contains the Functions class, which is used to represent the functio
 from __future__ import annotations
 from typing import Union, Optional, List
 from types import FunctionType
+from collections.abc import Mapping
 from .variables import Variables
 import re
 
@@ -104,7 +105,7 @@ class Functions:
 
     def evaluate(self, vars) -> dict:
         """ """
-        if not isinstance(vars, dict):
+        if not isinstance(vars, Mapping):
             raise TypeError(f"Vars {vars} must be a dictionary")
 
         res = {targ: {} for targ in self._targs.values()}
@@ -4,9 +4,75 @@ This module contains the Variables class, which is used to represent the variabl
 
 from __future__ import annotations
 from typing import Union, Optional, List
+from collections.abc import MutableMapping
+import numpy as np
 import re
 
 
+class IndexView:
+    """
+    Writable view onto scattered slots of a state vector. Reads gather the slots and
+    item assignment scatters back, so view[:] = values updates the state.
+    """
+
+    def __init__(self, data, index) -> None:
+        self._data = data
+        self._index = index
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self._data[self._index]
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, key):
+        return self._data[self._index[key]]
+
+    def __setitem__(self, key, value) -> None:
+        self._data[self._index[key]] = value
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._data[self._index])
+
+    def __repr__(self) -> str:
+        return f"IndexView({self._data[self._index]!r})"
+
+    @property
+    def shape(self) -> tuple:
+        return self._index.shape
+
+
+class VariableView(MutableMapping):
+    """
+    Dictionary-like view onto the slots of a node in a contiguous state vector.
+    """
+
+    def __init__(self, data, offsets: dict) -> None:
+        self._data = data
+        self._offsets = offsets
+
+    def __getitem__(self, key: str):
+        return self._data[self._offsets[key]]
+
+    def __setitem__(self, key: str, value) -> None:
+        if key not in self._offsets:
+            raise KeyError(f"Key {key} not found in the compiled state")
+        self._data[self._offsets[key]] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise KeyError("Variables of a compiled graph cannot be removed")
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
 class Variables:
 
     def __init__(self, id: Union[str, float], outputs: dict) -> None:
@@ -15,6 +81,7 @@ class Variables:
         self._rngs = {}
         self._id = id
         self._outputs = outputs
+        self._views = None
         pass
 
     def get_vars(self) -> dict:
@@ -36,6 +103,8 @@ class Variables:
             raise TypeError(f"Key {key} must be a string")
         if not isinstance(value, (float, int, type(None))):
             raise TypeError(f"Value {value} must be a float or an integer")
+        if self._views is not None:
+            raise KeyError(f"Cannot add {key} to the variables of a compiled graph")
 
         self._vars[key] = value
         self._rngs[key] = range
@@ -56,11 +125,9 @@ class Variables:
         """
         Sets the value of the variable.
         """
-        if key[-3:] == "_pt":
+        if key[-3:] == "_pt" and key not in self._vars:
             self.add(key, value)
-            if "pt" not in self._collection:
-                self._collection["pt"] = []
-            self._collection["pt"] = [key]
+            self._collection.setdefault("pt", []).append(key)
 
         if key not in self._vars:
             raise KeyError(f"Key {key} not found in variables")
@@ -112,3 +179,26 @@ class Variables:
         if name not in self._collection:
             raise KeyError(f"Key {name} not found in collection")
         return {idx: self._vars[idx] for idx in self._collection[name]}
+
+    def bind(self, data, offsets: dict, views: dict) -> None:
+        """
+        Moves the variables into a contiguous state vector. Offsets map each variable
+        to its slot and views map the node and its collections to slices of the vector.
+        """
+        self._vars = VariableView(data, offsets)
+        self._views = views
+        return None
+
+    def view(self, name: Optional[str] = None):
+        """
+        Returns an array view of the node's variables, or of one of its collections,
+        in the compiled state vector. Collections that are not contiguous in the vector
+        are returned as an IndexView, which writes through to the state.
+        """
+        if self._views is None:
+            raise ValueError(f"Variables of node {self._id} are not compiled")
+        if name not in self._views:
+            raise KeyError(f"Key {name} not found in collection")
+        if isinstance(self._views[name], slice):
+            return self._vars._data[self._views[name]]
+        return IndexView(self._vars._data, self._views[name])
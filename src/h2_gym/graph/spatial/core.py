@@ -4,10 +4,13 @@ This module contains the Graph class, which is used to represent a graphical str
 
 from __future__ import annotations
 from ..node import Node
+from ..node.utils import pt_func
 from .builder import GraphBuilder
 from typing import Union, Optional
 from collections import OrderedDict
 from .utils import get_rang
+from .passthrough import PassThrough
+from .state import GraphState
 from re import sub as re_sub
 
 
@@ -26,6 +29,8 @@ class SpaceGraph:
         self._acyclic = True
         self._adjacency_matrix = None
         self._state = 0
+        self._passthrough = None
+        self._compiled = None
 
         return None
 
@@ -100,6 +105,8 @@ class SpaceGraph:
             outs = node.evaluate()
             pops = []
             if outs is not None:
+                if self._passthrough is not None:
+                    outs = self._passthrough.route(id, outs)
                 for key in outs:
                     if key[-1] == "+":
                         graph_outs[key[:-1]] = outs[key]
@@ -112,13 +119,27 @@ class SpaceGraph:
 
                 for edge, out in outs.items():
                     self._nodes[edge].set_var(out)
+
+        # Values carried by reference into the next time step reach the first node
+        if self._passthrough is not None and len(self._passthrough):
+            first = next(iter(self._nodes))
+            crossing = self._passthrough.crossing()
+            graph_outs[first] = {**graph_outs.get(first, {}), **crossing}
         return graph_outs
 
-    def linearise(self, _outs: Optional[dict] = None) -> None:
+    def linearise(
+        self, _outs: Optional[dict] = None, passthrough: str = "copy"
+    ) -> None:
         """
         Linearises the graph. This is done by removing the edges that are not needed
-        to evaluate the graph.
+        to evaluate the graph. With passthrough="reference" the bypassed variables are
+        held as shared slots instead of being copied through every node.
         """
+        if passthrough == "reference":
+            return self.linearise_reference()
+        elif passthrough != "copy":
+            raise ValueError(f"Unknown passthrough mode {passthrough}")
+
         if _outs is not None:
             _vars, _rngs = _outs
         else:
@@ -136,3 +157,171 @@ class SpaceGraph:
         # Determine the new output set
         outs = self.evaluate()
         return outs, get_rang(self._nodes, outs)
+
+    def linearise_reference(self) -> tuple[dict, dict]:
+        """
+        Linearises the graph by reference. The nodes and their functions are linearised
+        as they are by copy, but every value that skips nodes in the partial order is
+        given a single slot in a shared PassThrough store, which the bypassed nodes read
+        from rather than carrying a copy.
+        """
+        if not self._acyclic:
+            raise ValueError("Graph is not acyclic")
+
+        _keys = list(self._nodes.keys())
+        self._passthrough = PassThrough(_keys)
+
+        names = set()
+        for origin, target in zip(_keys, _keys[1:] + [_keys[0] + "+"]):
+            node = self._nodes[origin]
+            node.link_passthrough(self._passthrough)
+            carried = node.linearise_outputs(target)
+            for values in carried.values():
+                # Copies of values sharing a name overwrite one another, which slots
+                # cannot reproduce
+                if names & values.keys():
+                    raise ValueError(
+                        f"Variables {sorted(names & values.keys())} are carried more "
+                        "than once and can only be linearised by copy"
+                    )
+                names.update(values)
+            for dest, values in carried.items():
+                rngs = get_rang(self._nodes, {dest: values})[dest]
+                for varname, val in values.items():
+                    self._passthrough.add(
+                        origin, target, dest, varname, value=val, rng=rngs[varname]
+                    )
+
+        # Determine the new output set
+        outs = self.evaluate()
+        return outs, get_rang(self._nodes, outs)
+
+    def linearisation(self) -> dict:
+        """
+        Returns the outputs, functions and variables of every node of a graph
+        linearised by copy, as plain data that load_linearisation can apply to a
+        freshly built copy of the graph.
+        """
+        if self._passthrough is not None:
+            raise ValueError("Only graphs linearised by copy can be stored")
+
+        nodes = {}
+        for node_id, node in self._nodes.items():
+            desc = {"outputs": list(node._outputs)}
+            if node._funcs is not None:
+                desc["functions"] = [
+                    (
+                        key,
+                        node._funcs._targs[key],
+                        node._funcs._varname[key],
+                        func.__qualname__ == pt_func("").__qualname__,
+                    )
+                    for key, func in node._funcs._funcs.items()
+                ]
+            if node._vars is not None:
+                desc["variables"] = dict(node._vars._vars)
+                desc["ranges"] = dict(node._vars._rngs)
+                desc["collections"] = {
+                    key: list(members) for key, members in node._vars._collection.items()
+                }
+            nodes[node_id] = desc
+        return {"order": list(self._nodes.keys()), "nodes": nodes}
+
+    def load_linearisation(self, spec: dict) -> None:
+        """
+        Applies a linearisation returned by SpaceGraph.linearisation to a graph built
+        from the same data, leaving it as linearise would.
+        """
+        if spec["order"] != list(self._nodes.keys()):
+            raise ValueError("Linearisation does not match the partial order")
+
+        for node_id, desc in spec["nodes"].items():
+            node = self._nodes[node_id]
+            node._outputs = set(desc["outputs"])
+            if "functions" in desc:
+                funcs = node["functions"]
+                # Pass-through functions are closures, so they are rebuilt by name
+                table = {
+                    key: pt_func(key) if carried else funcs._funcs[key]
+                    for key, _, _, carried in desc["functions"]
+                }
+                funcs._funcs = table
+                funcs._targs = {key: targ for key, targ, _, _ in desc["functions"]}
+                funcs._varname = {key: name for key, _, name, _ in desc["functions"]}
+            if "variables" in desc:
+                variables = node["variables"]
+                variables._vars = dict(desc["variables"])
+                variables._rngs = dict(desc["ranges"])
+                variables._collection = {
+                    key: list(members) for key, members in desc["collections"].items()
+                }
+        return None
+
+    def get_passthrough(self) -> Optional[PassThrough]:
+        """
+        Returns the pass-through store of a graph linearised by reference.
+        """
+        return self._passthrough
+
+    def signature(self) -> dict:
+        """
+        Returns a description of everything that determines the behaviour of the
+        graph: the partial order, edges, variable values and ranges, collections and
+        functions with their targets. Used to key stored solutions.
+        """
+        nodes = {}
+        for node_id, node in self._nodes.items():
+            desc = {"inputs": list(node._inputs), "outputs": sorted(node._outputs)}
+            if node._vars is not None:
+                desc["variables"] = {
+                    key: (node._vars[key], node._vars.get_rng(key))
+                    for key in node._vars._vars
+                }
+                desc["collections"] = dict(node._vars._collection)
+            if node._funcs is not None:
+                desc["functions"] = {
+                    key: (func, node._funcs._targs[key], node._funcs._varname[key])
+                    for key, func in node._funcs._funcs.items()
+                }
+            nodes[node_id] = desc
+
+        return {
+            "order": list(self._nodes.keys()),
+            "edges": list(self._edges),
+            "nodes": nodes,
+            "passthrough": (
+                self._passthrough.to_dict() if self._passthrough is not None else None
+            ),
+        }
+
+    def compile(self, layout: Optional[dict] = None) -> GraphState:
+        """
+        Moves the variables of every node into a single contiguous state vector. Nodes
+        keep an index map into the vector so reads and writes go straight to the array.
+        The graph must be linearised, if at all, before it is compiled.
+        """
+        self._compiled = GraphState(self, layout)
+        return self._compiled
+
+    def get_state(self) -> Optional[GraphState]:
+        """
+        Returns the compiled state of the graph.
+        """
+        return self._compiled
+
+    def snapshot(self):
+        """
+        Returns a copy of the compiled state vector.
+        """
+        if self._compiled is None:
+            raise ValueError("Graph must be compiled before taking a snapshot")
+        return self._compiled.snapshot()
+
+    def restore(self, values) -> None:
+        """
+        Restores the compiled state vector from a snapshot.
+        """
+        if self._compiled is None:
+            raise ValueError("Graph must be compiled before restoring a snapshot")
+        self._compiled.restore(values)
+        return None
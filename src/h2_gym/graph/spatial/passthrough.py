@@ -0,0 +1,163 @@
+"""
+This module contains the PassThrough class, which stores the values that bypass nodes
+of a linearised graph as shared slots rather than as copied variables.
+"""
+
+from __future__ import annotations
+from typing import Union, Optional
+from re import sub as re_sub
+
+
+class PassThrough:
+    """
+    Shared slot store for the variables carried past intermediate nodes. Each slot is
+    written once by the node producing the value and read by reference from every node
+    it bypasses, so no copies or pass-through functions are evaluated. The values reach
+    the same nodes under the same "_pt" names as in a graph linearised by copy.
+    """
+
+    def __init__(self, order: list) -> None:
+        """
+        Initializes the pass-through store for the given partial order.
+        """
+        self._order = list(order)
+        self._pos = {key: idx for idx, key in enumerate(self._order)}
+        self._slots = []
+        self._index = {}
+        self._values = []
+        self._offset = None
+
+        return None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._index
+
+    def add(
+        self,
+        origin: Union[str, int],
+        target: Union[str, int],
+        dest: Union[str, int],
+        varname: str,
+        value: Optional[float] = None,
+        rng: Optional[list] = None,
+    ) -> Optional[int]:
+        """
+        Registers a value produced by origin for dest, which the linearised origin now
+        outputs to target, the next node, as varname + "_pt". Returns the slot index, or
+        None if the value does not bypass any node.
+        """
+        start = self._pos[origin] + 1
+
+        # Values for the next time step are carried to the end of the partial order
+        # and handed to the first node, as they are when copied
+        if dest[-1] == "+":
+            stop = len(self._order)
+            deliver = self._order[0] + "+"
+        else:
+            stop = self._pos[re_sub(r"[+]", "", dest)]
+            deliver = dest
+
+        if stop <= start:
+            return None
+
+        slot = len(self._slots)
+        self._slots.append(
+            {
+                "origin": origin,
+                "target": target,
+                "dest": dest,
+                "deliver": deliver,
+                "varname": varname,
+                "start": start,
+                "stop": stop,
+                "rng": rng,
+            }
+        )
+        self._index[(origin, target, varname + "_pt")] = slot
+        self._values.append(value)
+
+        return slot
+
+    def route(self, origin: Union[str, int], outs: dict) -> dict:
+        """
+        Writes the outputs of origin that bypass nodes into their slots. Returns the
+        outputs with those destined for a node in this time step moved to it, and those
+        for the next time step removed until crossing collects them.
+        """
+        routed = {}
+        for target, values in outs.items():
+            for name, val in values.items():
+                slot = self._index.get((origin, target, name))
+                if slot is None:
+                    routed.setdefault(target, {})[name] = val
+                    continue
+                self[slot] = val
+                deliver = self._slots[slot]["deliver"]
+                if deliver[-1] != "+":
+                    routed.setdefault(deliver, {})[name] = val
+        return routed
+
+    def crossing(self) -> dict:
+        """
+        Returns the slot values crossing into the next time step, keyed by the first
+        node and their pass-through names.
+        """
+        outs = {}
+        for idx, slot in enumerate(self._slots):
+            if slot["deliver"][-1] == "+":
+                outs[slot["varname"] + "_pt"] = self[idx]
+        return outs
+
+    def __getitem__(self, slot: int):
+        if self._offset is not None:
+            return self._values[self._offset + slot]
+        return self._values[slot]
+
+    def __setitem__(self, slot: int, value) -> None:
+        if self._offset is not None:
+            self._values[self._offset + slot] = value
+        else:
+            self._values[slot] = value
+
+    def carried(self, node_id: Union[str, int]) -> dict:
+        """
+        Returns the values bypassing the given node, keyed by their pass-through name.
+        """
+        pos = self._pos[node_id]
+        return {
+            slot["varname"] + "_pt": self[idx]
+            for idx, slot in enumerate(self._slots)
+            if slot["start"] <= pos < slot["stop"]
+        }
+
+    def bind(self, values, offset: int) -> None:
+        """
+        Moves the slots into an external state vector starting at offset.
+        """
+        for idx, val in enumerate(self._values):
+            values[offset + idx] = float("nan") if val is None else val
+        self._values = values
+        self._offset = offset
+        return None
+
+    def to_dict(self) -> dict:
+        """
+        Returns a serialisable description of the slots.
+        """
+        return {"order": list(self._order), "slots": [dict(s) for s in self._slots]}
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> PassThrough:
+        """
+        Rebuilds the pass-through store from the output of to_dict.
+        """
+        store = cls(spec["order"])
+        for slot in spec["slots"]:
+            key = (slot["origin"], slot["target"], slot["varname"] + "_pt")
+            store._index[key] = len(store._slots)
+            store._slots.append(dict(slot))
+            store._values.append(None)
+        return store
@@ -0,0 +1,134 @@
+"""
+This module contains the GraphState class, which holds every variable of a compiled
+graph in a single contiguous vector.
+"""
+
+from __future__ import annotations
+from typing import Union, Optional
+import numpy as np
+
+
+class GraphState:
+    """
+    Contiguous float64 storage for the variables of a graph. Each node owns a slice of
+    the vector, laid out collection by collection so that the node and its collections
+    are exposed as array views. Bounds are held in a matching [n, 2] matrix.
+    """
+
+    def __init__(self, graph, layout: Optional[dict] = None) -> None:
+        """
+        Initializes the state from the variables currently held by the graph nodes. A
+        layout, as returned by GraphState.layout, fixes the order of the variables.
+        """
+        if layout is None:
+            layout = self.build_layout(graph)
+
+        self._layout = layout
+        self._offsets = {}
+        self._slices = {}
+
+        size = sum(len(names) for names in layout.values())
+        store = graph.get_passthrough()
+        n_slots = len(store) if store is not None else 0
+
+        self.values = np.full(size + n_slots, np.nan, dtype=np.float64)
+        self.bounds = np.tile([-np.inf, np.inf], (size + n_slots, 1))
+
+        start = 0
+        for node_id, names in layout.items():
+            variables = graph[node_id]["variables"]
+            offsets = {name: start + idx for idx, name in enumerate(names)}
+
+            for name, idx in offsets.items():
+                value = variables[name]
+                self.values[idx] = np.nan if value is None else value
+                rng = variables.get_rng(name)
+                if rng is not None:
+                    self.bounds[idx] = rng
+
+            self._offsets[node_id] = offsets
+            self._slices[node_id] = slice(start, start + len(names))
+
+            views = {None: self._slices[node_id]}
+            for key, members in variables._collection.items():
+                views[key] = self._view(offsets, members)
+
+            variables.bind(self.values, offsets, views)
+            start += len(names)
+
+        if store is not None:
+            store.bind(self.values, size)
+            for idx, slot in enumerate(store._slots):
+                if slot["rng"] is not None:
+                    self.bounds[size + idx] = slot["rng"]
+        self._n_vars = size
+
+        return None
+
+    @staticmethod
+    def build_layout(graph) -> dict:
+        """
+        Orders the variables of every node so that each collection is contiguous where
+        possible, followed by the variables that belong to no collection.
+        """
+        layout = {}
+        for node in graph:
+            if node._vars is None:
+                layout[node.get_id()] = []
+                continue
+            names = []
+            for members in node._vars._collection.values():
+                names.extend(m for m in members if m not in names)
+            names.extend(m for m in node._vars._vars if m not in names)
+            layout[node.get_id()] = names
+        return layout
+
+    @staticmethod
+    def _view(offsets: dict, members: list) -> Union[slice, np.ndarray]:
+        """
+        Returns a slice over the members if they are contiguous, else an index array.
+        """
+        idx = list(dict.fromkeys(offsets[m] for m in members))
+        if not idx:
+            return slice(0, 0)
+        if idx == list(range(idx[0], idx[0] + len(idx))):
+            return slice(idx[0], idx[0] + len(idx))
+        return np.asarray(idx)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def layout(self) -> dict:
+        """
+        Returns the variable layout of the state.
+        """
+        return {key: list(names) for key, names in self._layout.items()}
+
+    def offset(self, node_id: Union[str, int], varname: str) -> int:
+        """
+        Returns the position of a variable in the state vector.
+        """
+        return self._offsets[node_id][varname]
+
+    def node(self, node_id: Union[str, int]) -> np.ndarray:
+        """
+        Returns a view of the slice owned by a node.
+        """
+        return self.values[self._slices[node_id]]
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Returns a copy of the state vector.
+        """
+        return self.values.copy()
+
+    def restore(self, values: np.ndarray) -> None:
+        """
+        Restores the state vector from a snapshot.
+        """
+        if values.shape != self.values.shape:
+            raise ValueError(
+                f"Snapshot of shape {values.shape} does not match {self.values.shape}"
+            )
+        self.values[:] = values
+        return None
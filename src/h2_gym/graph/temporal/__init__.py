@@ -2,8 +2,10 @@
 
 from .isochronous import Isochronous
 from .stochastic_generator import StochasticGenerator
+from .scenarios import ScenarioGenerator
 
 __all__ = [
     "Isochronous",
     "StochasticGenerator",
+    "ScenarioGenerator",
 ]
@@ -1,6 +1,7 @@
 """ """
 
 from __future__ import annotations
+from typing import Optional
 from ...node import Node
 
 
@@ -31,13 +32,26 @@ class Isochronous:
         """
         Steps the graph.
         """
-        if self._generator is not None:
+        if self._generator is not None and self._generator.is_compiled():
+            values, index = self._generator.update_array()
+            self._node.get_state().values[index] = values
+        elif self._generator is not None:
             update = self._generator.update()
             for key, var in update.items():
                 self._node[key].set_var(var)
 
         return self._node.evaluate(inputs)
 
+    def compile(self, layout: Optional[dict] = None):
+        """
+        Compiles the graph into a contiguous state vector and stacks the generator's
+        datasets against it, so each step scatters the uncertain inputs in one call.
+        """
+        state = self._node.compile(layout)
+        if self._generator is not None:
+            self._generator.compile(state)
+        return state
+
     def forward_pass(self, node: Node) -> None:
         """
         Forward propagates the graph.
@@ -46,13 +60,13 @@ class Isochronous:
 
         return None
 
-    def linearise(self) -> None:
+    def linearise(self, passthrough: str = "copy") -> None:
         """
         Linearises the graph. This is done by removing the edges that are not needed
         to evaluate the graph.
         """
         node_outs = None
         while node_outs is None or len(node_outs[0]) > 1:
-            node_outs = self._node.linearise(node_outs)
+            node_outs = self._node.linearise(node_outs, passthrough=passthrough)
 
         return None
@@ -0,0 +1,138 @@
+"""
+This module generates plausible trajectories of an uncertain input from its
+historical series.
+"""
+
+from __future__ import annotations
+from typing import Optional
+import numpy as np
+
+
+class ScenarioGenerator:
+    """
+    Generates [n_scenarios, horizon] arrays of trajectories from a historical series,
+    either by a moving-block bootstrap that keeps blocks aligned with the seasonal
+    phase, or by an autoregressive model of the seasonally standardised residuals.
+    """
+
+    def __init__(
+        self,
+        data,
+        period: int = 24,
+        block: int = 168,
+        order: int = 2,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Initializes the scenario generator from a historical series. The seed is an
+        integer or a SeedSequence.
+        """
+        self._data = np.asarray(data, dtype=np.float64)
+        self._period = period
+        self._block = block
+        self._order = order
+        self._seed = (
+            seed
+            if isinstance(seed, np.random.SeedSequence)
+            else np.random.SeedSequence(seed)
+        )
+        self._lo = float(self._data.min())
+        self._hi = float(self._data.max())
+
+        if len(self._data) < block + period:
+            raise ValueError(
+                f"Series of length {len(self._data)} is too short for blocks of {block}"
+            )
+
+        self.fit()
+
+        return None
+
+    def fit(self) -> None:
+        """
+        Fits the seasonal profile and the autoregressive residual model.
+        """
+        n, p = len(self._data), self._order
+        phase = np.arange(n) % self._period
+        counts = np.bincount(phase, minlength=self._period)
+
+        self._mean = np.bincount(phase, self._data, self._period) / counts
+        sq = np.bincount(phase, (self._data - self._mean[phase]) ** 2, self._period)
+        self._std = np.sqrt(sq / counts)
+        self._std[self._std == 0] = 1.0
+
+        self._z = (self._data - self._mean[phase]) / self._std[phase]
+
+        # Least squares estimate of the AR(p) coefficients
+        lags = np.column_stack([self._z[p - k - 1 : n - k - 1] for k in range(p)])
+        coef, *_ = np.linalg.lstsq(lags, self._z[p:], rcond=None)
+        self._coef = coef
+        self._sigma = float(np.std(self._z[p:] - lags @ coef))
+
+        return None
+
+    def rng(self) -> np.random.Generator:
+        """
+        Returns a new independent random stream spawned from the generator's seed.
+        """
+        return np.random.default_rng(self._seed.spawn(1)[0])
+
+    def sample(
+        self,
+        n_scenarios: int,
+        horizon: int,
+        start: int = 0,
+        method: str = "bootstrap",
+        rng: Optional[np.random.Generator] = None,
+    ) -> np.ndarray:
+        """
+        Samples n_scenarios trajectories of length horizon beginning at time start.
+        """
+        if rng is None:
+            rng = self.rng()
+
+        if method == "bootstrap":
+            return self.bootstrap(n_scenarios, horizon, start, rng)
+        elif method == "ar":
+            return self.autoregressive(n_scenarios, horizon, start, rng)
+        else:
+            raise ValueError(f"Unknown scenario method {method}")
+
+    def bootstrap(
+        self, n_scenarios: int, horizon: int, start: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Moving-block bootstrap. Each block is drawn from the history at the same
+        seasonal phase as the point of the horizon it fills.
+        """
+        n_blocks = -(-horizon // self._block)
+        phases = (start + np.arange(n_blocks) * self._block) % self._period
+
+        # Number of whole periods a block can start at without running off the end
+        high = (len(self._data) - self._block - phases) // self._period + 1
+        starts = rng.integers(0, high, size=(n_scenarios, n_blocks))
+        starts = starts * self._period + phases
+
+        idx = starts[:, :, None] + np.arange(self._block)
+        return self._data[idx.reshape(n_scenarios, -1)[:, :horizon]]
+
+    def autoregressive(
+        self, n_scenarios: int, horizon: int, start: int, rng: np.random.Generator
+    ) -> np.ndarray:
+        """
+        Seasonal AR model. The standardised residual is simulated forward from the
+        observed lags at start and mapped back through the seasonal profile.
+        """
+        p, n = self._order, len(self._data)
+        lags = np.tile(self._z[(start - 1 - np.arange(p)) % n], (n_scenarios, 1))
+        shocks = rng.standard_normal((n_scenarios, horizon)) * self._sigma
+
+        z = np.empty((n_scenarios, horizon))
+        for t in range(horizon):
+            z[:, t] = lags @ self._coef + shocks[:, t]
+            lags = np.roll(lags, 1, axis=1)
+            lags[:, 0] = z[:, t]
+
+        phase = (start + np.arange(horizon)) % self._period
+        sims = self._mean[phase] + self._std[phase] * z
+        return np.clip(sims, self._lo, self._hi)
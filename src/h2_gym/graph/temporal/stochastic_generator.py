@@ -1,9 +1,12 @@
 """ """
 
 from __future__ import annotations
-from glob import glob
 from typing import Optional
+from pathlib import Path
 from h2_gym.graph.node import Node
+from .utils import match_files, load_series
+from .scenarios import ScenarioGenerator
+import numpy as np
 
 
 class StochasticGenerator:
@@ -23,6 +26,9 @@ class StochasticGenerator:
         self._datasets = {}
         self._time_dur = {}
         self._target = {}
+        self._scenarios = {}
+        self._matrix = None
+        self._scatter = None
 
     def bind_variable(
         self, node: Node, varname: str, time_duration: Optional[int] = None
@@ -35,19 +41,25 @@ class StochasticGenerator:
                 f"Variable {varname} already exists in the stochastic generator"
             )
 
+        if time_duration is not None:
+            self._time_dur[varname] = time_duration
+            self._maxtimes[varname] = len(self._datasets[varname]) * time_duration
+
         if varname not in node["variables"]:
             node["variables"].add(
                 key=varname,
-                value=self._datasets[varname][self._time],
-                range=(min(self.dataset), max(self.dataset)),
+                value=self.value(varname, self._time),
+                range=(
+                    float(np.min(self._datasets[varname])),
+                    float(np.max(self._datasets[varname])),
+                ),
             )
         else:
-            node["variables"][varname] = self._datasets[varname][self._time]
+            node["variables"][varname] = self.value(varname, self._time)
 
         self._varnames.append(varname)
         self._target[varname] = node["variables"][varname]
         self._node_id[varname] = node.get_id()
-        self._time_dur[varname] = time_duration
 
     def bind_dataset(
         self,
@@ -56,39 +68,37 @@ class StochasticGenerator:
         filenames: Optional[str] = None,
         dataset: Optional[str] = None,
         time_duration: Optional[int] = None,
+        cache: bool = False,
     ):
         """
-        Binds a dataset to the stochastic generator
+        Binds a dataset to the stochastic generator. The files matching every pattern
+        are read once and concatenated into a float32 array, with each record held for
+        time_duration steps. With cache set the array is stored as a memory-mapped
+        .npy file under tmp/datasets.
         """
 
-        for file_name in filenames:
-            csvs_files = glob(str(path) + "/" + file_name)
-
         if dataset is None:
-            self._datasets[varname] = []
-            for filename in csvs_files:
-
-                with open(filename) as f:
-                    next(f)
-
-                    for line in f:
-                        parts = line.strip().split()
-
-                        if len(parts) == 2:
-                            _, value = parts
-                            self._datasets[varname].extend(
-                                [float(value)] * time_duration
-                            )
-                        elif len(parts) == 1:
-                            value = float(parts[0])
-                            self._datasets[varname].extend(
-                                [float(value)] * time_duration
-                            )
-
-            self._maxtimes[varname] = len(self._datasets[varname])
+            csvs_files = match_files(path, filenames)
+            if not csvs_files:
+                raise FileNotFoundError(f"No files matching {filenames} in {path}")
+
+            cache_dir = None
+            if cache:
+                cache_dir = Path(__file__).parent.parent.parent / "tmp/datasets"
+
+            self._datasets[varname] = load_series(csvs_files, cache_dir)
         else:
-            self._datasets[varname] = dataset
-            self._maxtimes[varname] = len(self._datasets[varname])
+            self._datasets[varname] = np.asarray(dataset, dtype=np.float32)
+
+        self._time_dur[varname] = 1 if time_duration is None else time_duration
+        self._maxtimes[varname] = len(self._datasets[varname]) * self._time_dur[varname]
+
+    def value(self, varname: str, time: int) -> float:
+        """
+        Returns the value of a bound dataset at the given time step.
+        """
+        time = time % self._maxtimes[varname]
+        return float(self._datasets[varname][time // self._time_dur[varname]])
 
     def update(self):
         """
@@ -96,9 +106,7 @@ class StochasticGenerator:
         """
         self._time += 1
         for varname in self._varnames:
-            self._target[varname] = self._datasets[varname][
-                self._time % self._maxtimes[varname]
-            ]
+            self._target[varname] = self.value(varname, self._time)
 
         result = {
             self._node_id[varname]: {varname: self._target[varname]}
@@ -106,3 +114,73 @@ class StochasticGenerator:
         }
 
         return result
+
+    def compile(self, state) -> None:
+        """
+        Stacks every bound variable into one [n_vars, T] array, stored column-major so
+        each time step is a contiguous view, and precomputes the positions of the
+        variables in the compiled graph state.
+        """
+        maxtimes = [self._maxtimes[varname] for varname in self._varnames]
+        period = int(np.lcm.reduce(maxtimes))
+        if period > 4 * max(maxtimes):
+            raise ValueError(
+                f"Bound datasets have incommensurate lengths {maxtimes}; "
+                "their common period is too long to stack"
+            )
+
+        time = np.arange(period)
+        self._matrix = np.asfortranarray(
+            np.stack(
+                [
+                    np.asarray(self._datasets[varname], dtype=np.float64)[
+                        (time % self._maxtimes[varname]) // self._time_dur[varname]
+                    ]
+                    for varname in self._varnames
+                ]
+            )
+        )
+        self._scatter = np.array(
+            [state.offset(self._node_id[varname], varname) for varname in self._varnames]
+        )
+        return None
+
+    def is_compiled(self) -> bool:
+        """
+        Returns whether the generator has been compiled against a graph state.
+        """
+        return self._matrix is not None
+
+    def update_array(self) -> tuple:
+        """
+        Updates the stochastic generator, returning the values of every bound variable
+        at the new time step as a view, and their positions in the graph state.
+        """
+        self._time += 1
+        return self._matrix[:, self._time % self._matrix.shape[1]], self._scatter
+
+    def scenarios(
+        self,
+        varname: str,
+        n_scenarios: int,
+        horizon: int,
+        method: str = "bootstrap",
+        rng: Optional[np.random.Generator] = None,
+        **kwargs,
+    ) -> np.ndarray:
+        """
+        Returns an [n_scenarios, horizon] array of trajectories of a bound dataset,
+        starting from the current time step. Keyword arguments configure the
+        ScenarioGenerator the first time it is built for the variable.
+        """
+        if varname not in self._scenarios:
+            self._scenarios[varname] = ScenarioGenerator(
+                self._datasets[varname], **kwargs
+            )
+
+        dur = self._time_dur[varname]
+        start = (self._time % self._maxtimes[varname]) // dur
+        sims = self._scenarios[varname].sample(
+            n_scenarios, -(-horizon // dur), start, method, rng
+        )
+        return np.repeat(sims, dur, axis=1)[:, :horizon]
@@ -0,0 +1,66 @@
+"""
+Utility functions for reading the datasets bound to the stochastic generator.
+"""
+
+from __future__ import annotations
+from typing import Optional
+from pathlib import Path
+from hashlib import sha256
+from glob import glob
+import numpy as np
+import os
+import tempfile
+
+
+def match_files(path, filenames: list) -> list:
+    """
+    Returns the files matching any of the patterns, in pattern order and sorted
+    within each pattern, without duplicates.
+    """
+    files = []
+    for file_name in filenames:
+        for match in sorted(glob(str(path) + "/" + file_name)):
+            if match not in files:
+                files.append(match)
+    return files
+
+
+def read_series(filename) -> np.ndarray:
+    """
+    Reads the last column of a whitespace separated dataset with a single header line.
+    """
+    from pandas import read_csv
+
+    frame = read_csv(filename, sep=r"\s+", skiprows=1, header=None, dtype=np.float32)
+    return frame.iloc[:, -1].to_numpy(dtype=np.float32)
+
+
+def load_series(files: list, cache_dir: Optional[str] = None) -> np.ndarray:
+    """
+    Reads and concatenates the datasets as a float32 array. With a cache directory the
+    result is stored as a .npy file keyed by the file paths, sizes and modification
+    times, and later calls memory-map it instead of parsing the files.
+    """
+    if cache_dir is None:
+        return np.concatenate([read_series(file) for file in files])
+
+    digest = sha256()
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f"{Path(file).resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    cache_dir = Path(cache_dir)
+    target = cache_dir / f"{digest.hexdigest()}.npy"
+    if not target.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        data = np.concatenate([read_series(file) for file in files])
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".npy")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    return np.load(target, mmap_mode="r")